@@ -0,0 +1,209 @@
+import asyncio
+import socket
+import time
+
+import wire
+from city import City
+from node import (General, Order, ROUND_TIMEOUT, SupremeGeneral,
+                  expected_messages)
+from node_socket import (MessageCounter, UdpSocket, decode, encode,
+                         time_left)
+from util import get_logger
+
+logger = get_logger('main')
+
+
+class _DatagramQueue(asyncio.DatagramProtocol):
+
+    def __init__(self):
+        self.queue = asyncio.Queue()
+
+    def datagram_received(self, data: bytes, address):
+        self.queue.put_nowait((data, address))
+
+
+class AsyncUdpSocket(MessageCounter):
+    """
+    UdpSocket for the asyncio runtime, listen is a coroutine and many
+    sockets can share one event loop.
+    """
+
+    def __init__(self, transport: asyncio.DatagramTransport,
+                 protocol: _DatagramQueue, encoding: str = 'UTF-8'):
+        self.transport = transport
+        self.protocol = protocol
+        self.encoding = encoding
+        self.port = transport.get_extra_info('sockname')[1]
+
+    @classmethod
+    async def create(cls, port: int = 0, encoding: str = 'UTF-8'):
+        loop = asyncio.get_running_loop()
+        transport, protocol = await loop.create_datagram_endpoint(
+            _DatagramQueue, local_addr=('127.0.0.1', port))
+        transport.get_extra_info('socket').setsockopt(
+            socket.SOL_SOCKET, socket.SO_RCVBUF,
+            UdpSocket.RECEIVE_BUFFER_SIZE)
+        return cls(transport, protocol, encoding)
+
+    async def listen(self, timeout: float = None):
+        """
+        Receives a single datagram.
+
+        :param timeout: seconds to wait before raising socket.timeout,
+            None waits forever
+        :return: tuple of decoded message and sender address
+        """
+        try:
+            data, address = await asyncio.wait_for(self.protocol.queue.get(),
+                                                   timeout)
+        except asyncio.TimeoutError:
+            raise socket.timeout('timed out')
+        self.count_received(data)
+        return decode(data, self.encoding), address
+
+    def close(self):
+        self.transport.close()
+
+    def send(self, message: str, port: int = 0):
+        data = encode(message, self.encoding)
+        self.transport.sendto(data, ('127.0.0.1', port))
+        self.count_sent(data)
+
+    def send_many(self, messages: list, ports: list):
+        sendto = self.transport.sendto
+        for message, port in zip(messages, ports):
+            data = encode(message, self.encoding)
+            sendto(data, ('127.0.0.1', port))
+            self.count_sent(data)
+
+
+class AsyncGeneral(General):
+
+    async def start(self):
+        """
+        - Same as General.start, but waiting for messages yields to the
+        other nodes on the event loop.
+
+        :return: None
+        """
+        self.logger.info(f"General {self.my_id} is starting...")
+        self.wait_until_ready()
+        self.logger.info("Start listening for incoming messages...")
+
+        self.metrics.start('listen')
+        deadline = self.listen_deadline()
+        for _ in range(expected_messages(len(self.ports), self.max_traitors)):
+            msg = await self.listen_procedure(deadline)
+            if msg is None:
+                break
+            self.relay_procedure(msg)
+            if self.instance_done(0):
+                break
+        self.metrics.stop('listen')
+
+        self.action_procedure()
+
+    async def listen_procedure(self, deadline: float = None):
+        if deadline is None:
+            deadline = time.monotonic() + self.round_timeout
+        while True:
+            try:
+                message, _ = await self.node_socket.listen(
+                    time_left(deadline))
+            except socket.timeout:
+                self.logger.warning('Deadline passed, missing orders count '
+                                    'as RETREAT...')
+                return None
+            msg = self.receive_procedure(message)
+            if msg is not None:
+                return msg
+
+
+class AsyncSupremeGeneral(SupremeGeneral):
+
+    async def start(self):
+        # the supreme general never waits for a message
+        SupremeGeneral.start(self)
+
+
+class AsyncCity(City):
+
+    async def start(self):
+        self.metrics.stop('startup')
+        self.logger.info('Listen to incoming messages...')
+        self.metrics.start('decision')
+        deadline = self.decision_deadline()
+        while not self.decided():
+            try:
+                message, _ = await self.node_socket.listen(
+                    time_left(deadline))
+            except socket.timeout:
+                self.logger.warning('Deadline passed, concluding with the '
+                                    'actions received so far...')
+                break
+            self.receive_procedure(message)
+
+        return self.conclude()
+
+
+async def run_cluster(roles: list, order: Order,
+                      round_timeout: float = ROUND_TIMEOUT,
+                      max_traitors: int = 1, wire_format: str = 'text',
+                      report_queue=None, cluster_id: int = 0):
+    """
+    - Runs every general and the city as coroutines on the running event loop.
+    - All sockets are bound to free ports before any node starts,
+    so no barrier is needed.
+
+    :param roles: list of booleans, True for a traitor
+    :param order: order of the supreme general
+    :param round_timeout: seconds a node waits for a single message
+    :param max_traitors: m of OM(m)
+    :param wire_format: text or binary
+    :param report_queue: queue receiving the report of every node, or None
+    :param cluster_id: written into every message, see node.main
+    :return: the consensus reached by the city
+    """
+    codec = wire.CODECS[wire_format]
+    if cluster_id:
+        codec = codec.for_cluster(cluster_id)
+    sockets = [await AsyncUdpSocket.create(encoding=codec.encoding)
+               for _ in roles]
+    city_socket = await AsyncUdpSocket.create(encoding=codec.encoding)
+    ports = [node_socket.port for node_socket in sockets]
+    logger.debug(f'ports: {ports}')
+
+    generals = []
+    for node_id, is_traitor in enumerate(roles):
+        kwargs = dict(my_id=node_id, is_traitor=is_traitor,
+                      my_port=ports[node_id], ports=ports,
+                      node_socket=sockets[node_id],
+                      city_port=city_socket.port,
+                      round_timeout=round_timeout,
+                      max_traitors=max_traitors, codec=codec)
+        if node_id == 0:
+            generals.append(AsyncSupremeGeneral(order=order, **kwargs))
+        else:
+            generals.append(AsyncGeneral(**kwargs))
+    city = AsyncCity(city_socket.port, roles.count(False),
+                     round_timeout=round_timeout, node_socket=city_socket,
+                     codec=codec, max_traitors=max_traitors)
+
+    try:
+        result, *node_results = await asyncio.gather(
+            city.start(), *(general.start() for general in generals),
+            return_exceptions=True)
+    finally:
+        [general.close_connection() for general in generals]
+        city.close_connection()
+        if report_queue is not None:
+            [report_queue.put(general.report()) for general in generals]
+            report_queue.put(city.report())
+
+    for general, node_result in zip(generals, node_results):
+        if isinstance(node_result, Exception):
+            logger.error(f'general {general.my_id} has an error',
+                         exc_info=node_result)
+    if isinstance(result, Exception):
+        raise result
+    return result
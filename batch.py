@@ -0,0 +1,225 @@
+import csv
+import itertools
+import json
+import multiprocessing
+import sys
+import time
+from argparse import ArgumentParser
+
+import main
+from prefork import WorkerPool
+from util import get_logger
+
+logger = get_logger('main')
+
+FIELDS = ['roles', 'order', 'max_traitors', 'seed', 'runtime', 'wire_format',
+          'consensus', 'latency_ms', 'messages', 'error']
+
+
+def traitor_placements(number_general: int, max_traitors: int):
+    """
+    - Every way of placing at most max_traitors traitors
+    among number_general generals.
+
+    :return: generator of role strings, i.e. 'l,t,l,l'
+    """
+    for number_traitor in range(max_traitors + 1):
+        for traitors in itertools.combinations(range(number_general),
+                                               number_traitor):
+            yield ','.join('t' if general_id in traitors else 'l'
+                           for general_id in range(number_general))
+
+
+def scenarios(generals=(), sizes=(), orders=('RETREAT',), seeds=(None,),
+              max_traitors: int = 1, runtime: str = 'process',
+              wire_format: str = 'text'):
+    """
+    - The matrix of scenarios to run.
+
+    :param generals: role strings to run as given, i.e. ['l,t,l,l']
+    :param sizes: cluster sizes to run with every traitor placement
+    :param orders: orders of the supreme general
+    :param seeds: random seeds of the traitors
+    :return: generator of scenario dictionaries
+    """
+    role_strings = list(generals)
+    for size in sizes:
+        role_strings.extend(traitor_placements(size, max_traitors))
+
+    for roles, order, seed in itertools.product(role_strings, orders, seeds):
+        yield dict(roles=roles, order=order, max_traitors=max_traitors,
+                   seed=seed, runtime=runtime, wire_format=wire_format)
+
+
+def run_scenario(scenario: dict, starting_port: int = None,
+                 pool=None) -> dict:
+    """
+    - Runs a single scenario with main.execution.
+
+    :param scenario: scenario dictionary
+    :param starting_port: first port of the cluster, ports picked by the
+        system if None
+    :param pool: prefork.WorkerPool running the generals, if any
+    :return: the scenario with consensus, latency_ms, messages and error
+    """
+    roles = [x.strip() == 't' for x in scenario['roles'].split(',')]
+    result = dict(scenario, consensus=None, latency_ms=None, messages=None,
+                  error=None)
+
+    start = time.perf_counter()
+    try:
+        result['consensus'], report = main.execution(
+            roles, scenario['order'],
+            max_traitors=scenario['max_traitors'],
+            runtime=scenario['runtime'],
+            wire_format=scenario['wire_format'],
+            starting_port=starting_port,
+            seed=scenario['seed'],
+            with_report=True, pool=pool)
+    except Exception as e:
+        result['error'] = repr(e)
+        return result
+    result['latency_ms'] = (time.perf_counter() - start) * 1000
+
+    if report is not None:
+        result['messages'] = report['messages_sent']
+    return result
+
+
+def _worker(number_node: int, jobs, results, prefork: bool):
+    # the clusters of every worker bind ports picked by the system, so
+    # they never collide with those of another worker or another batch
+    pool = WorkerPool(number_node) if prefork else None
+    try:
+        for index, scenario in iter(jobs.get, None):
+            results.put((index, run_scenario(scenario, pool=pool)))
+    finally:
+        if pool is not None:
+            pool.close()
+
+
+def run_batch(scenario_list, workers: int = None, prefork: bool = False):
+    """
+    - Runs scenarios on a pool of worker processes.
+    - Workers are plain processes rather than a multiprocessing.Pool,
+    since pool workers are daemons and may not start the generals.
+
+    :param scenario_list: iterable of scenario dictionaries
+    :param workers: number of worker processes, the CPU count if None
+    :param prefork: every worker process keeps a prefork.WorkerPool of
+        generals instead of forking them for every scenario
+    :return: generator of results in the order they finish
+    """
+    scenario_list = list(scenario_list)
+    if not scenario_list:
+        return
+    workers = min(workers or multiprocessing.cpu_count(), len(scenario_list))
+    number_node = max(len(s['roles'].split(',')) for s in scenario_list)
+
+    jobs = multiprocessing.Queue()
+    results = multiprocessing.Queue()
+    for job in enumerate(scenario_list):
+        jobs.put(job)
+    for _ in range(workers):
+        jobs.put(None)
+
+    processes = [multiprocessing.Process(target=_worker,
+                                         args=(number_node, jobs, results,
+                                               prefork))
+                 for _ in range(workers)]
+    [process.start() for process in processes]
+    try:
+        for _ in scenario_list:
+            yield results.get()[1]
+    finally:
+        for process in processes:
+            process.join(1)
+            if process.is_alive():
+                process.terminate()
+
+
+def write_results(results, output):
+    """
+    - Streams results to a CSV file when output ends with .csv
+    and to JSON lines otherwise, flushing every row.
+
+    :param results: iterable of result dictionaries
+    :param output: file object
+    :return: number of results written
+    """
+    is_csv = getattr(output, 'name', '').endswith('.csv')
+    if is_csv:
+        writer = csv.DictWriter(output, fieldnames=FIELDS)
+        writer.writeheader()
+
+    count = 0
+    for result in results:
+        if is_csv:
+            writer.writerow(result)
+        else:
+            output.write(json.dumps(result) + '\n')
+        output.flush()
+        count += 1
+    return count
+
+
+def parse_list(value: str) -> list:
+    return [x.strip() for x in value.split(',') if x.strip()]
+
+
+def batch_main():
+    parser = ArgumentParser()
+    parser.add_argument(
+        '-G', type=str, dest='generals', action='append', default=[],
+        help=' A string of generals (i.e. \'l,t,l,l\'), can be repeated')
+    parser.add_argument(
+        '-N', type=int, dest='sizes', action='append', default=[],
+        help=' A cluster size to run with every placement of at most m '
+             'traitors, can be repeated')
+    parser.add_argument(
+        '-O', type=parse_list, dest='orders', default=['ATTACK', 'RETREAT'],
+        help=' Comma separated orders (i.e. \'ATTACK,RETREAT\')')
+    parser.add_argument(
+        '-S', type=parse_list, dest='seeds', default=[None],
+        help=' Comma separated random seeds of the traitors')
+    parser.add_argument(
+        '-M', type=int, dest='max_traitors', default=1,
+        help=' The number of traitors m that OM(m) tolerates')
+    parser.add_argument(
+        '-R', type=str, dest='runtime', default='process',
+        choices=['process', 'asyncio', 'memory', 'sharded', 'shm',
+                 'tcp'])
+    parser.add_argument(
+        '-W', type=str, dest='wire_format', default='text',
+        choices=['text', 'binary'])
+    parser.add_argument(
+        '-j', type=int, dest='workers', default=None,
+        help=' Number of worker processes, defaults to the CPU count')
+    parser.add_argument(
+        '-F', action='store_true', dest='prefork',
+        help=' Fork the generals of every worker process once and reuse '
+             'them for its scenarios, only used by the process runtime')
+    parser.add_argument(
+        '-o', type=str, dest='output', default=None,
+        help=' Output file, .csv for CSV, JSON lines otherwise. '
+             'Defaults to JSON lines on stdout')
+    args = parser.parse_args()
+
+    seeds = [None if seed is None else int(seed) for seed in args.seeds]
+    scenario_list = list(scenarios(args.generals, args.sizes, args.orders,
+                                   seeds, args.max_traitors, args.runtime,
+                                   args.wire_format))
+    logger.info(f'Running {len(scenario_list)} scenarios...')
+
+    if args.output is None:
+        count = write_results(run_batch(scenario_list, args.workers,
+                                        args.prefork), sys.stdout)
+    else:
+        with open(args.output, 'w', newline='') as output:
+            count = write_results(run_batch(scenario_list, args.workers,
+                                            args.prefork), output)
+    logger.info(f'Done running {count} scenarios...')
+
+
+if __name__ == '__main__':
+    batch_main()
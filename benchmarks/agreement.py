@@ -0,0 +1,168 @@
+"""
+End-to-end agreement benchmark.
+
+Runs main.execution across cluster sizes, traitor counts, runtimes and
+wire formats and reports p50/p95/p99 time-to-consensus, messages/sec and
+the peak RSS of a node. A run can be saved as a baseline and later runs
+compared against it, the exit status is 1 if a case regressed. Run from
+the repository root:
+
+    python -m benchmarks.agreement -N 4,7,10 -M 1,2 -R memory,asyncio -s
+    python -m benchmarks.agreement -N 4,7,10 -M 1,2 -R memory,asyncio -c
+"""
+import json
+import logging
+import math
+import sys
+from argparse import ArgumentParser
+
+import main
+import util
+from batch import parse_list
+
+BASELINE = 'benchmarks/baseline.json'
+
+
+def percentile(values: list, q: float) -> float:
+    # nearest rank, so every percentile is an observed run
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def cases(sizes: list, traitors: list, runtimes: list, wire_formats: list):
+    """
+    - Every combination that OM(m) can tolerate, the last m lieutenants
+    being the traitors.
+
+    :return: generator of case dictionaries
+    """
+    for runtime in runtimes:
+        for wire_format in wire_formats:
+            for size in sizes:
+                for max_traitors in traitors:
+                    if size <= 3 * max_traitors:
+                        continue
+                    yield dict(runtime=runtime, wire_format=wire_format,
+                               size=size, max_traitors=max_traitors)
+
+
+def case_key(case: dict) -> str:
+    return '{runtime}/{wire_format}/n={size}/m={max_traitors}'.format(**case)
+
+
+def measure(case: dict, number_run: int, round_timeout: float) -> dict:
+    """
+    - Runs a case number_run times.
+
+    :return: the case with its latency percentiles in ms, messages/sec,
+    messages per run and the largest peak RSS of a node in kB
+    """
+    roles = [False] * (case['size'] - case['max_traitors']) \
+        + [True] * case['max_traitors']
+    latencies = []
+    messages = None
+    total_messages = 0
+    peak_rss_kb = 0
+    for seed in range(number_run):
+        result, report = main.execution(
+            roles, 'ATTACK', round_timeout, case['max_traitors'],
+            case['runtime'], case['wire_format'], seed=seed,
+            with_report=True)
+        if result != 'ATTACK':
+            raise RuntimeError(f'{case_key(case)} concluded {result}')
+        latencies.append(report['wall_time'] * 1000)
+        total_messages += report['messages_sent']
+        messages = report['messages_sent']
+        peak_rss_kb = max([peak_rss_kb] + [
+            node_report['peak_rss_kb'] or 0
+            for node_report in report['nodes'].values()])
+
+    return dict(case, runs=number_run,
+                p50_ms=percentile(latencies, 50),
+                p95_ms=percentile(latencies, 95),
+                p99_ms=percentile(latencies, 99),
+                messages_per_sec=total_messages / (sum(latencies) / 1000),
+                messages=messages, peak_rss_kb=peak_rss_kb)
+
+
+def regressions(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    - Compares results with a baseline. Latency may grow by tolerance,
+    the number of messages of a run has to stay exactly the same.
+
+    :return: list of descriptions, empty if nothing regressed
+    """
+    found = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        expected = baseline[key]
+        if result['messages'] != expected['messages']:
+            found.append(f'{key}: {result["messages"]} messages, '
+                         f'baseline {expected["messages"]}')
+        for field in ('p50_ms', 'p95_ms'):
+            if result[field] > expected[field] * (1 + tolerance):
+                found.append(f'{key}: {field} {result[field]:.2f}, '
+                             f'baseline {expected[field]:.2f}')
+    return found
+
+
+def benchmark_main():
+    parser = ArgumentParser()
+    parser.add_argument('-N', type=parse_list, dest='sizes',
+                        default=['4', '7', '10'],
+                        help=' Comma separated cluster sizes')
+    parser.add_argument('-M', type=parse_list, dest='traitors',
+                        default=['1', '2'],
+                        help=' Comma separated traitor counts, every case '
+                             'runs OM(m) with m traitors')
+    parser.add_argument('-R', type=parse_list, dest='runtimes',
+                        default=['memory', 'asyncio'],
+                        help=' Comma separated runtimes '
+                             '(process, asyncio, memory)')
+    parser.add_argument('-W', type=parse_list, dest='wire_formats',
+                        default=['text'],
+                        help=' Comma separated wire formats (text, binary)')
+    parser.add_argument('-n', type=int, dest='number_run', default=50,
+                        help=' Number of runs per case')
+    parser.add_argument('-T', type=float, dest='round_timeout', default=5.0)
+    parser.add_argument('-b', type=str, dest='baseline', default=BASELINE,
+                        help=' Baseline JSON file')
+    parser.add_argument('-s', action='store_true', dest='save',
+                        help=' Save the results as the baseline')
+    parser.add_argument('-c', action='store_true', dest='compare',
+                        help=' Compare the results with the baseline')
+    parser.add_argument('-x', type=float, dest='tolerance', default=0.25,
+                        help=' Allowed latency growth over the baseline')
+    args = parser.parse_args()
+    # only the runs are measured, not the console
+    logging.getLogger('main').disabled = True
+    util.set_level('OFF')
+
+    results = {}
+    for case in cases([int(size) for size in args.sizes],
+                      [int(m) for m in args.traitors],
+                      args.runtimes, args.wire_formats):
+        result = measure(case, args.number_run, args.round_timeout)
+        results[case_key(case)] = result
+        print(f'{case_key(case):<28} '
+              f'p50 {result["p50_ms"]:8.2f} ms  '
+              f'p95 {result["p95_ms"]:8.2f} ms  '
+              f'p99 {result["p99_ms"]:8.2f} ms  '
+              f'{result["messages_per_sec"]:10.0f} msg/s  '
+              f'{result["peak_rss_kb"]:8d} kB')
+
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for regression in found:
+            print(f'REGRESSION {regression}')
+        if found:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    benchmark_main()
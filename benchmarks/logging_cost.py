@@ -0,0 +1,56 @@
+"""
+Latency cost of logging on a consensus run.
+
+Runs main.execution with synchronous file logging, with the queued log
+writer and with logging switched OFF. Run from the repository root:
+
+    python -m benchmarks.logging_cost -N 200 -R memory
+"""
+import logging
+import statistics
+import time
+from argparse import ArgumentParser
+
+import main
+import util
+
+
+def measure(number_run: int, roles: list, runtime: str) -> list:
+    latencies = []
+    for _ in range(number_run):
+        start = time.perf_counter()
+        main.execution(roles, 'ATTACK', runtime=runtime)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def benchmark_main():
+    parser = ArgumentParser()
+    parser.add_argument('-N', type=int, dest='number_run', default=200,
+                        help=' Number of runs per logging mode')
+    parser.add_argument('-G', type=str, dest='generals', default='l,t,l,l')
+    parser.add_argument('-R', type=str, dest='runtime', default='memory',
+                        choices=['process', 'asyncio', 'memory'])
+    args = parser.parse_args()
+    roles = [x.strip() == 't' for x in args.generals.split(',')]
+    # keep the console quiet, only the node loggers are measured
+    logging.getLogger('main').disabled = True
+
+    results = {}
+    util.set_level('INFO')
+    results['file'] = measure(args.number_run, roles, args.runtime)
+
+    util.start_log_writer(shared=args.runtime == 'process')
+    results['queued'] = measure(args.number_run, roles, args.runtime)
+    util.stop_log_writer()
+
+    util.set_level('OFF')
+    results['off'] = measure(args.number_run, roles, args.runtime)
+
+    for mode, latencies in results.items():
+        print(f'{mode:<8} mean {statistics.mean(latencies):8.2f} ms   '
+              f'p50 {statistics.median(latencies):8.2f} ms')
+
+
+if __name__ == '__main__':
+    benchmark_main()
@@ -0,0 +1,65 @@
+"""
+Round-trip latency between two processes, over UDP and over the shared
+memory rings. Run from the repository root:
+
+    python -m benchmarks.transport_latency -N 20000
+"""
+import multiprocessing
+import statistics
+import time
+from argparse import ArgumentParser
+
+from node_socket import SharedMemoryNetwork, open_socket
+
+MESSAGE = 'general_1~order=1~path=0,2,1'
+
+
+def echo(echo_socket, client_port: int, number_message: int):
+    for _ in range(number_message):
+        message, _ = echo_socket.listen(5)
+        echo_socket.send(message, client_port)
+
+
+def ping_pong(client_socket, client_port: int, echo_socket, echo_port: int,
+              number_message: int) -> list:
+    # both sockets are bound before forking, nothing is sent into the void
+    process = multiprocessing.Process(target=echo, args=(
+        echo_socket, client_port, number_message))
+    process.start()
+    round_trips = []
+    for _ in range(number_message):
+        start = time.perf_counter()
+        client_socket.send(MESSAGE, echo_port)
+        client_socket.listen(5)
+        round_trips.append((time.perf_counter() - start) * 1e6)
+    process.join()
+    client_socket.close()
+    echo_socket.close()
+    return round_trips
+
+
+def benchmark_main():
+    parser = ArgumentParser()
+    parser.add_argument('-N', type=int, dest='number_message', default=20000)
+    args = parser.parse_args()
+
+    results = {}
+    client, server = open_socket(), open_socket()
+    results['udp'] = ping_pong(client, client.sc.getsockname()[1],
+                               server, server.sc.getsockname()[1],
+                               args.number_message)
+
+    network = SharedMemoryNetwork([1, 2])
+    results['shm'] = ping_pong(open_socket(1, network=network), 1,
+                               open_socket(2, network=network), 2,
+                               args.number_message)
+    network.close()
+
+    for transport, round_trips in results.items():
+        print(f'{transport:<4} round trip p50 '
+              f'{statistics.median(round_trips):7.1f} us   mean '
+              f'{statistics.mean(round_trips):7.1f} us')
+
+
+if __name__ == '__main__':
+    benchmark_main()
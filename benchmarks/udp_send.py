@@ -0,0 +1,68 @@
+"""
+Micro-benchmark of the UDP send path.
+
+Compares the old socket-per-message send with the pooled UdpSocket.send
+and the batched UdpSocket.send_many. Run from the repository root:
+
+    python -m benchmarks.udp_send -N 100000
+"""
+import socket
+import time
+from argparse import ArgumentParser
+
+from node_socket import UdpSocket
+
+
+def socket_per_message_send(message: str, port: int = 0):
+    # UdpSocket.send before sockets were reused
+    client_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    client_socket.sendto(message.encode('UTF-8'), ('127.0.0.1', port))
+    client_socket.close()
+
+
+def measure(send, messages: list, ports: list) -> float:
+    start = time.perf_counter()
+    send(messages, ports)
+    return len(messages) / (time.perf_counter() - start)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('-N', type=int, dest='number_message',
+                        help=' Number of messages sent per variant',
+                        default=100000)
+    parser.add_argument('-P', type=int, dest='number_port',
+                        help=' Number of receiving ports, the fan-out',
+                        default=3)
+    args = parser.parse_args()
+
+    # receivers are never read, the kernel drops what does not fit
+    receivers = [UdpSocket() for _ in range(args.number_port)]
+    receiver_ports = [r.sc.getsockname()[1] for r in receivers]
+    ports = [receiver_ports[i % args.number_port]
+             for i in range(args.number_message)]
+    messages = ['general_1~order=1'] * args.number_message
+    sender = UdpSocket()
+
+    def per_message(messages, ports):
+        for message, port in zip(messages, ports):
+            socket_per_message_send(message, port)
+
+    def pooled(messages, ports):
+        for message, port in zip(messages, ports):
+            sender.send(message, port)
+
+    results = {
+        'socket per message': measure(per_message, messages, ports),
+        'pooled send': measure(pooled, messages, ports),
+        'pooled send_many': measure(sender.send_many, messages, ports),
+    }
+    for name, rate in results.items():
+        print(f'{name:<20} {rate:>12,.0f} messages/sec')
+
+    sender.close()
+    [r.close() for r in receivers]
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,49 @@
+import socket
 import threading
+import time
 
-from node import Order
-from node_socket import UdpSocket
+import wire
+from metrics import Metrics, peak_rss, socket_counters
+from node import Order, ROUND_TIMEOUT
+from node_socket import UdpSocket, open_socket, time_left
 from util import get_logger
+from wire import sender_name
 
 logger = get_logger('main')
 
 
 class City:
 
-    def __init__(self, my_port: int, number_general: int) -> None:
+    def __init__(self, my_port: int, number_general: int, barrier=None,
+                 round_timeout: float = ROUND_TIMEOUT,
+                 node_socket=None, codec=wire.TEXT, window: int = 1,
+                 max_traitors: int = 1, on_decision=None) -> None:
+        """
+        :param on_decision: called with the instance id and the conclusion
+            as soon as an instance is decided
+        """
+        self.metrics = Metrics()
+        self.metrics.start('startup')
         self.number_general = number_general
         self.my_port = my_port
-        self.node_socket = UdpSocket(my_port)
+        self.barrier = barrier
+        self.round_timeout = round_timeout
+        self.codec = codec
+        if node_socket is None:
+            node_socket = UdpSocket(my_port, codec.encoding)
+        self.node_socket = node_socket
+        # instance id -> number of RETREAT and ATTACK actions reported,
+        # indexed by the order
+        self.tallies = {}
+        # instance id -> time.monotonic() value to conclude it at the latest
+        self.deadlines = {}
+        # number of instances that may be in flight at the same time
+        self.window = window
+        # ids of the last instances decided, the actions still on their way
+        # to an instance decided early are dropped
+        self.concluded = set()
+        self.on_decision = on_decision
+        self.max_traitors = max_traitors
         self.logger = get_logger('city')
 
         self.logger.debug(f'city_port: {self.my_port}')
@@ -22,28 +53,171 @@ class City:
     def close_connection(self):
         self.node_socket.close()
 
+    def tally(self, instance_id: int) -> list:
+        """
+        - Tally of an instance, created on its first action. The oldest
+        unfinished tally is evicted once window instances are pending.
+
+        :param instance_id: consensus instance
+        :return: list of the RETREAT and ATTACK counts
+        """
+        if instance_id not in self.tallies:
+            if len(self.tallies) >= self.window:
+                evicted = min(self.tallies)
+                self.logger.warning('Evicting unfinished instance %s...',
+                                    evicted)
+                del self.tallies[evicted]
+                self.deadlines.pop(evicted, None)
+            self.tallies[instance_id] = [0, 0]
+            self.deadlines[instance_id] = self.decision_deadline()
+        return self.tallies[instance_id]
+
+    def decided(self, instance_id: int = 0) -> bool:
+        """
+        - An instance is decided once its conclusion can no longer change:
+        FAILED as soon as both ATTACK and RETREAT were reported, otherwise
+        once every loyal general reported.
+
+        :param instance_id: consensus instance
+        :return: True if the instance can be concluded
+        """
+        order_counts = self.tallies.get(instance_id)
+        if order_counts is None:
+            return False
+        return (order_counts[Order.ATTACK] > 0
+                and order_counts[Order.RETREAT] > 0) \
+            or sum(order_counts) >= self.number_general
+
+    def decision_deadline(self) -> float:
+        """
+        :return: time.monotonic() value by which every loyal general has
+            reported, the generals' m + 1 relay rounds plus one more round
+        """
+        return time.monotonic() + self.round_timeout * (self.max_traitors + 2)
+
     def start(self):
-        order_counts = {Order.ATTACK: 0, Order.RETREAT: 0}
-        received_messages = 0
+        if self.barrier is not None:
+            self.logger.info('Waiting for all generals to be ready...')
+            self.barrier.wait(self.round_timeout)
+        self.metrics.stop('startup')
+        self.metrics.mark('ready')
 
         self.logger.info('Listen to incoming messages...')
-        for _ in range(self.number_general):
-            message, _ = self.node_socket.listen()
-            if message:
-                received_messages += 1
-                sender, action_order = message.split('~')
-                action, order_str = action_order.split('=')
-                order = int(order_str)
-
-                action_str = 'ATTACK' if order == Order.ATTACK else 'RETREAT'
-                self.logger.info(f'{sender} {action_str} from us!')
-
-                if order == Order.ATTACK:
-                    order_counts[Order.ATTACK] += 1
-                elif order == Order.RETREAT:
-                    order_counts[Order.RETREAT] += 1
-
-        if received_messages < 2:
+        self.metrics.start('decision')
+        deadline = self.decision_deadline()
+        while not self.decided():
+            try:
+                message, _ = self.node_socket.listen(time_left(deadline))
+            except socket.timeout:
+                self.logger.warning('Deadline passed, concluding with the '
+                                    'actions received so far...')
+                break
+            self.receive_procedure(message)
+
+        return self.conclude()
+
+    def serve(self, result_queue):
+        """
+        - Long-lived counterpart of start: concludes every instance as soon
+        as all loyal generals reported on it, or with the actions received
+        so far once its deadline has passed, until the supreme general
+        stops the cluster.
+
+        :param result_queue: queue receiving (instance id, conclusion) tuples
+        :return: None
+        """
+        if self.barrier is not None:
+            self.logger.info('Waiting for all generals to be ready...')
+            self.barrier.wait(self.round_timeout)
+        self.metrics.stop('startup')
+
+        self.logger.info('Serving...')
+        while True:
+            deadline = min(self.deadlines.values(), default=None)
+            try:
+                message, _ = self.node_socket.listen(time_left(deadline))
+            except socket.timeout:
+                now = time.monotonic()
+                for instance_id in sorted(self.deadlines):
+                    if self.deadlines[instance_id] <= now:
+                        self.logger.warning('Deadline of instance %s passed...',
+                                            instance_id)
+                        result_queue.put((instance_id,
+                                          self.conclude(instance_id)))
+                continue
+
+            msg = self.receive_procedure(message)
+            if msg is None:
+                continue
+            if msg.kind == wire.STOP:
+                break
+
+            if self.decided(msg.instance):
+                result_queue.put((msg.instance, self.conclude(msg.instance)))
+        self.logger.info('Stopped serving...')
+
+    def receive_procedure(self, message):
+        """
+        - Counts the action a general reported.
+
+        :param message: message as received from the socket
+        :return: decoded message, None for an empty or malformed one or
+            one of another cluster
+        """
+        if not message:
+            return None
+
+        try:
+            msg = wire.decode_strict(self.codec, message)
+        except wire.MALFORMED as error:
+            self.logger.warning('Dropping a malformed message: %s...', error)
+            return None
+        if msg.cluster != self.codec.cluster:
+            self.logger.warning('Dropping a message of cluster %s...',
+                                msg.cluster)
+            return None
+        if msg.kind == wire.STOP:
+            return msg
+        if msg.instance in self.concluded:
+            self.logger.debug('Instance %s is decided already...',
+                              msg.instance)
+            return None
+        order = msg.order
+
+        action_str = 'ATTACK' if order == Order.ATTACK else 'RETREAT'
+        self.logger.info('%s %s from us!', sender_name(msg.sender), action_str)
+
+        order_counts = self.tally(msg.instance)
+        if order == Order.ATTACK:
+            order_counts[Order.ATTACK] += 1
+        elif order == Order.RETREAT:
+            order_counts[Order.RETREAT] += 1
+        return msg
+
+    def conclude(self, instance_id: int = 0):
+        """
+        - Decides what happened from the counted actions.
+
+        :param instance_id: consensus instance to conclude
+        :return: ATTACK, RETREAT, FAILED or ERROR_LESS_THAN_TWO_GENERALS
+        """
+        self.metrics.stop('decision')
+        order_counts = self.tallies.pop(instance_id, [0, 0])
+        self.deadlines.pop(instance_id, None)
+        self.concluded.add(instance_id)
+        if len(self.concluded) > self.window:
+            self.concluded.remove(min(self.concluded))
+        conclusion = self.conclusion(order_counts)
+        if self.on_decision is not None:
+            self.on_decision(instance_id, conclusion)
+        return conclusion
+
+    def conclusion(self, order_counts: list) -> str:
+        """
+        :param order_counts: RETREAT and ATTACK counts of an instance
+        :return: ATTACK, RETREAT, FAILED or ERROR_LESS_THAN_TWO_GENERALS
+        """
+        if sum(order_counts) < 2:
             self.logger.error('ERROR_LESS_THAN_TWO_GENERALS')
             return 'ERROR_LESS_THAN_TWO_GENERALS'
 
@@ -58,6 +232,17 @@ class City:
         self.logger.info(f'GENERAL CONSENSUS: {conclusion}')
         return conclusion
 
+    def report(self) -> dict:
+        """
+        - Phase timings and message counters of the city.
+
+        :return: dictionary
+        """
+        return dict(name='city', cluster=self.codec.cluster,
+                    phases=self.metrics.phases,
+                    marks=self.metrics.marks, peak_rss_kb=peak_rss(),
+                    **socket_counters(self.node_socket))
+
 
 def thread_exception_handler(args):
     logger.error('Uncaught exception', exc_info=(args.exc_type,
@@ -65,10 +250,31 @@ def thread_exception_handler(args):
                                                  args.exc_traceback))
 
 
-def main(city_port: int, number_general: int):
+def main(city_port: int, number_general: int, barrier=None,
+         round_timeout: float = ROUND_TIMEOUT, wire_format: str = 'text',
+         network=None, report_queue=None, result_queue=None,
+         window: int = 1, coalesce: bool = False, max_traitors: int = 1,
+         reliable: bool = False, tcp: bool = False, node_socket=None,
+         cluster_id: int = 0, on_decision=None):
+    """
+    :param node_socket: socket bound to city_port already
+    :param cluster_id: see node.main
+    :param on_decision: see City
+    """
     threading.excepthook = thread_exception_handler
     try:
-        city = City(city_port, number_general)
+        codec = wire.CODECS[wire_format]
+        if cluster_id:
+            codec = codec.for_cluster(cluster_id)
+        if node_socket is None:
+            node_socket = open_socket(city_port, codec.encoding, network,
+                                      coalesce, reliable, tcp)
+        city = City(city_port, number_general, barrier=barrier,
+                    round_timeout=round_timeout, codec=codec, window=window,
+                    max_traitors=max_traitors,
+                    node_socket=node_socket, on_decision=on_decision)
+        if result_queue is not None:
+            return city.serve(result_queue)
         return city.start()
 
     except Exception:
@@ -77,3 +283,5 @@ def main(city_port: int, number_general: int):
 
     finally:
         city.close_connection()
+        if report_queue is not None:
+            report_queue.put(city.report())
@@ -0,0 +1,275 @@
+import multiprocessing
+import queue
+import threading
+import time
+from argparse import ArgumentParser
+
+import city
+import node
+import util
+import wire
+from main import NodeProcess, NodeThread
+from membership import Membership, new_cluster_id, node_port
+from node_socket import MemoryNetwork, open_socket
+from util import get_logger
+
+logger = get_logger('main')
+
+
+class Cluster:
+    """
+    Generals and a city that stay up and agree on one numbered instance
+    after another, instead of being started for every single order.
+
+    with Cluster([False, True, False, False], runtime='memory') as cluster:
+        cluster.agree('ATTACK')
+        cluster.run(['ATTACK', 'RETREAT'] * 100)
+    """
+
+    def __init__(self, roles: list, round_timeout: float = node.ROUND_TIMEOUT,
+                 max_traitors: int = 1, runtime: str = 'process',
+                 wire_format: str = 'text', starting_port: int = None,
+                 window: int = 1, coalesce: bool = False):
+        """
+        :param roles: list of booleans, True for a traitor
+        :param round_timeout: seconds to wait for the cluster barrier
+        and for a relay round of an instance
+        :param max_traitors: m of OM(m)
+        :param runtime: process or memory
+        :param wire_format: text or binary
+        :param starting_port: first port of the cluster, the generals and
+            the city bind ports picked by the system if None
+        :param window: number of instances run may keep in flight
+        :param coalesce: pack UDP messages to the same port into one datagram
+        """
+        if len(roles) <= 3 * max_traitors:
+            raise ValueError('ERROR_NOT_ENOUGH_GENERALS')
+        if runtime not in ('process', 'memory'):
+            raise ValueError(f'unsupported runtime for a cluster: {runtime}')
+
+        self.roles = roles
+        self.round_timeout = round_timeout
+        self.max_traitors = max_traitors
+        self.runtime = runtime
+        self.wire_format = wire_format
+        self.window = window
+        self.coalesce = coalesce
+        self.next_instance = 0
+        self.nodes = []
+        # written into every message, see node.main
+        self.cluster_id = new_cluster_id()
+
+        if runtime == 'memory':
+            self.network = MemoryNetwork()
+            self.starting_port = 1
+            self.barrier = threading.Barrier(len(roles) + 2)
+            self.command_queue = queue.SimpleQueue()
+            self.result_queue = queue.SimpleQueue()
+            self.node_class = NodeThread
+        else:
+            self.network = None
+            self.starting_port = starting_port
+            self.barrier = multiprocessing.Barrier(len(roles) + 2)
+            self.command_queue = multiprocessing.Queue()
+            self.result_queue = multiprocessing.Queue()
+            self.node_class = NodeProcess
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        """
+        - Starts every general and the city, then waits until they are all
+        bound and listening.
+
+        :return: None
+        """
+        number_node = len(self.roles)
+        membership = None
+        city_socket = None
+        if self.starting_port is None:
+            # the generals bind port 0 and report the port they got, the
+            # city is bound here and inherited by its process
+            membership = Membership(number_node)
+            city_socket = open_socket(0, wire.CODECS[self.wire_format].encoding,
+                                      coalesce=self.coalesce)
+            ports = [0] * number_node
+            city_port = node_port(city_socket)
+        else:
+            ports = list(range(self.starting_port,
+                               self.starting_port + number_node))
+            city_port = self.starting_port + number_node
+
+        logger.info('Starting the cluster...')
+        for node_id, is_traitor in enumerate(self.roles):
+            self.nodes.append(self.node_class(
+                target=node.main,
+                args=(is_traitor, node_id, ports, ports[node_id],
+                      node.Order.RETREAT, city_port, self.barrier,
+                      self.round_timeout, self.max_traitors,
+                      self.wire_format, self.network),
+                kwargs=dict(persistent=True,
+                            command_queue=self.command_queue,
+                            window=self.window,
+                            coalesce=self.coalesce,
+                            cluster_id=self.cluster_id,
+                            membership=membership.node_connections[node_id]
+                            if membership is not None else None)))
+        self.nodes.append(self.node_class(
+            target=city.main,
+            args=(city_port, self.roles.count(False), self.barrier,
+                  self.round_timeout, self.wire_format, self.network),
+            kwargs=dict(result_queue=self.result_queue,
+                        window=self.window, coalesce=self.coalesce,
+                        max_traitors=self.max_traitors,
+                        node_socket=city_socket,
+                        cluster_id=self.cluster_id)))
+        [cluster_node.start() for cluster_node in self.nodes]
+
+        if membership is not None:
+            # the city process has its own copy of the socket
+            city_socket.close()
+            try:
+                ports = membership.gather(self.round_timeout)
+                membership.distribute(ports, city_port)
+            except TimeoutError:
+                logger.error('A general did not report its port...')
+                for cluster_node in self.nodes:
+                    cluster_node.terminate()
+                    cluster_node.join(self.round_timeout)
+                self.nodes = []
+                raise
+            finally:
+                membership.close()
+        logger.debug(f'ports: {ports}')
+
+        self.barrier.wait(self.round_timeout)
+        logger.info('The cluster is ready...')
+
+    def agree(self, order: str) -> str:
+        """
+        - Runs a single consensus instance.
+
+        :param order: ATTACK or RETREAT
+        :return: what the city concluded
+        """
+        instance_id = self.submit(order)
+        result_id, conclusion = self.result_queue.get(
+            timeout=self.result_timeout())
+        if result_id != instance_id:
+            raise RuntimeError(f'instance {instance_id} was concluded '
+                               f'as {result_id}')
+        return conclusion
+
+    def run(self, orders: list) -> list:
+        """
+        - Runs an instance for every order, keeping up to window of them
+        in flight so the next one does not wait for the round-trip of the
+        previous one.
+
+        :param orders: list of ATTACK or RETREAT
+        :return: list of conclusions, in the order of orders
+        """
+        first_instance = self.next_instance
+        conclusions = [None] * len(orders)
+        submitted = 0
+        for submitted, order in enumerate(orders[:self.window], 1):
+            self.submit(order)
+
+        for _ in range(len(orders)):
+            instance_id, conclusion = self.result_queue.get(
+                timeout=self.result_timeout())
+            conclusions[instance_id - first_instance] = conclusion
+            if submitted < len(orders):
+                self.submit(orders[submitted])
+                submitted += 1
+        return conclusions
+
+    def result_timeout(self) -> float:
+        # the city concludes an instance by its deadline at the latest
+        return self.round_timeout * (self.max_traitors + 3)
+
+    def submit(self, order: str) -> int:
+        """
+        - Hands an order to the supreme general as the next instance.
+
+        :param order: ATTACK or RETREAT
+        :return: instance id
+        """
+        instance_id = self.next_instance
+        self.next_instance += 1
+        order = node.Order.RETREAT if order.upper() == 'RETREAT' \
+            else node.Order.ATTACK
+        self.command_queue.put((instance_id, order))
+        return instance_id
+
+    def stop(self):
+        """
+        - Lets the supreme general stop every node and waits for them.
+
+        :return: None
+        """
+        logger.info('Stopping the cluster...')
+        self.command_queue.put(None)
+        for cluster_node in self.nodes:
+            cluster_node.join(self.round_timeout)
+        self.nodes = []
+        logger.info('The cluster is stopped...')
+
+
+def cluster_main():
+    parser = ArgumentParser()
+    parser.add_argument(
+        '-G', type=str, dest='generals', default='l,t,l,l',
+        help=' A string of generals (i.e. \'l,t,l,l\'), where l is loyal '
+             'and t is a traitor')
+    parser.add_argument(
+        '-O', type=str, dest='order', default='ATTACK',
+        help=' The order of every instance (O ∈ {ATTACK,RETREAT})')
+    parser.add_argument(
+        '-I', type=int, dest='instances', default=1000,
+        help=' Number of consensus instances to run')
+    parser.add_argument(
+        '-T', type=float, dest='round_timeout', default=node.ROUND_TIMEOUT)
+    parser.add_argument(
+        '-M', type=int, dest='max_traitors', default=1,
+        help=' The number of traitors m that OM(m) tolerates')
+    parser.add_argument(
+        '-R', type=str, dest='runtime', default='process',
+        choices=['process', 'memory'])
+    parser.add_argument(
+        '-W', type=str, dest='wire_format', default='text',
+        choices=['text', 'binary'])
+    parser.add_argument(
+        '-w', type=int, dest='window', default=1,
+        help=' Number of instances in flight at the same time')
+    parser.add_argument(
+        '-C', action='store_true', dest='coalesce',
+        help=' Pack the UDP messages a node sends to the same port into one '
+             'datagram')
+    parser.add_argument(
+        '-L', type=str, dest='level', choices=list(util.LEVELS),
+        default='INFO')
+    args = parser.parse_args()
+    util.set_level(args.level)
+
+    roles = [x.strip() == 't' for x in args.generals.split(',')]
+    conclusions = {}
+    with Cluster(roles, args.round_timeout, args.max_traitors,
+                 args.runtime, args.wire_format, window=args.window,
+                 coalesce=args.coalesce) as cluster:
+        start = time.perf_counter()
+        for conclusion in cluster.run([args.order] * args.instances):
+            conclusions[conclusion] = conclusions.get(conclusion, 0) + 1
+        elapsed = time.perf_counter() - start
+
+    print(f'conclusions: {conclusions}')
+    print(f'{args.instances / elapsed:.0f} agreements/s')
+
+
+if __name__ == '__main__':
+    cluster_main()
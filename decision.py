@@ -0,0 +1,243 @@
+"""
+Information gathering tree of OM(m) stored level by level in flat arrays.
+
+Level k holds the orders relayed along paths (0, g1, ..., gk) of distinct
+lieutenants, in lexicographic order of the paths. The children of the
+i-th path of level k are then the consecutive slots
+i * c ... (i + 1) * c - 1 of level k + 1, c being the number of
+lieutenants not on the path yet, so the recursive majority of OM(m) is
+computed bottom-up with one reduction per level instead of one call per
+path.
+
+Next to every level a bitmap of the same shape tells which orders were
+received already, so a duplicate is dropped with a single lookup. Every
+path above the last level also keeps the number of ATTACK votes it has for
+sure and at most, i.e. with its missing orders counting as ATTACK. A new
+order only updates the counts of its ancestors, so a general can tell in
+O(m) per order when the orders still missing can no longer change the
+decision.
+
+The levels are NumPy arrays once the tree is large enough for a
+vectorized reduction to win back the import of NumPy, lists otherwise.
+"""
+RETREAT = 0
+ATTACK = 1
+
+# outcomes of EigTree.record
+RECORDED = 0
+DUPLICATE = 1
+# a path that cannot be part of the tree of the general
+INVALID = 2
+
+# slots of the last level from which NumPy is used, importing it takes
+# ~0.1 s, which a smaller tree does not win back over a few decisions
+VECTORIZE_SIZE = 100000
+
+
+def load_numpy():
+    """
+    :return: the numpy module, None if it is not installed
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+class EigLayout:
+    """
+    Shape of the tree of a general, the same for every instance it runs.
+    """
+
+    def __init__(self, lieutenants: list, max_traitors: int):
+        """
+        :param lieutenants: ids of the lieutenants relaying to this general,
+            not including itself
+        :param max_traitors: m, the number of relay rounds
+        """
+        self.lieutenants = sorted(lieutenants)
+        self.rank = {general_id: rank
+                     for rank, general_id in enumerate(self.lieutenants)}
+        self.max_traitors = max_traitors
+        self.sizes = [1]
+        for depth in range(max_traitors):
+            self.sizes.append(self.sizes[-1] * (len(self.lieutenants) - depth))
+        # numpy module the trees vectorize with, None for lists
+        self.np = load_numpy() if self.sizes[-1] >= VECTORIZE_SIZE else None
+        # path -> slot, only valid paths are cached so it stays bounded
+        self.indexes = {}
+
+    def index(self, path: tuple) -> int:
+        """
+        :param path: tuple of general ids starting with the supreme general
+        :return: slot of path in its level, None for a path that cannot be
+            part of the tree
+        """
+        index = self.indexes.get(path)
+        if index is not None:
+            return index
+        if not path or path[0] != 0 or len(path) > len(self.sizes):
+            return None
+
+        index = 0
+        ranks = []
+        for depth, general_id in enumerate(path[1:]):
+            rank = self.rank.get(general_id)
+            if rank is None or rank in ranks:
+                return None
+            # rank among the lieutenants not on the path yet
+            index = index * (len(self.lieutenants) - depth) + rank - \
+                sum(1 for used in ranks if used < rank)
+            ranks.append(rank)
+        self.indexes[path] = index
+        return index
+
+
+class EigTree:
+
+    def __init__(self, layout: EigLayout):
+        self.layout = layout
+        self.index = layout.index
+        self.lieutenants = layout.lieutenants
+        np = layout.np
+        # a missing order counts as RETREAT
+        if np is not None:
+            self.levels = [np.zeros(size, dtype=np.int8)
+                           for size in layout.sizes]
+        else:
+            self.levels = [[RETREAT] * size for size in layout.sizes]
+        # one bit per path and round, set once its order was received
+        self.seen = [bytearray(size) for size in layout.sizes]
+        # number of orders received, per level
+        self.received = [0] * len(layout.sizes)
+        # paths above the last level: ATTACK votes of their majority with
+        # the missing orders counting as RETREAT (low) and as ATTACK (high),
+        # and the resulting values, nothing is received yet
+        inner = layout.sizes[:-1]
+        self.low_votes = [[0] * size for size in inner]
+        self.high_votes = [[len(self.lieutenants) - depth + 1] * size
+                           for depth, size in enumerate(inner)]
+        self.low = [bytearray(size) for size in inner]
+        self.high = [bytearray(b'\x01') * size for size in inner]
+        # number of orders above the last level not received yet
+        self.inner_missing = sum(inner)
+
+    def __setitem__(self, path: tuple, order: int):
+        self.record(path, order)
+
+    def record(self, path: tuple, order: int) -> int:
+        """
+        :param path: tuple of general ids the order was relayed along
+        :param order: order received
+        :return: RECORDED, DUPLICATE for an order received along path
+            already or INVALID for a path that cannot be part of the tree,
+            both are ignored
+        """
+        index = self.index(path)
+        if index is None:
+            return INVALID
+        depth = len(path) - 1
+        seen = self.seen[depth]
+        if seen[index]:
+            return DUPLICATE
+        seen[index] = 1
+        self.received[depth] += 1
+        value = 1 if order else 0
+        self.levels[depth][index] = value
+
+        # the order itself was counted as RETREAT and as ATTACK so far,
+        # the votes of its own path and then of its ancestors change
+        low_change, high_change = value, value - 1
+        if not self.low:
+            return RECORDED
+        if depth < len(self.low):
+            self.inner_missing -= 1
+        else:
+            depth -= 1
+            index //= len(self.lieutenants) - depth
+        while True:
+            children = len(self.lieutenants) - depth
+            low_votes = self.low_votes[depth][index] + low_change
+            high_votes = self.high_votes[depth][index] + high_change
+            self.low_votes[depth][index] = low_votes
+            self.high_votes[depth][index] = high_votes
+            low = 1 if 2 * low_votes > children + 1 else 0
+            high = 1 if 2 * high_votes > children + 1 else 0
+            low_change = low - self.low[depth][index]
+            high_change = high - self.high[depth][index]
+            self.low[depth][index] = low
+            self.high[depth][index] = high
+            if depth == 0 or not (low_change or high_change):
+                return RECORDED
+            depth -= 1
+            index //= len(self.lieutenants) - depth
+
+    def complete(self) -> bool:
+        """
+        :return: True once every order above the last level, i.e. every
+            order that is relayed, was received
+        """
+        return self.inner_missing == 0
+
+    def get(self, path: tuple, default: int = RETREAT) -> int:
+        index = self.index(path)
+        if index is None:
+            return default
+        return int(self.levels[len(path) - 1][index])
+
+    def _resolve(self, level: int):
+        # resolved values of every path of level, majority of its own order
+        # and the resolved values of its children, ties go to RETREAT
+        np = self.layout.np
+        resolved = self.levels[-1]
+        for depth in range(len(self.levels) - 2, level - 1, -1):
+            children = len(self.lieutenants) - depth
+            own = self.levels[depth]
+            if np is not None:
+                attacks = own + resolved.reshape(-1, children).sum(
+                    axis=1, dtype=np.int32)
+                resolved = (2 * attacks > children + 1).astype(np.int8)
+            else:
+                resolved = [
+                    1 if 2 * (own[i] + sum(resolved[i * children:
+                                                    (i + 1) * children]))
+                    > children + 1 else 0
+                    for i in range(len(own))]
+        return resolved
+
+    def orders(self, path: tuple = (0,)) -> list:
+        """
+        - The orders OM(m) takes the majority of for the value relayed along
+        path: the order received through path itself and the resolved
+        order of every relay of it.
+
+        :param path: tuple of general ids
+        :return: list of orders
+        """
+        own = self.get(path)
+        if len(path) >= len(self.levels):
+            return [own]
+
+        children = len(self.lieutenants) - (len(path) - 1)
+        start = self.index(path) * children
+        resolved = self._resolve(len(path))[start:start + children]
+        return [own] + [int(order) for order in resolved]
+
+    def decide(self) -> int:
+        """
+        :return: the order OM(m) agrees on, ATTACK or RETREAT
+        """
+        return int(self._resolve(0)[0])
+
+    def settled(self) -> bool:
+        """
+        - A majority only grows with the orders it is taken of, so the
+        decision is final once it is the same with every missing order
+        counting as RETREAT, as it does, and as ATTACK.
+
+        :return: True if no missing order can change decide()
+        """
+        if not self.low:
+            return self.seen[0][0] == 1
+        return self.low[0][0] == self.high[0][0]
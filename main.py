@@ -1,13 +1,25 @@
+import json
+import logging
 import multiprocessing
 import pprint
+import queue
 import random
 import sys
+import threading
+import time
 from argparse import ArgumentParser
 from util import get_logger
+import util
 
 # RUN IN PYTHON 3.8.8
 import city
+import metrics
 import node
+import shard
+import wire
+from membership import Membership, new_cluster_id, node_port
+from node_socket import MemoryNetwork, SharedMemoryNetwork, open_socket
+from signing import Keyring
 
 logger = get_logger('main')
 
@@ -22,6 +34,18 @@ class NodeProcess(multiprocessing.Process):
             logger.error(f'{self.name} has an error')
 
 
+class NodeThread(threading.Thread):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, daemon=True, **kwargs)
+
+    def run(self):
+        try:
+            super().run()
+        except Exception:
+            logger.error(f'{self.name} has an error')
+
+
 def handle_exception(exc_type, exc_value, exc_traceback):
     logger.error(f'Uncaught exception',
                  exc_info=(exc_type, exc_value, exc_traceback))
@@ -32,65 +56,350 @@ def main():
         '-G', type=str, dest='generals',
         help=' A string of generals (i.e. \'l,t,l,l\'), where l is loyal and t is a traitor.  '
              'The first general is the supreme general. '
-             'This argument is designed only to accept four generals',
+             'Any number of generals is accepted as long as it is greater than 3m',
         default='l,t,l,l')
     parser.add_argument(
         '-O', type=str, dest='order',
         help=' The order the commander gives to the other generals (O ∈ {ATTACK,RETREAT})',
         default='RETREAT')
+    parser.add_argument(
+        '-T', type=float, dest='round_timeout',
+        help=' Seconds a node waits for the other nodes to be ready or for a '
+             'single message before giving up',
+        default=node.ROUND_TIMEOUT)
+    parser.add_argument(
+        '-M', type=int, dest='max_traitors',
+        help=' The number of traitors m that OM(m) tolerates, '
+             'i.e. the number of relay rounds',
+        default=1)
+    parser.add_argument(
+        '-R', type=str, dest='runtime',
+        choices=['process', 'asyncio', 'memory', 'sharded', 'shm', 'tcp'],
+        help=' process runs every general in its own process, '
+             'asyncio runs all generals and the city on one event loop, '
+             'memory runs every general in a thread of this process and '
+             'passes messages through in-memory queues instead of sockets, '
+             'sharded splits the generals across a pool of processes, '
+             'running them as threads that talk in memory within a process '
+             'and over UDP across processes, '
+             'shm runs every general in its own process like process, but '
+             'passes messages through shared memory rings instead of UDP, '
+             'tcp is process over persistent TCP connections',
+        default='process')
+    parser.add_argument(
+        '-P', type=int, dest='workers',
+        help=' Number of processes of the sharded runtime, '
+             'defaults to the CPU count',
+        default=None)
+    parser.add_argument(
+        '-W', type=str, dest='wire_format', choices=['text', 'binary'],
+        help=' text sends human readable messages (i.e. general_1~order=0), '
+             'binary sends compact fixed layout messages',
+        default='text')
+    parser.add_argument(
+        '-L', type=str, dest='level', choices=list(util.LEVELS),
+        help=' Logging level of every node, OFF skips formatting log messages',
+        default='INFO')
+    parser.add_argument(
+        '-Q', action='store_true', dest='queued_logs',
+        help=' Nodes only enqueue their log records, a single background '
+             'thread writes them to the logs directory in batches')
+    parser.add_argument(
+        '-C', action='store_true', dest='coalesce',
+        help=' Pack the UDP messages a node sends to the same port into one '
+             'datagram, only used by the process runtime')
+    parser.add_argument(
+        '-A', action='store_true', dest='reliable',
+        help=' Acknowledge every UDP message and resend the lost ones, only '
+             'used by the process runtime')
+    parser.add_argument(
+        '-S', action='store_true', dest='signed',
+        help=' Run the signed messages algorithm SM(m) instead of OM(m), '
+             'it agrees with fewer generals and messages but waits for '
+             'the deadline of every round, so a short -T is recommended')
+    parser.add_argument(
+        '-J', type=str, dest='report',
+        help=' Write the timings and message counters of the run as JSON '
+             'to this file',
+        default=None)
     args = parser.parse_args()
+    util.set_level(args.level)
 
     logger.info('Processing args...')
     roles = [True if x.strip() == 't' else False for x in args.generals.split(',')]
     order: str = args.order
-    logger.debug(f'roles: {pprint.pformat(roles)}')
-    logger.debug(f'order: {order}')
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f'roles: {pprint.pformat(roles)}')
+    logger.debug('order: %s', order)
+    logger.debug('round_timeout: %s', args.round_timeout)
+    logger.debug('max_traitors: %s', args.max_traitors)
+    logger.debug('runtime: %s', args.runtime)
+    logger.debug('wire_format: %s', args.wire_format)
     logger.info('Done processing args...')
-    execution(roles, order)
+    if args.queued_logs:
+        util.start_log_writer(
+            shared=args.runtime not in ('memory', 'asyncio'))
+    try:
+        result = execution(roles, order, args.round_timeout,
+                           args.max_traitors, args.runtime, args.wire_format,
+                           with_report=args.report is not None,
+                           coalesce=args.coalesce, workers=args.workers,
+                           reliable=args.reliable, signed=args.signed)
+        if args.report is not None:
+            with open(args.report, 'w') as f:
+                json.dump(result[1], f, indent=2)
+    finally:
+        util.stop_log_writer()
 
-def execution(roles, order):
+def execution(roles, order, round_timeout=node.ROUND_TIMEOUT, max_traitors=1,
+              runtime='process', wire_format='text', starting_port=None,
+              seed=None, with_report=False, coalesce=False, workers=None,
+              reliable=False, signed=False, pool=None):
     sys.excepthook = handle_exception
 
+    if seed is not None:
+        # forked generals inherit the seeded state of this process
+        random.seed(seed)
+
     # number_loyal_generals = roles.count(False)  # count the number of loyal generals
     # if number_loyal_generals < 2:
     #     logger.error('ERROR_LESS_THAN_TWO_GENERALS')
     #     return 'ERROR_LESS_THAN_TWO_GENERALS'
 
 
-    logger.info('The main program is running...')
-    logger.info('Determining the ports that will be used...')
-    starting_port = random.randint(10000, 11000)
-    port_used = [port for port in range(starting_port, starting_port + 4)]
-    logger.debug(f'port_used: {port_used}')
-    logger.info('Done determining the ports that will be used...')
+    number_node = len(roles)
+    # SM(m) only needs a loyal lieutenant besides the m traitors
+    if number_node <= (max_traitors + 1 if signed else 3 * max_traitors):
+        logger.error('ERROR_NOT_ENOUGH_GENERALS')
+        if with_report:
+            return 'ERROR_NOT_ENOUGH_GENERALS', None
+        return 'ERROR_NOT_ENOUGH_GENERALS'
 
+    logger.info('The main program is running...')
     logger.info('Convert order string to binary...')
     order = node.Order.RETREAT if order.upper() == 'RETREAT' else node.Order.ATTACK
-    logger.debug(f'order: {order}')
+    logger.debug('order: %s', order)
     logger.info('Done converting string to binary...')
 
+    started = time.perf_counter()
+    marks = {}
+    # a pool only runs plain UDP generals as processes
+    if pool is not None and (runtime != 'process' or coalesce or reliable):
+        pool = None
+    report_queue = None
+    if with_report and pool is not None:
+        report_queue = pool.report_queue
+    elif with_report:
+        # forked generals can only hand their report back through a pipe
+        report_queue = multiprocessing.Queue() \
+            if runtime in ('process', 'sharded', 'shm', 'tcp') \
+            else queue.SimpleQueue()
+
+    keyring = None
+    if signed:
+        if runtime in ('asyncio', 'sharded'):
+            logger.error('ERROR_SIGNED_RUNTIME')
+            if with_report:
+                return 'ERROR_SIGNED_RUNTIME', None
+            return 'ERROR_SIGNED_RUNTIME'
+        # created before forking, every general gets the keys of all
+        keyring = Keyring.generate(number_node)
+
+    # written into every message, so a late message of another run to a
+    # port the system handed out again is dropped
+    cluster_id = new_cluster_id()
+    logger.debug('cluster_id: %s', cluster_id)
+
+    if runtime == 'asyncio':
+        # the only runtime that needs asyncio, which is slow to import
+        import asyncio
+        import async_node
+        logger.info('Running all nodes and city on one event loop...')
+        result = asyncio.run(async_node.run_cluster(roles, order,
+                                                    round_timeout,
+                                                    max_traitors,
+                                                    wire_format,
+                                                    report_queue,
+                                                    cluster_id))
+        logger.info('Done')
+        if with_report:
+            return result, collect_report(result, report_queue,
+                                          number_node + 1, started,
+                                          round_timeout, marks, cluster_id)
+        return result
+
+    logger.info('Determining the ports that will be used...')
+    membership = None
+    if runtime == 'memory':
+        # the network belongs to this run only, so any port is free
+        network = MemoryNetwork()
+        starting_port = 1
+    elif runtime == 'shm':
+        # the segment is created before forking and holds the rings of
+        # every port pair, the city included
+        starting_port = 1
+        network = SharedMemoryNetwork(range(1, number_node + 2))
+    elif runtime == 'sharded':
+        # the generals only get virtual ports, see shard.start_shards
+        network = None
+        starting_port = 1
+    else:
+        network = None
+        if starting_port is None and pool is None:
+            # the generals bind port 0 and report the port they got
+            membership = Membership(number_node)
+    city_socket = None
+    if pool is not None or membership is not None:
+        # the city is bound before any general learns its port
+        city_socket = open_socket(0, wire.CODECS[wire_format].encoding,
+                                  coalesce=coalesce, reliable=reliable,
+                                  tcp=runtime == 'tcp')
+        city_port = node_port(city_socket)
+    else:
+        city_port = starting_port + number_node
+    if pool is not None:
+        # the workers are bound already, on ports picked by the system
+        pool_workers = pool.acquire(number_node)
+        port_used = [port for _, port in pool_workers]
+    elif membership is not None:
+        port_used = [0] * number_node
+    else:
+        port_used = [port for port in range(starting_port,
+                                            starting_port + number_node)]
+
+    # every general plus the city has to be bound before any order is sent,
+    # which they are once their ports are known
+    node_class = NodeThread if runtime == 'memory' else NodeProcess
+    if pool is not None or membership is not None:
+        barrier = None
+    elif runtime == 'memory':
+        barrier = threading.Barrier(len(port_used) + 1)
+    else:
+        barrier = multiprocessing.Barrier(len(port_used) + 1)
+
     logger.info('Start running multiple nodes...')
-    for node_id in range(4):
-        process = NodeProcess(target=node.main, args=(
-            roles[node_id],
-            node_id,
-            port_used,
-            starting_port + node_id,
-            order,
-            starting_port + 4
-        ))
-        process.start()
-        list_nodes.append(process)
+    running_nodes = []
+    marks['spawning'] = time.perf_counter()
+    if pool is not None:
+        random_state = random.getstate()
+        for node_id, (connection, port) in enumerate(pool_workers):
+            connection.send((dict(
+                is_traitor=roles[node_id], node_id=node_id, ports=port_used,
+                my_port=port, order=order, city_port=city_port,
+                round_timeout=round_timeout, max_traitors=max_traitors,
+                wire_format=wire_format, keyring=keyring,
+                cluster_id=cluster_id),
+                util.level, random_state, with_report))
+    elif runtime == 'sharded':
+        running_nodes, network, city_port = shard.start_shards(
+            roles, order, barrier, round_timeout, max_traitors, wire_format,
+            workers, NodeProcess, report_queue, cluster_id)
+        list_nodes.extend(running_nodes)
+    else:
+        for node_id in range(number_node):
+            process = node_class(target=node.main, args=(
+                roles[node_id],
+                node_id,
+                port_used,
+                port_used[node_id],
+                order,
+                city_port,
+                barrier,
+                round_timeout,
+                max_traitors,
+                wire_format,
+                network,
+                report_queue
+            ), kwargs=dict(coalesce=coalesce, reliable=reliable,
+                           tcp=runtime == 'tcp', keyring=keyring,
+                           cluster_id=cluster_id,
+                           membership=membership.node_connections[node_id]
+                           if membership is not None else None))
+            process.start()
+            running_nodes.append(process)
+            list_nodes.append(process)
+        if membership is not None:
+            try:
+                port_used = membership.gather(round_timeout)
+            except TimeoutError:
+                logger.error('A general did not report its port...')
+                for process in running_nodes:
+                    process.terminate()
+                    process.join(round_timeout)
+                membership.close()
+                city_socket.close()
+                raise
+            membership.distribute(port_used, city_port)
+    marks['spawned'] = time.perf_counter()
+    logger.debug('port_used: %s', port_used)
     logger.info('Done running multiple nodes...')
-    logger.debug(f'number of running processes: {len(list_nodes)}')
+    logger.debug('number of running processes: %s', len(list_nodes))
 
     logger.info('Running city...')
     number_general = roles.count(False)
-    logger.debug(f'number_general: {number_general}')
-    result = city.main(starting_port+4, number_general)
+    logger.debug('number_general: %s', number_general)
+    result = city.main(city_port, number_general, barrier,
+                       round_timeout, wire_format, network, report_queue,
+                       coalesce=coalesce, max_traitors=max_traitors,
+                       reliable=reliable, tcp=runtime == 'tcp',
+                       node_socket=city_socket, cluster_id=cluster_id)
+
+    report = None
+    if with_report:
+        # drain before joining, a process does not exit with a full pipe
+        report = collect_report(result, report_queue, number_node + 1,
+                                started, round_timeout, marks, cluster_id)
+
+    # the ports are only free again once every general has closed its socket
+    for process in running_nodes:
+        process.join(round_timeout)
+    if runtime in ('sharded', 'shm'):
+        network.close()
+    if membership is not None:
+        membership.close()
     logger.info('Done')
+    if with_report:
+        return result, report
     return result
 
 
+def collect_report(result, report_queue, number_report: int, started: float,
+                   round_timeout: float, marks: dict = None,
+                   cluster_id: int = None) -> dict:
+    """
+    - Collects the report of every node and builds the cluster report.
+    - A node that crashed sends no report, so waiting stops at the timeout.
+    - The queue of a prefork.WorkerPool outlives a run, a report of an
+    earlier run that came in after its collection stopped is dropped.
+
+    :param result: consensus of the city
+    :param report_queue: queue the nodes put their report in
+    :param number_report: number of generals plus the city
+    :param started: perf_counter value at the start of the run
+    :param round_timeout: seconds to wait for a single report
+    :param marks: perf_counter values of spawning and spawned, adds the
+        cold start breakdown to the report
+    :param cluster_id: id of the run, reports of other runs are dropped
+    :return: cluster report
+    """
+    wall_time = time.perf_counter() - started
+    reports = []
+    while len(reports) < number_report:
+        try:
+            node_report = report_queue.get(timeout=round_timeout)
+        except queue.Empty:
+            logger.error('a node did not send its report')
+            break
+        if cluster_id is not None and node_report.get('cluster') != cluster_id:
+            logger.warning('Dropping a report of cluster %s...',
+                           node_report.get('cluster'))
+            continue
+        reports.append(node_report)
+    report = metrics.cluster_report(result, reports, wall_time)
+    if marks and 'spawned' in marks:
+        report['cold_start'] = metrics.cold_start(started, marks, reports)
+    return report
+
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,83 @@
+"""
+Port allocation for clusters sharing a host.
+
+Instead of assuming a block of ports is free, every node binds port 0 and
+lets the system pick a free one. The node reports the port it got over a
+pipe, the parent gathers the ports of every node and sends the membership
+table (the port of every general and of the city) back to all of them.
+
+Every message carries the random id of its cluster as well, so a late
+message of a previous run to a port the system handed out again is
+dropped instead of being counted.
+"""
+import multiprocessing
+import secrets
+
+
+def new_cluster_id() -> int:
+    """
+    :return: random id, never 0 which means no cluster; independent of
+        the seeded random module
+    """
+    return secrets.randbelow(2 ** 32 - 1) + 1
+
+
+def node_port(node_socket) -> int:
+    """
+    :param node_socket: bound socket of node_socket
+    :return: port the socket is bound to
+    """
+    return node_socket.sc.getsockname()[1]
+
+
+class Membership:
+    """
+    Parent side of the allocation, one pipe per node.
+    """
+
+    def __init__(self, number_node: int):
+        pipes = [multiprocessing.Pipe() for _ in range(number_node)]
+        self.connections = [parent for parent, _ in pipes]
+        # handed to the nodes, one each
+        self.node_connections = [child for _, child in pipes]
+
+    def gather(self, timeout: float) -> list:
+        """
+        - Waits for the port of every node.
+
+        :param timeout: seconds to wait for a single node
+        :return: list of ports, indexed by node id
+        :raises TimeoutError: when a node did not report its port
+        """
+        ports = []
+        for node_id, connection in enumerate(self.connections):
+            if not connection.poll(timeout):
+                raise TimeoutError(f'node {node_id} did not report its port')
+            ports.append(connection.recv())
+        return ports
+
+    def distribute(self, ports: list, city_port: int):
+        """
+        :param ports: port of every general
+        :param city_port: port of the city
+        :return: None
+        """
+        for connection in self.connections:
+            connection.send((ports, city_port))
+
+    def close(self):
+        for connection in self.connections + self.node_connections:
+            connection.close()
+
+
+def join(connection, node_socket) -> tuple:
+    """
+    - Node side of the allocation: reports the port of node_socket and
+    waits for the membership table.
+
+    :param connection: pipe of this node from Membership.node_connections
+    :param node_socket: socket bound to port 0
+    :return: port of every general and port of the city
+    """
+    connection.send(node_port(node_socket))
+    return connection.recv()
@@ -0,0 +1,108 @@
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+COUNTERS = ('messages_sent', 'bytes_sent', 'messages_received',
+            'bytes_received', 'datagrams_sent', 'datagrams_received',
+            'retransmissions', 'duplicates')
+
+
+class Metrics:
+    """
+    Phase timings of a single node, in seconds.
+    """
+
+    def __init__(self):
+        self.phases = {}
+        # relay round -> seconds after listening started its last order came in
+        self.rounds = {}
+        self.started = {}
+        # event -> perf_counter value, comparable across the processes of
+        # a run where perf_counter is a system-wide clock (Linux)
+        self.marks = {}
+
+    def start(self, phase: str):
+        self.started[phase] = time.perf_counter()
+
+    def elapsed(self, phase: str) -> float:
+        started = self.started.get(phase)
+        return 0.0 if started is None else time.perf_counter() - started
+
+    def stop(self, phase: str):
+        if phase in self.started:
+            self.phases[phase] = self.elapsed(phase)
+
+    def mark(self, event: str):
+        self.marks[event] = time.perf_counter()
+
+    def round_done(self, relay_round: int):
+        self.rounds[relay_round] = self.elapsed('listen')
+
+
+def peak_rss() -> int:
+    """
+    - Peak resident set size of this process. Generals running as threads
+    or coroutines share the process, so they all report the same value.
+
+    :return: kilobytes, None where the platform does not provide it
+    """
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def socket_counters(node_socket) -> dict:
+    """
+    :param node_socket: any socket of node_socket
+    :return: dictionary of the message and byte counters of the socket
+    """
+    return {counter: getattr(node_socket, counter, 0) for counter in COUNTERS}
+
+
+def cold_start(started: float, marks: dict, node_reports: list) -> dict:
+    """
+    - Where the time before the first order goes, in seconds since
+    started: preparing the run, starting the generals, until every node
+    is bound and past the barrier, until the supreme general sends.
+
+    :param started: perf_counter value at the start of the run
+    :param marks: perf_counter values of main.execution, spawning and
+        spawned
+    :param node_reports: list of General.report() and City.report()
+    :return: dictionary
+    """
+    ready = [node_report['marks']['ready'] for node_report in node_reports
+             if 'ready' in node_report.get('marks', {})]
+    first = [node_report['marks']['first_message']
+             for node_report in node_reports
+             if 'first_message' in node_report.get('marks', {})]
+    breakdown = {'prepare': marks['spawning'] - started,
+                 'spawn': marks['spawned'] - marks['spawning']}
+    if ready:
+        breakdown['ready'] = max(ready) - started
+    if first:
+        breakdown['first_message'] = min(first) - started
+    return breakdown
+
+
+def cluster_report(consensus: str, node_reports: list,
+                   wall_time: float) -> dict:
+    """
+    - Structured report of a run: the consensus, the report of every node
+    and the totals of their counters.
+
+    :param consensus: what the city concluded
+    :param node_reports: list of General.report() and City.report()
+    :param wall_time: seconds main.execution took
+    :return: dictionary
+    """
+    report = {'consensus': consensus, 'wall_time': wall_time,
+              'nodes': {node_report['name']: node_report
+                        for node_report in node_reports}}
+    for counter in COUNTERS:
+        report[counter] = sum(node_report.get(counter, 0)
+                              for node_report in node_reports)
+    return report
@@ -1,166 +1,507 @@
+import logging
 import pprint
 import random
+import socket
 import threading
-from pprint import pformat
 import time
+from pprint import pformat
 
-from node_socket import UdpSocket
+import wire
+from decision import DUPLICATE, RECORDED, EigLayout, EigTree
+from metrics import Metrics, peak_rss, socket_counters
+from membership import join
+from node_socket import UdpSocket, open_socket, time_left
 from util import get_logger
+from wire import message_path, sender_name
 
 logger = get_logger('main')
 
+# seconds a node waits for the cluster barrier or for a relay round, a
+# lieutenant gives up on the orders still missing after (m + 1) rounds
+ROUND_TIMEOUT = 5.0
+
 
 class Order:
     RETREAT = 0
     ATTACK = 1
 
 
+def expected_messages(number_general: int, max_traitors: int) -> int:
+    """
+    - Number of orders a lieutenant receives during OM(max_traitors),
+    one per path of distinct generals starting at the supreme general.
+
+    :param number_general: number of generals including the supreme general
+    :param max_traitors: m, the number of relay rounds
+    :return: int
+    """
+    total, paths = 0, 1
+    for relay_round in range(max_traitors + 1):
+        total += paths
+        paths *= number_general - 2 - relay_round
+    return total
+
+
+class InstanceState:
+    """
+    What a general received during a single consensus instance.
+    """
+
+    __slots__ = ('orders', 'eig', 'round_messages', 'received', 'deadline')
+
+    def __init__(self, eig: EigTree, deadline: float = None):
+        self.orders = []
+        # information gathering tree of OM(m): path of relaying generals -> order
+        self.eig = eig
+        # number of orders received per round, the round being the path length
+        self.round_messages = {}
+        self.received = 0
+        # time.monotonic() value after which missing orders count as RETREAT
+        self.deadline = deadline
+
+
 class General:
 
     def __init__(self, my_id: int, is_traitor: bool, my_port: int,
                  ports: list, node_socket: UdpSocket, city_port: int,
-                 order=None, log_name=None):
+                 order=None, log_name=None, barrier=None,
+                 round_timeout: float = ROUND_TIMEOUT,
+                 max_traitors: int = 1, codec=wire.TEXT, window: int = 1):
+        self.metrics = Metrics()
+        self.metrics.start('startup')
         self.my_id = my_id
         self.ports = ports
         self.city_port = city_port
         self.node_socket = node_socket
         self.my_port = my_port
         self.is_traitor = is_traitor
-        self.orders = []
         self.order = order
+        self.barrier = barrier
+        self.round_timeout = round_timeout
+        self.max_traitors = max_traitors
+        self.codec = codec
+        # instance id -> InstanceState, a one-shot run only uses instance 0
+        self.instances = {}
+        self.eig_layout = EigLayout(self.lieutenants(), max_traitors)
+        # number of instances that may be in flight at the same time
+        self.window = window
+        # ids of the last instances concluded, the orders still on their
+        # way to an instance concluded early are dropped
+        self.concluded = set()
 
         if log_name is None:
             log_name = f'general{my_id}'
+        self.name = log_name
         self.logger = get_logger(log_name)
 
         self.general_port_dictionary = {}
-        for i in range(0, 4):
+        for i in range(0, len(ports)):
             self.general_port_dictionary[i] = ports[i]
-        self.logger.debug('self.general_port_dictionary: '
-                          f'{pformat(self.general_port_dictionary)}')
 
         self.port_general_dictionary = {}
         for key, value in self.general_port_dictionary.items():
             self.port_general_dictionary[value] = key
-        self.logger.debug(f'self.port_general_dictionary: '
-                          f'{pprint.pformat(self.port_general_dictionary)}')
+
+        # pformat of large clusters is costly, skip it unless it is logged
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug('self.general_port_dictionary: '
+                              f'{pformat(self.general_port_dictionary)}')
+            self.logger.debug(f'self.port_general_dictionary: '
+                              f'{pprint.pformat(self.port_general_dictionary)}')
 
         if self.my_id > 0:
             self.logger.info(f'General {self.my_id} is running...')
         else:
             self.logger.info('Supreme general is running...')
-        self.logger.debug(f'is_traitor: {self.is_traitor}')
-        self.logger.debug(f'ports: {pformat(self.ports)}')
-        self.logger.debug(f'my_port: {self.my_port}')
-        self.logger.debug(f'is_supreme_general: {self.my_id == 0}')
-        if self.order:
-            self.logger.debug(f'order: {self.order}')
-        self.logger.debug(f'city_port: {self.city_port}')
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f'is_traitor: {self.is_traitor}')
+            self.logger.debug(f'ports: {pformat(self.ports)}')
+            self.logger.debug(f'my_port: {self.my_port}')
+            self.logger.debug(f'is_supreme_general: {self.my_id == 0}')
+            self.logger.debug(f'max_traitors: {self.max_traitors}')
+            self.logger.debug(f'wire format: {self.codec.name}')
+            if self.order:
+                self.logger.debug(f'order: {self.order}')
+            self.logger.debug(f'city_port: {self.city_port}')
 
     def close_connection(self):
         self.node_socket.close()
 
+    def instance(self, instance_id: int) -> InstanceState:
+        """
+        - State of an instance, created on its first message.
+        - A loyal general never has more than window instances pending,
+        so the oldest one is evicted to keep the table bounded when a
+        lagging traitor or a lost message would let it grow.
+
+        :param instance_id: consensus instance
+        :return: InstanceState
+        """
+        if instance_id not in self.instances:
+            if len(self.instances) >= self.window:
+                evicted = min(self.instances)
+                self.logger.warning('Evicting unfinished instance %s...',
+                                    evicted)
+                del self.instances[evicted]
+            self.instances[instance_id] = InstanceState(
+                self.new_tree(), self.listen_deadline())
+        return self.instances[instance_id]
+
+    def new_tree(self):
+        return EigTree(self.eig_layout)
+
+    def instance_done(self, instance_id: int) -> bool:
+        """
+        - Every order of the rounds this general relays has to be in, the
+        orders of the last round only count for its own decision and are
+        not waited for once they can no longer change it.
+
+        :param instance_id: consensus instance
+        :return: True once no order of the instance can change the decision
+        """
+        eig = self.instance(instance_id).eig
+        return eig.complete() and eig.settled()
+
+    def finish_instance(self, instance_id: int):
+        """
+        - Concludes an instance and forgets it.
+
+        :param instance_id: consensus instance
+        :return: None
+        """
+        self.action_procedure(instance_id)
+        del self.instances[instance_id]
+        self.concluded.add(instance_id)
+        if len(self.concluded) > self.window:
+            self.concluded.remove(min(self.concluded))
+
+    def listen_deadline(self) -> float:
+        """
+        :return: time.monotonic() value by which every order of an instance
+            starting now is due, one round_timeout per relay round
+        """
+        return time.monotonic() + self.round_timeout * (self.max_traitors + 1)
+
+    @property
+    def orders(self) -> list:
+        return self.instance(0).orders
+
+    @property
+    def eig(self) -> dict:
+        return self.instance(0).eig
+
+    @property
+    def round_messages(self) -> dict:
+        return self.instance(0).round_messages
+
+    def wait_until_ready(self):
+        """
+        - Announces that this node is bound and listening, then blocks
+        until every other node and the city have done the same.
+
+        :return: None
+        """
+        if self.barrier is not None:
+            self.logger.info('Waiting for all nodes to be ready...')
+            self.barrier.wait(self.round_timeout)
+            self.logger.info('All nodes are ready...')
+        self.metrics.stop('startup')
+        self.metrics.mark('ready')
+
+    def report(self) -> dict:
+        """
+        - Phase timings and message counters of this general.
+
+        :return: dictionary
+        """
+        return dict(name=self.name, is_traitor=self.is_traitor,
+                    cluster=self.codec.cluster,
+                    phases=self.metrics.phases, rounds=self.metrics.rounds,
+                    marks=self.metrics.marks, peak_rss_kb=peak_rss(),
+                    **socket_counters(self.node_socket))
+
     def start(self):
 
         """
         - Listen to all generals and distribute message to all your neighbor.
+        - Stops listening at the deadline, or as soon as the instance is done.
 
         :return: None
         """
 
         self.logger.info(f"General {self.my_id} is starting...")
+        self.wait_until_ready()
         self.logger.info("Start listening for incoming messages...")
 
-        time.sleep(3)
-        for _ in range(3):
-            msg = self.listen_procedure()
-            self.sending_procedure(msg[0], int(msg[1].split("=")[1]))
+        self.metrics.start('listen')
+        deadline = self.listen_deadline()
+        for _ in range(expected_messages(len(self.ports), self.max_traitors)):
+            msg = self.listen_procedure(deadline)
+            if msg is None:
+                break
+            self.relay_procedure(msg)
+            if self.instance_done(0):
+                break
+        self.metrics.stop('listen')
+
+        self.action_procedure()
 
+    def serve(self, command_queue=None):
+        """
+        - Long-lived counterpart of start: takes part in one instance
+        after another until the supreme general stops the cluster.
+        - An instance is concluded and forgotten as soon as all of its
+        orders are in, or with RETREAT for the missing ones once its
+        deadline has passed.
+
+        :param command_queue: unused, only the supreme general takes commands
+        :return: None
+        """
+        self.logger.info(f"General {self.my_id} is serving...")
+        self.wait_until_ready()
+
+        while True:
+            # an idle cluster waits for the next instance as long as it takes
+            deadline = min((state.deadline
+                            for state in self.instances.values()),
+                           default=None)
+            try:
+                message, _ = self.node_socket.listen(time_left(deadline))
+            except socket.timeout:
+                self.expire_instances()
+                continue
+
+            msg = self.receive_procedure(message)
+            if msg is None:
+                continue
+            if msg.kind == wire.STOP:
+                break
+
+            self.relay_procedure(msg)
+            if self.instance_done(msg.instance):
+                self.finish_instance(msg.instance)
+        self.logger.info('Stopped serving...')
+
+    def expire_instances(self):
+        """
+        - Concludes every instance whose deadline has passed.
+
+        :return: None
+        """
+        now = time.monotonic()
+        for instance_id in sorted(self.instances):
+            if self.instances[instance_id].deadline <= now:
+                self.logger.warning('Deadline of instance %s passed, missing '
+                                    'orders count as RETREAT...', instance_id)
+                self.finish_instance(instance_id)
+
+    def relay_procedure(self, msg):
+        """
+        - Passes a received message on to sending_procedure.
+
+        :param msg: decoded message
+        :return: list of sent messages or None
+        """
+        return self.sending_procedure(sender_name(msg.sender), msg.order,
+                                      msg.path, msg.instance)
+
+    def action_procedure(self, instance_id: int = 0):
+        """
+        - Concludes the received orders and does the action.
+
+        :param instance_id: consensus instance to conclude
+        :return: None
+        """
+        self.logger.info('Messages received per round of instance %s: %s',
+                         instance_id, self.instance(instance_id).round_messages)
         self.logger.info(f'Concluding action...')
-        conclusion = self.conclude_action(self.orders)
+        self.metrics.start('conclusion')
+        orders = self.resolve_orders((0,), instance_id)
+        self.conclude_action(orders, instance_id)
+        self.metrics.stop('conclusion')
 
         if self.is_traitor:
             action_message = "I am a traitor..."
         else:
-            action = "RETREAT" if conclusion.split("=")[1] == "0" else "ATTACK"
+            action = "RETREAT" if majority(orders) == Order.RETREAT else "ATTACK"
             action_message = f"action: {action}\nDone doing my action..."
 
         self.logger.info(action_message)
 
-    def listen_procedure(self):
+    def listen_procedure(self, deadline: float = None):
 
         """
         - Receives a message
 
-        :return: list of splitted message
+        :param deadline: time.monotonic() value to stop waiting at,
+            a single round_timeout from now if None
+        :return: decoded message, the list of splitted message in text format,
+            None once the deadline has passed
         """
 
-        msg = self.node_socket.listen()[0].split('~')
+        if deadline is None:
+            deadline = time.monotonic() + self.round_timeout
+        while True:
+            try:
+                message, _ = self.node_socket.listen(time_left(deadline))
+            except socket.timeout:
+                self.logger.warning('Deadline passed, missing orders count '
+                                    'as RETREAT...')
+                return None
+            msg = self.receive_procedure(message)
+            if msg is not None:
+                return msg
+
+    def receive_procedure(self, message):
+        """
+        - Records an order received as message
 
-        self.logger.info(f'Got incoming message from {msg[0]}: {msg}')
-        self.logger.info(f"Append message to a list: {self.orders}")
+        :param message: message as received from the socket
+        :return: decoded message, the list of splitted message in text format,
+            None for a malformed message or one of another cluster
+        """
 
-        order = int(msg[1].split("=")[1])
-        self.orders.append(order)
+        msg = self.decode(message)
+        if msg is None or self.foreign(msg):
+            return None
+
+        # lazy arguments, nothing is formatted when INFO is disabled
+        self.logger.info('Got incoming message from %s: %s',
+                         sender_name(msg.sender), msg)
+        if msg.kind == wire.STOP:
+            return msg
+        if msg.instance in self.concluded:
+            self.logger.debug('Instance %s is concluded already...',
+                              msg.instance)
+            return None
+
+        order = msg.order
+        path = msg.path
+        if not path or path[-1] != msg.sender:
+            # a general only relays in its own name, otherwise a traitor
+            # could pass an order off as relayed by a loyal general
+            self.logger.warning('Dropping an order of %s relayed along %s...',
+                                sender_name(msg.sender), path)
+            return None
+
+        state = self.instance(msg.instance)
+        outcome = state.eig.record(path, order)
+        if outcome != RECORDED:
+            self.logger.warning('Dropping %s order relayed along %s...',
+                                'a duplicate' if outcome == DUPLICATE
+                                else 'an invalid', path)
+            return None
+
+        self.logger.info("Append message to a list: %s", state.orders)
+        state.orders.append(order)
+        state.round_messages[len(path)] = \
+            state.round_messages.get(len(path), 0) + 1
+        state.received += 1
+        self.metrics.round_done(len(path))
 
         return msg
 
+    def decode(self, message):
+        """
+        :param message: message as received from the socket
+        :return: decoded message, None for a malformed one
+        """
+        try:
+            return wire.decode_strict(self.codec, message)
+        except wire.MALFORMED as error:
+            self.logger.warning('Dropping a malformed message: %s...', error)
+            return None
+
+    def foreign(self, msg) -> bool:
+        """
+        :param msg: decoded message
+        :return: True for a message of another cluster, i.e. a late one
+            of a previous run to a port that was handed out again
+        """
+        if msg.cluster == self.codec.cluster:
+            return False
+        self.logger.warning('Dropping a message of cluster %s...',
+                            msg.cluster)
+        return True
+
+    def lieutenants(self):
+        return [general_id for general_id in range(1, len(self.ports))
+                if general_id != self.my_id]
+
+    def resolve_orders(self, path: tuple, instance_id: int = 0) -> list:
+        """
+        - Collects the orders OM(m) takes the majority of for the value
+        relayed along path: the order received through path itself and
+        the recursively resolved order of every relay of it.
+        - A missing order counts as RETREAT.
+
+        :param path: tuple of general ids
+        :param instance_id: consensus instance the orders belong to
+        :return: list of orders
+        """
+        return self.instance(instance_id).eig.orders(path)
+
     def get_random_order(self):
         return random.choice([Order.ATTACK, Order.RETREAT])
 
-    def sending_procedure(self, sender, order):
+    def sending_procedure(self, sender, order, path=None, instance_id=0):
         """
-        Sends message (order) to all your neighbor except the sender and the first port in your list.
-        If the sender is the supreme general, sends the order to other generals using threading.
+        Sends message (order) to all your neighbor that are not yet in the path of the message.
+        Only orders that went through at most m generals are relayed, which means
+        for OM(1) only the order of the supreme general is relayed.
         If this node is a traitor, it may send a different order.
 
         :param sender: sender id
         :param order: order
+        :param path: tuple of general ids the order went through, derived from sender if None
+        :param instance_id: consensus instance the order belongs to
         :return: list of sent messages
         """
 
-        # Only proceed if the sender is the supreme general
-        if sender != "supreme_general":
+        if path is None:
+            path = message_path([sender])
+
+        # Only proceed if the order still has relay rounds left
+        if len(path) > self.max_traitors:
             return None
 
-        self.logger.info("Send supreme general order to other generals with threading...")
+        self.logger.info("Relay order of %s to other generals...", sender)
+        relay_path = path + (self.my_id,)
         sent_messages = []
-        for index, target_port in enumerate(self.ports):
-            if index == 0 or target_port == self.my_port: continue
+        target_ports = []
+        for index in self.lieutenants():
+            if index in path: continue
+            target_ports.append(self.ports[index])
 
-            final_order = str(
-                self.get_random_order()) if self.is_traitor else order
-            message = f"general_{self.my_id}~order={final_order}"
+            final_order = self.get_random_order() if self.is_traitor else order
+            message = self.codec.encode_order(self.my_id, final_order,
+                                              relay_path, instance_id)
 
-            self.logger.info(f"message: {message}")
-            self.logger.info(f'Initiate threading to send the message...')
-            self.logger.info(f'Start threading...')
+            self.logger.info("message: %s", message)
+            self.logger.info('Initiate threading to send the message...')
+            self.logger.info('Start threading...')
             sent_messages.append(message)
 
-            self.node_socket.send(message, target_port)
-            self.logger.info(f"Done sending message to general {index}...")
+        self.node_socket.send_many(sent_messages, target_ports)
+        self.logger.info("Done sending message to ports %s...", target_ports)
 
         return sent_messages
 
-    def _most_common(self, lst):
-        return max(set(lst), key=lst.count)
-
-    def conclude_action(self, orders):
+    def conclude_action(self, orders, instance_id=0):
         """
         Makes a conclusion based on received orders and sends the conclusion to the city as a form of consensus.
 
         :param orders: list of orders where 0 indicates retreat and any other value indicates attack
+        :param instance_id: consensus instance the orders belong to
         :return: a conclusion message sent to the city
         """
 
-        num_retreats = orders.count(0)
-        num_attacks = len(orders) - num_retreats
-
         if self.is_traitor:
             return None
 
-        action = 1 if num_attacks > num_retreats else 0
-        conclusion_message = f"general_{self.my_id}~action={action}"
+        action = majority(orders)
+        conclusion_message = self.codec.encode_action(self.my_id, action,
+                                                      instance_id)
         self.node_socket.send(conclusion_message, self.city_port)
 
         return conclusion_message
@@ -179,12 +520,18 @@ class SupremeGeneral(General):
         """
         self.logger.info("Supreme general is starting...")
         self.logger.info("Wait until all generals are running...")
+        self.wait_until_ready()
 
+        self.metrics.start('broadcast')
+        self.metrics.mark('first_message')
         self.sending_procedure("supreme_general", self.order)
+        self.metrics.stop('broadcast')
         self.logger.info("Concluding action...")
 
         # Conclude and send the final action based on consensus
+        self.metrics.start('conclusion')
         conclusion = self.conclude_action(self.orders)
+        self.metrics.stop('conclusion')
 
         # for debugging
         if conclusion is not None:
@@ -192,33 +539,74 @@ class SupremeGeneral(General):
         else:
             self.logger.debug("No conclusion reached (traitor mode).")
 
-    def sending_procedure(self, sender, order):
+    def serve(self, command_queue=None):
+        """
+        - Long-lived counterpart of start: proposes every order taken from
+        command_queue as a new instance until it gets None, then stops
+        every lieutenant and the city.
+
+        :param command_queue: queue of (instance id, order) tuples
+        :return: None
+        """
+        self.logger.info("Supreme general is serving...")
+        self.wait_until_ready()
+
+        while True:
+            command = command_queue.get()
+            if command is None:
+                break
+
+            instance_id, order = command
+            self.logger.info('Proposing instance %s...', instance_id)
+            self.order = order
+            self.sending_procedure("supreme_general", order, instance_id)
+            self.conclude_action([], instance_id)
+
+        self.stop_procedure()
+        self.logger.info('Stopped serving...')
+
+    def stop_procedure(self):
+        """
+        - Tells every lieutenant and the city to stop serving.
+
+        :return: None
+        """
+        ports = self.ports[1:] + [self.city_port]
+        self.node_socket.send_many([self.codec.encode_stop(0)] * len(ports),
+                                   ports)
+
+    def sending_procedure(self, sender, order, instance_id=0):
         """
         - Sends order for every generals.
 
         :param sender: sender id
         :param order: order
+        :param instance_id: consensus instance the order belongs to
         :return: list of sent orders
         """
         sent_orders = []
-        for general_index in range(1, 4):
-            time.sleep(1)
+        messages = []
+        for general_index in range(1, len(self.ports)):
             final_order = self.get_random_order() if self.is_traitor else order
-            message = f"{sender}~order={final_order}"
+            message = self.codec.encode_order(0, final_order, (0,),
+                                              instance_id)
             sent_orders.append(final_order)
-            self.node_socket.send(message, self.ports[general_index])
-            self.logger.info(f"Send message to general {general_index} with port {self.ports[general_index]}")
+            messages.append(message)
+            self.logger.info("Send message to general %s with port %s",
+                             general_index, self.ports[general_index])
 
+        self.node_socket.send_many(messages, self.ports[1:])
         self.logger.info("Finished sending messages to other generals.")
         return sent_orders
 
-    def conclude_action(self, orders):
+    def conclude_action(self, orders, instance_id=0):
         """
         - This means the logic to make a conclusion
         for supreme general is different.
         - Sends the conclusion to the city as a form of consensus.
 
         :param orders: list
+        :param instance_id: consensus instance the order belongs to
         :return: str or None
         """
 
@@ -229,7 +617,8 @@ class SupremeGeneral(General):
         action_description = "RETREAT from the city..." if self.order == 0 else "ATTACK the city..."
         self.logger.info(action_description)
 
-        conclusion_message = f"supreme_general~action={self.order}"
+        conclusion_message = self.codec.encode_action(0, self.order,
+                                                      instance_id)
         self.node_socket.send(conclusion_message, self.city_port)
         self.logger.info("Send information to city...")
         self.logger.info("Done sending information...")
@@ -237,6 +626,201 @@ class SupremeGeneral(General):
         return conclusion_message
 
 
+class SignedGeneral(General):
+    """
+    Lieutenant of SM(m), the signed messages algorithm. It accepts an order
+    only with a valid signature of every general of its path, relays every
+    order it accepts for the first time with its own signature appended,
+    and no order signed by m + 1 generals already. As an altered order
+    fails the verification, SM(m) agrees for any number of generals above
+    m + 1 and every general relays each order at most once.
+
+    The rounds are timed: the decision is taken at the deadline of the
+    instance, or as soon as both orders are accepted.
+    """
+
+    def __init__(self, *args, keyring=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # own verification cache, shared keys
+        self.keyring = keyring.copy()
+
+    def new_tree(self):
+        # the accepted orders are kept in InstanceState.orders instead
+        return None
+
+    def instance_done(self, instance_id: int) -> bool:
+        return len(self.instance(instance_id).orders) == 2
+
+    def start(self):
+        """
+        - Listens and relays until the deadline or until both orders are
+        accepted, then concludes.
+
+        :return: None
+        """
+        self.logger.info(f"General {self.my_id} is starting...")
+        self.wait_until_ready()
+        self.logger.info("Start listening for incoming messages...")
+
+        self.metrics.start('listen')
+        deadline = self.listen_deadline()
+        while not self.instance_done(0):
+            msg = self.listen_procedure(deadline)
+            if msg is None:
+                break
+            self.relay_procedure(msg)
+        self.metrics.stop('listen')
+
+        self.action_procedure()
+
+    def receive_procedure(self, message):
+        """
+        - Counts an order received as message, relay_procedure decides
+        whether it is accepted.
+
+        :param message: message as received from the socket
+        :return: decoded message, None for a malformed message or one of
+            another cluster
+        """
+        msg = self.decode(message)
+        if msg is None or self.foreign(msg):
+            return None
+        self.logger.info('Got incoming message from %s: %s',
+                         sender_name(msg.sender), msg)
+        if msg.kind == wire.STOP:
+            return msg
+
+        state = self.instance(msg.instance)
+        path = msg.path
+        state.round_messages[len(path)] = \
+            state.round_messages.get(len(path), 0) + 1
+        state.received += 1
+        self.metrics.round_done(len(path))
+        return msg
+
+    def relay_procedure(self, msg):
+        """
+        - Accepts the order of msg if it is new and signed by every general
+        of its path, then relays it.
+
+        :param msg: decoded message
+        :return: list of sent messages or None
+        """
+        state = self.instance(msg.instance)
+        order, path = msg.order, msg.path
+        if order in state.orders:
+            return None
+        if len(path) > self.max_traitors + 1 or self.my_id in path or \
+                len(set(path)) != len(path) or \
+                not self.keyring.verify_chain(path, order, msg.instance,
+                                              msg.signatures):
+            self.logger.warning('Rejecting order %s relayed along %s...',
+                                order, path)
+            return None
+
+        state.orders.append(order)
+        return self.sending_procedure(sender_name(msg.sender), order, path,
+                                      msg.instance, msg.signatures)
+
+    def resolve_orders(self, path: tuple, instance_id: int = 0) -> list:
+        """
+        - The accepted orders, their majority is the order if a single one
+        was accepted and RETREAT otherwise.
+
+        :param path: unused, SM(m) has no tree of relays
+        :param instance_id: consensus instance
+        :return: list of at most two orders
+        """
+        return self.instance(instance_id).orders
+
+    def sending_procedure(self, sender, order, path=None, instance_id=0,
+                          signatures=()):
+        """
+        - Relays a signed order to every lieutenant not on its path, unless
+        m + 1 generals signed it already.
+        - A traitor relays a random order, which fails the verification
+        of the receivers when it differs from the signed one.
+
+        :param sender: sender id
+        :param order: accepted order
+        :param path: tuple of general ids that signed the order
+        :param instance_id: consensus instance the order belongs to
+        :param signatures: signatures the order was received with
+        :return: list of sent messages or None
+        """
+        if path is None:
+            path = message_path([sender])
+        if len(path) > self.max_traitors:
+            return None
+
+        self.logger.info("Relay signed order of %s to other generals...",
+                         sender)
+        relay_path = path + (self.my_id,)
+        sent_messages = []
+        target_ports = []
+        for index in self.lieutenants():
+            if index in path:
+                continue
+            final_order = self.get_random_order() if self.is_traitor \
+                else order
+            message = self.codec.encode_order(
+                self.my_id, final_order, relay_path, instance_id,
+                self.keyring.sign_chain(self.my_id, final_order, instance_id,
+                                        signatures))
+            target_ports.append(self.ports[index])
+            sent_messages.append(message)
+
+        self.node_socket.send_many(sent_messages, target_ports)
+        self.logger.info("Done sending message to ports %s...", target_ports)
+        return sent_messages
+
+
+class SignedSupremeGeneral(SupremeGeneral):
+    """
+    Supreme general of SM(m), signs every order it sends.
+    """
+
+    def __init__(self, *args, keyring=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.keyring = keyring.copy()
+
+    def sending_procedure(self, sender, order, instance_id=0):
+        """
+        - Sends a signed order to every general, a traitor signs a random
+        order for each of them.
+
+        :param sender: sender id
+        :param order: order
+        :param instance_id: consensus instance the order belongs to
+        :return: list of sent orders
+        """
+        sent_orders = []
+        messages = []
+        for general_index in range(1, len(self.ports)):
+            final_order = self.get_random_order() if self.is_traitor else order
+            message = self.codec.encode_order(
+                0, final_order, (0,), instance_id,
+                self.keyring.sign_chain(0, final_order, instance_id))
+            sent_orders.append(final_order)
+            messages.append(message)
+            self.logger.info("Send signed message to general %s with port "
+                             "%s", general_index, self.ports[general_index])
+
+        self.node_socket.send_many(messages, self.ports[1:])
+        self.logger.info("Finished sending messages to other generals.")
+        return sent_orders
+
+
+def majority(orders: list) -> int:
+    """
+    :param orders: list of orders where 0 indicates retreat and any other value indicates attack
+    :return: ATTACK if strictly more than half of the orders are attacks, otherwise RETREAT
+    """
+    num_retreats = orders.count(0)
+    num_attacks = len(orders) - num_retreats
+    return Order.ATTACK if num_attacks > num_retreats else Order.RETREAT
+
+
 def thread_exception_handler(args):
     logger.error('Uncaught exception', exc_info=(args.exc_type,
                                                  args.exc_value,
@@ -245,27 +829,68 @@ def thread_exception_handler(args):
 
 def main(is_traitor: bool, node_id: int, ports: list,
          my_port: int = 0, order: Order = Order.RETREAT,
-         city_port: int = 0):
+         city_port: int = 0, barrier=None,
+         round_timeout: float = ROUND_TIMEOUT, max_traitors: int = 1,
+         wire_format: str = 'text', network=None, report_queue=None,
+         persistent: bool = False, command_queue=None, window: int = 1,
+         coalesce: bool = False, reliable: bool = False,
+         tcp: bool = False, keyring=None, node_socket=None,
+         cluster_id: int = 0, membership=None):
+    """
+    :param keyring: signing.Keyring, runs SM(m) instead of OM(m) if given
+    :param node_socket: socket bound to my_port already, see prefork
+    :param cluster_id: written into every message, messages of another
+        cluster are dropped
+    :param membership: pipe of membership.Membership, binds port 0 and
+        takes ports and city_port from it instead of the arguments
+    """
     threading.excepthook = thread_exception_handler
+    codec = wire.CODECS[wire_format]
+    if cluster_id:
+        codec = codec.for_cluster(cluster_id)
+    signed = {} if keyring is None else dict(keyring=keyring)
+    if node_socket is None:
+        node_socket = open_socket(0 if membership is not None else my_port,
+                                  codec.encoding, network, coalesce,
+                                  reliable, tcp)
+    if membership is not None:
+        ports, city_port = join(membership, node_socket)
+        my_port = ports[node_id]
     try:
         if node_id == 0:
-            obj = SupremeGeneral(my_id=node_id,
-                                 city_port=city_port,
-                                 is_traitor=is_traitor,
-                                 node_socket=UdpSocket(my_port),
-                                 my_port=my_port,
-                                 ports=ports, order=order)
+            supreme_class = SupremeGeneral if keyring is None \
+                else SignedSupremeGeneral
+            obj = supreme_class(my_id=node_id,
+                                city_port=city_port,
+                                is_traitor=is_traitor,
+                                node_socket=node_socket,
+                                my_port=my_port,
+                                ports=ports, order=order,
+                                barrier=barrier,
+                                round_timeout=round_timeout,
+                                max_traitors=max_traitors,
+                                codec=codec, window=window, **signed)
+        else:
+            general_class = General if keyring is None else SignedGeneral
+            obj = general_class(my_id=node_id,
+                                city_port=city_port,
+                                is_traitor=is_traitor,
+                                node_socket=node_socket,
+                                my_port=my_port,
+                                ports=ports,
+                                barrier=barrier,
+                                round_timeout=round_timeout,
+                                max_traitors=max_traitors,
+                                codec=codec, window=window, **signed)
+        if persistent:
+            obj.serve(command_queue)
         else:
-            obj = General(my_id=node_id,
-                          city_port=city_port,
-                          is_traitor=is_traitor,
-                          node_socket=UdpSocket(my_port),
-                          my_port=my_port,
-                          ports=ports)
-        obj.start()
+            obj.start()
     except Exception:
         logger.exception('Caught Error')
         raise
 
     finally:
         obj.close_connection()
+        if report_queue is not None:
+            report_queue.put(obj.report())
@@ -1,5 +1,61 @@
+import collections
+import multiprocessing
+import queue
+import selectors
 import socket
+import struct
 import threading
+import time
+from multiprocessing import shared_memory
+
+# makes recvfrom_into return the full size of a datagram that did not fit,
+# Linux only, elsewhere such a datagram is truncated
+MSG_TRUNC = getattr(socket, 'MSG_TRUNC', 0)
+
+
+def encode(message, encoding: str = 'UTF-8') -> bytes:
+    # binary wire format messages are already bytes
+    return message.encode(encoding) if isinstance(message, str) else message
+
+
+def decode(data, encoding: str = 'UTF-8'):
+    # str() decodes a memoryview of the receive buffer without copying it
+    return str(data, encoding) if encoding else data
+
+
+def time_left(deadline: float = None) -> float:
+    """
+    - Timeout for a receive that has to be done by deadline.
+
+    :param deadline: time.monotonic() value, None for no deadline
+    :return: seconds until deadline, None without a deadline
+    :raises socket.timeout: once the deadline has passed
+    """
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise socket.timeout('deadline passed')
+    return remaining
+
+
+class MessageCounter:
+    """
+    Number of messages, datagrams and bytes a socket sent and received.
+    """
+
+    messages_sent = bytes_sent = messages_received = bytes_received = 0
+    datagrams_sent = datagrams_received = 0
+
+    def count_sent(self, data, messages: int = 1):
+        self.messages_sent += messages
+        self.datagrams_sent += 1
+        self.bytes_sent += len(data)
+
+    def count_received(self, data, messages: int = 1):
+        self.messages_received += messages
+        self.datagrams_received += 1
+        self.bytes_received += len(data)
 
 
 class NodeSocket:
@@ -10,48 +66,988 @@ class NodeSocket:
         self.sc = sc
 
 
-class TcpSocket(NodeSocket):
+class TcpSocket(NodeSocket, MessageCounter):
+    """
+    Node transport over persistent TCP connections. The first message to
+    a port opens a connection that every later message to it reuses, so
+    only the first one pays for the handshake. Messages are framed with
+    a 4-byte length prefix, so they are never truncated and several can
+    share a segment.
 
-    def __init__(self, port: int = 0):
-        super(TcpSocket, self).__init__(socket.SOCK_STREAM, port)
-        self.sc.listen(1)
-        self.tcp_lock = threading.Lock()
-        self.connection = None
+    listen multiplexes the listening socket and every accepted connection
+    with a selector, whichever peer has data is read, there is no lock
+    serializing the senders.
+    """
 
-    def listen(self):
-        self.tcp_lock.acquire()
-        connection, address = self.sc.accept()
-        input_value = connection.recv(1024).decode('UTF-8')
-        self.connection = connection
+    FRAME = struct.Struct('!I')
 
-        return input_value, address
+    def __init__(self, port: int = 0, encoding: str = 'UTF-8'):
+        """
+        :param port: port to bind, 0 picks a free one
+        :param encoding: encoding of text messages, None passes bytes
+            through untouched for the binary wire format
+        """
+        self.sc = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        # accepted connections left in TIME_WAIT keep the port otherwise
+        self.sc.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sc.bind(('127.0.0.1', port))
+        self.encoding = encoding
+        self.sc.listen(socket.SOMAXCONN)
+        self.sc.setblocking(False)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.sc, selectors.EVENT_READ)
+        # port -> connected socket, opened by the first send to the port
+        self.connections = {}
+        self.inbox = collections.deque()
 
-    def reply_tcp(self, message: str):
-        self.connection.send(message.encode('UTF-8'))
-        self.connection.close()
-        self.connection = None
-        self.tcp_lock.release()
+    def _connection(self, port: int) -> socket.socket:
+        connection = self.connections.get(port)
+        if connection is None:
+            connection = socket.create_connection(('127.0.0.1', port))
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.connections[port] = connection
+        return connection
 
-    def send(self, message: str, port: int = 0):
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.connect(('127.0.0.1', port))
-            s.sendall(message.encode('UTF-8'))
-            return s.recv(1024).decode('UTF-8')
+    def send(self, message, port: int = 0):
+        data = encode(message, self.encoding)
+        try:
+            self._connection(port).sendall(self.FRAME.pack(len(data)) + data)
+        except OSError:
+            # like a datagram to a closed port, the message is lost
+            connection = self.connections.pop(port, None)
+            if connection is not None:
+                connection.close()
+            return
+        self.count_sent(data)
+
+    def send_many(self, messages: list, ports: list):
+        for message, port in zip(messages, ports):
+            self.send(message, port)
+
+    def listen(self, timeout: float = None):
+        """
+        Receives a single message.
+
+        :param timeout: seconds to wait before raising socket.timeout,
+            None blocks forever
+        :return: tuple of decoded message and address of the connection
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.inbox:
+            remaining = None if deadline is None \
+                else max(deadline - time.monotonic(), 0)
+            events = self.selector.select(remaining)
+            if not events and remaining is not None and \
+                    time.monotonic() >= deadline:
+                raise socket.timeout('timed out')
+            for key, _ in events:
+                if key.fileobj is self.sc:
+                    self._accept()
+                else:
+                    self._read(key.fileobj, key.data)
+        return self.inbox.popleft()
 
-class UdpSocket(NodeSocket):
+    def _accept(self):
+        while True:
+            try:
+                connection, address = self.sc.accept()
+            except BlockingIOError:
+                return
+            connection.setblocking(False)
+            # read buffer and address of the peer
+            self.selector.register(connection, selectors.EVENT_READ,
+                                   [bytearray(), address])
 
-    def __init__(self, port: int = 0):
+    def _read(self, connection: socket.socket, state: list):
+        buffer, address = state
+        try:
+            data = connection.recv(65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self.selector.unregister(connection)
+            connection.close()
+            return
+
+        buffer += data
+        offset = 0
+        size = self.FRAME.size
+        while len(buffer) - offset >= size:
+            length, = self.FRAME.unpack_from(buffer, offset)
+            if len(buffer) - offset - size < length:
+                break
+            payload = bytes(buffer[offset + size:offset + size + length])
+            offset += size + length
+            self.count_received(payload)
+            self.inbox.append((decode(payload, self.encoding), address))
+        del buffer[:offset]
+
+    def close(self):
+        for connection in self.connections.values():
+            connection.close()
+        for key in list(self.selector.get_map().values()):
+            key.fileobj.close()
+        self.selector.close()
+
+
+class UdpSocket(NodeSocket, MessageCounter):
+
+    # OM(m) relay rounds arrive as bursts from every other general at once,
+    # the default buffer drops datagrams from a dozen generals on
+    RECEIVE_BUFFER_SIZE = 4 * 1024 * 1024
+    # largest payload of an IPv4 UDP datagram
+    MAX_DATAGRAM = 65507
+    # datagrams are received one after another into a ring of this many
+    # bytes, so a received message stays valid for a while without a copy
+    RING_SIZE = 256 * 1024
+
+    # datagrams larger than max_datagram that were dropped
+    truncated = 0
+
+    def __init__(self, port: int = 0, encoding: str = 'UTF-8',
+                 max_datagram: int = MAX_DATAGRAM):
+        """
+        :param port: port to bind, 0 picks a free one
+        :param encoding: encoding of text messages, None passes the
+            received bytes through untouched for the binary wire format
+        :param max_datagram: size of the largest datagram received, a
+            larger one is dropped instead of truncated
+        """
         super(UdpSocket, self).__init__(socket.SOCK_DGRAM, port)
+        self.encoding = encoding
+        self.sc.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF,
+                           self.RECEIVE_BUFFER_SIZE)
+        self.max_datagram = max_datagram
+        self.ring = bytearray(max(self.RING_SIZE, 2 * max_datagram))
+        self.ring_view = memoryview(self.ring)
+        self.ring_offset = 0
+
+    def listen(self, timeout: float = None):
+        """
+        Receives a single datagram.
+        - With encoding None the message is a memoryview of the receive
+        ring, valid until the ring wraps around onto it; copy it with
+        bytes() to keep it longer.
+
+        :param timeout: seconds to wait before raising socket.timeout,
+            None blocks forever
+        :return: tuple of decoded message and sender address
+        """
+        self.sc.settimeout(timeout)
+        data, address = self._receive_into()
+        self.count_received(data)
+        return decode(data, self.encoding), address
+
+    def _receive_into(self):
+        # one datagram into the ring, no allocation per datagram; with
+        # MSG_TRUNC the size of a datagram that did not fit is returned
+        while True:
+            if self.ring_offset + self.max_datagram > len(self.ring):
+                self.ring_offset = 0
+            start = self.ring_offset
+            size, address = self.sc.recvfrom_into(
+                self.ring_view[start:start + self.max_datagram],
+                self.max_datagram, MSG_TRUNC)
+            if size <= self.max_datagram:
+                self.ring_offset = start + size
+                return self.ring_view[start:start + size], address
+            self.truncated += 1
+
+    def close(self):
+        self.sc.close()
+
+    def send(self, message: str, port: int = 0):
+        # the bound socket doubles as the sender, no socket per message
+        data = encode(message, self.encoding)
+        self.sc.sendto(data, ('127.0.0.1', port))
+        self.count_sent(data)
+
+    def send_many(self, messages: list, ports: list):
+        """
+        Sends messages[i] to ports[i] through the bound socket.
+
+        :param messages: list of messages
+        :param ports: list of ports, same length as messages
+        :return: None
+        """
+        sendto = self.sc.sendto
+        for message, port in zip(messages, ports):
+            data = encode(message, self.encoding)
+            sendto(data, ('127.0.0.1', port))
+            self.count_sent(data)
+
+
+class CoalescingUdpSocket(UdpSocket):
+    """
+    UdpSocket that packs the messages bound for the same port into one
+    datagram, each message prefixed with its 2 byte length. Every node of
+    a cluster has to use it, it cannot talk to a plain UdpSocket.
+
+    A port's datagram is sent when the next message would not fit into
+    coalesce_limit, when the node is about to block in listen with nothing
+    received yet, or at the latest flush_interval seconds after its first
+    message by a background thread. A message larger than coalesce_limit
+    is sent alone right away. Datagrams are received up to max_datagram,
+    whatever the coalesce_limit of the sender.
+    """
+
+    LENGTH = struct.Struct('!H')
+
+    def __init__(self, port: int = 0, encoding: str = 'UTF-8',
+                 max_datagram: int = UdpSocket.MAX_DATAGRAM,
+                 coalesce_limit: int = 1400, flush_interval: float = 0.0005):
+        """
+        :param port: port to bind, 0 picks a free one
+        :param encoding: encoding of text messages, None for bytes
+        :param max_datagram: size of the largest datagram received
+        :param coalesce_limit: size limit of a coalesced datagram in bytes
+        :param flush_interval: seconds a message waits at most for others
+        """
+        super(CoalescingUdpSocket, self).__init__(port, encoding,
+                                                  max_datagram)
+        self.coalesce_limit = coalesce_limit
+        self.flush_interval = flush_interval
+        # port -> packed messages not sent yet, and how many they are
+        self.buffers = {}
+        self.buffered_messages = {}
+        # unpacked messages of the last datagram not handed out yet
+        self.inbox = collections.deque()
+        self.lock = threading.Lock()
+        self.pending = threading.Event()
+        self.closed = False
+        self.flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self.flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            self.pending.wait()
+            if self.closed:
+                return
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def _send_buffer(self, port: int):
+        data = self.buffers.pop(port)
+        self.sc.sendto(data, ('127.0.0.1', port))
+        self.count_sent(data, self.buffered_messages.pop(port))
+
+    def flush(self):
+        """
+        Sends every buffered datagram.
+
+        :return: None
+        """
+        with self.lock:
+            for port in list(self.buffers):
+                self._send_buffer(port)
+            self.pending.clear()
+
+    def send(self, message: str, port: int = 0):
+        data = encode(message, self.encoding)
+        size = self.LENGTH.size + len(data)
+        if size > UdpSocket.MAX_DATAGRAM:
+            raise ValueError(f'message of {len(data)} bytes does not fit into '
+                             f'a datagram')
+        with self.lock:
+            buffer = self.buffers.get(port)
+            if buffer is not None and \
+                    len(buffer) + size > self.coalesce_limit:
+                self._send_buffer(port)
+                buffer = None
+            if size > self.coalesce_limit:
+                datagram = self.LENGTH.pack(len(data)) + data
+                self.sc.sendto(datagram, ('127.0.0.1', port))
+                self.count_sent(datagram, 1)
+                return
+            if buffer is None:
+                buffer = self.buffers[port] = bytearray()
+                self.buffered_messages[port] = 0
+            buffer += self.LENGTH.pack(len(data))
+            buffer += data
+            self.buffered_messages[port] += 1
+            self.pending.set()
+
+    def send_many(self, messages: list, ports: list):
+        for message, port in zip(messages, ports):
+            self.send(message, port)
+
+    def listen(self, timeout: float = None):
+        """
+        Receives a single message, unpacking a new datagram only when the
+        previous one is used up.
+
+        :param timeout: seconds to wait before raising socket.timeout,
+            None blocks forever
+        :return: tuple of decoded message and sender address
+        """
+        if not self.inbox:
+            self._receive(timeout)
+        return self.inbox.popleft()
+
+    def _receive(self, timeout: float):
+        data = None
+        if self.buffers:
+            # keep collecting while more messages are already waiting,
+            # flush before this node goes idle
+            self.sc.settimeout(0)
+            try:
+                data, address = self._receive_into()
+            except BlockingIOError:
+                self.flush()
+        if data is None:
+            self.sc.settimeout(timeout)
+            data, address = self._receive_into()
+
+        offset = 0
+        messages = 0
+        while offset < len(data):
+            length, = self.LENGTH.unpack_from(data, offset)
+            offset += self.LENGTH.size
+            self.inbox.append((decode(data[offset:offset + length],
+                                      self.encoding), address))
+            offset += length
+            messages += 1
+        self.count_received(data, messages)
+
+    def close(self):
+        self.flush()
+        self.closed = True
+        self.pending.set()
+        self.sc.close()
+
+
+class _SendStream:
+    """
+    Messages to one port that are not acknowledged yet, and the round-trip
+    estimate the retransmission timeout is derived from (RFC 6298).
+    """
+
+    __slots__ = ('next_sequence', 'unacked', 'srtt', 'rttvar', 'rto')
+
+    def __init__(self, rto: float):
+        self.next_sequence = 0
+        # sequence number -> [datagram, sent at, number of retransmissions]
+        self.unacked = {}
+        self.srtt = None
+        self.rttvar = None
+        self.rto = rto
+
+
+class _ReceiveStream:
+    """
+    Sequence numbers received from one port: all below expected, plus the
+    ones above it that came in out of order.
+    """
+
+    __slots__ = ('expected', 'received')
+
+    def __init__(self):
+        self.expected = 0
+        self.received = set()
+
+    def add(self, sequence: int) -> bool:
+        """
+        :return: False for a duplicate
+        """
+        if sequence < self.expected or sequence in self.received:
+            return False
+        self.received.add(sequence)
+        while self.expected in self.received:
+            self.received.remove(self.expected)
+            self.expected += 1
+        return True
+
+
+class ReliableUdpSocket(UdpSocket):
+    """
+    UdpSocket that numbers every message per destination and resends it
+    until it is acknowledged, so a dropped datagram no longer turns into
+    a missing order. Every node of a cluster has to use it.
+
+    Data datagrams are acknowledged once no more are waiting, so a burst
+    costs one acknowledgement per sender. It carries the cumulative
+    sequence number (everything below it arrived) and up to MAX_SACK
+    sequence numbers above it that arrived out of order, so only the
+    missing messages are resent. The retransmission timeout adapts to the
+    measured round-trip time and backs off exponentially. Duplicates are
+    dropped on the receive side.
+
+    A background thread receives, acknowledges and retransmits, listen
+    takes the messages it delivered from an inbox. close waits up to
+    linger seconds for the last acknowledgements. It first tells every
+    peer that it is closing, so a peer stops resending to it and does not
+    wait for acknowledgements that never come, e.g. of the last relays
+    to a general that decided early.
+    """
 
-    def listen(self):
-        input_value_byte, address = self.sc.recvfrom(1024)
-        return input_value_byte.decode('UTF-8'), address
+    DATA = 0
+    ACK = 1
+    # the sender closed, nothing sent to it is acknowledged anymore
+    CLOSE = 2
+    # kind, sequence number of a message or cumulative acknowledgement
+    HEADER = struct.Struct('!BI')
+    MAX_SACK = 16
+    # the receiving thread checks for retransmissions at least this often
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, port: int = 0, encoding: str = 'UTF-8',
+                 initial_rto: float = 0.05, min_rto: float = 0.002,
+                 max_rto: float = 1.0, max_retransmissions: int = 10,
+                 linger: float = 0.5):
+        """
+        :param port: port to bind, 0 picks a free one
+        :param encoding: encoding of text messages, None for bytes
+        :param initial_rto: retransmission timeout before the first
+            round-trip time is measured, in seconds
+        :param min_rto: lower bound of the retransmission timeout
+        :param max_rto: upper bound of the retransmission timeout
+        :param max_retransmissions: retransmissions before giving up
+            on a message
+        :param linger: seconds close waits for outstanding acknowledgements
+        """
+        super(ReliableUdpSocket, self).__init__(port, encoding)
+        self.initial_rto = initial_rto
+        self.min_rto = min_rto
+        self.max_rto = max_rto
+        self.max_retransmissions = max_retransmissions
+        self.linger = linger
+        self.send_streams = {}
+        self.receive_streams = {}
+        # ports of the peers that closed
+        self.closed_peers = set()
+        self.retransmissions = self.duplicates = self.lost = 0
+        self.inbox = queue.SimpleQueue()
+        self.lock = threading.Lock()
+        self.next_due = time.monotonic() + self.POLL_INTERVAL
+        self.closed = False
+        self.receiver = threading.Thread(target=self._receive, daemon=True)
+        self.receiver.start()
+
+    def send(self, message, port: int = 0):
+        data = encode(message, self.encoding)
+        now = time.monotonic()
+        with self.lock:
+            if port in self.closed_peers:
+                # it is not received either, like a datagram to a closed port
+                self.count_sent(data)
+                return
+            stream = self.send_streams.get(port)
+            if stream is None:
+                stream = self.send_streams[port] = \
+                    _SendStream(self.initial_rto)
+            sequence = stream.next_sequence
+            stream.next_sequence += 1
+            datagram = self.HEADER.pack(self.DATA, sequence) + data
+            stream.unacked[sequence] = [datagram, now, 0]
+            self.next_due = min(self.next_due, now + stream.rto)
+        self.sc.sendto(datagram, ('127.0.0.1', port))
+        self.count_sent(data)
+
+    def send_many(self, messages: list, ports: list):
+        for message, port in zip(messages, ports):
+            self.send(message, port)
+
+    def listen(self, timeout: float = None):
+        """
+        Receives a single message, every message is delivered once.
+
+        :param timeout: seconds to wait before raising socket.timeout,
+            None blocks forever
+        :return: tuple of decoded message and sender address
+        """
+        try:
+            return self.inbox.get(timeout=timeout)
+        except queue.Empty:
+            raise socket.timeout('timed out')
+
+    def _receive(self):
+        # senders owed an acknowledgement, it is sent once no more datagrams
+        # are waiting so a burst is acknowledged with a single datagram
+        pending = set()
+        # the socket stays blocking for the sending threads, a timeout on it
+        # would make their sends fail with a full send buffer; this thread
+        # is the only reader, so a readable socket never blocks recvfrom
+        selector = selectors.DefaultSelector()
+        selector.register(self.sc, selectors.EVENT_READ)
+        while not self.closed:
+            if not selector.select(0 if pending else self._retransmit()):
+                for address in pending:
+                    self._acknowledge(address)
+                pending.clear()
+                continue
+            data, address = self.sc.recvfrom(65535)
+            if len(data) < self.HEADER.size:
+                continue
+
+            kind, sequence = self.HEADER.unpack_from(data)
+            if kind == self.ACK:
+                self._acknowledged(address[1], sequence,
+                                   data[self.HEADER.size:])
+                continue
+            if kind == self.CLOSE:
+                with self.lock:
+                    self.closed_peers.add(address[1])
+                    self.send_streams.pop(address[1], None)
+                continue
+
+            stream = self.receive_streams.get(address)
+            if stream is None:
+                stream = self.receive_streams[address] = _ReceiveStream()
+            if stream.add(sequence):
+                payload = data[self.HEADER.size:]
+                self.count_received(payload)
+                self.inbox.put((decode(payload, self.encoding), address))
+            else:
+                self.duplicates += 1
+            pending.add(address)
+        selector.close()
+
+    def _acknowledge(self, address: tuple):
+        stream = self.receive_streams[address]
+        selective = sorted(stream.received)[:self.MAX_SACK]
+        self.sc.sendto(self.HEADER.pack(self.ACK, stream.expected) +
+                       struct.pack(f'!{len(selective)}I', *selective),
+                       address)
+
+    def _acknowledged(self, port: int, cumulative: int, selective: bytes):
+        now = time.monotonic()
+        with self.lock:
+            stream = self.send_streams.get(port)
+            if stream is None:
+                return
+            unacked = stream.unacked
+            # sequence numbers are inserted in increasing order
+            acknowledged = []
+            for sequence in unacked:
+                if sequence >= cumulative:
+                    break
+                acknowledged.append(sequence)
+            acknowledged.extend(struct.unpack(f'!{len(selective) // 4}I',
+                                              selective))
+            for sequence in acknowledged:
+                entry = unacked.pop(sequence, None)
+                # Karn: a resent message gives no round-trip sample
+                if entry is not None and entry[2] == 0:
+                    self._measured(stream, now - entry[1])
+
+    def _measured(self, stream: _SendStream, rtt: float):
+        if stream.srtt is None:
+            stream.srtt, stream.rttvar = rtt, rtt / 2
+        else:
+            stream.rttvar = 0.75 * stream.rttvar + 0.25 * abs(stream.srtt -
+                                                              rtt)
+            stream.srtt = 0.875 * stream.srtt + 0.125 * rtt
+        stream.rto = min(self.max_rto, max(self.min_rto,
+                                           stream.srtt + 4 * stream.rttvar))
+
+    def _retransmit(self) -> float:
+        """
+        - Resends every message whose timeout expired, only scans the
+        outstanding messages once the earliest timeout is due.
+
+        :return: seconds until the next timeout expires
+        """
+        now = time.monotonic()
+        with self.lock:
+            if now < self.next_due:
+                return min(self.next_due - now, self.POLL_INTERVAL)
+            self.next_due = now + self.POLL_INTERVAL
+            for port, stream in self.send_streams.items():
+                for sequence, entry in list(stream.unacked.items()):
+                    datagram, sent_at, retransmissions = entry
+                    expires = sent_at + min(self.max_rto,
+                                            stream.rto * 2 ** retransmissions)
+                    if expires > now:
+                        self.next_due = min(self.next_due, expires)
+                        continue
+                    if retransmissions >= self.max_retransmissions:
+                        del stream.unacked[sequence]
+                        self.lost += 1
+                        continue
+                    self.sc.sendto(datagram, ('127.0.0.1', port))
+                    self.retransmissions += 1
+                    entry[1], entry[2] = now, retransmissions + 1
+                    self.next_due = min(self.next_due, now + min(
+                        self.max_rto, stream.rto * 2 ** (retransmissions + 1)))
+        return max(self.next_due - now, 0.0005)
+
+    def unacknowledged(self) -> int:
+        with self.lock:
+            return sum(len(stream.unacked)
+                       for stream in self.send_streams.values())
+
+    def close(self):
+        if self.closed:
+            return
+        with self.lock:
+            peers = set(self.send_streams)
+            peers.update(address[1] for address in list(self.receive_streams))
+            peers -= self.closed_peers
+        for port in peers:
+            self.sc.sendto(self.HEADER.pack(self.CLOSE, 0),
+                           ('127.0.0.1', port))
+        deadline = time.monotonic() + self.linger
+        while self.unacknowledged() and time.monotonic() < deadline:
+            time.sleep(0.001)
+        self.closed = True
+        # an empty datagram wakes the receiving thread up
+        self.sc.sendto(b'', self.sc.getsockname())
+        self.receiver.join()
+        self.sc.close()
+
+
+class LossProxy:
+    """
+    UDP forwarder that drops datagrams on purpose, to test the reliable
+    layer on the loopback interface. The client sends to the proxy port
+    instead of the target port, what the target answers goes back to the
+    client. Both directions lose datagrams with the given probability.
+    """
+
+    def __init__(self, target_port: int, loss: float = 0.2, seed=None,
+                 port: int = 0):
+        import random
+        self.target = ('127.0.0.1', target_port)
+        self.loss = loss
+        self.random = random.Random(seed)
+        self.client = None
+        self.forwarded = self.dropped = 0
+        self.sc = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sc.bind(('127.0.0.1', port))
+        self.port = self.sc.getsockname()[1]
+        self.closed = False
+        self.forwarder = threading.Thread(target=self._forward, daemon=True)
+        self.forwarder.start()
+
+    def _forward(self):
+        while True:
+            data, address = self.sc.recvfrom(65535)
+            if self.closed:
+                return
+            if address == self.target:
+                destination = self.client
+            else:
+                self.client, destination = address, self.target
+            if destination is None or self.random.random() < self.loss:
+                self.dropped += 1
+                continue
+            self.sc.sendto(data, destination)
+            self.forwarded += 1
 
     def close(self):
+        self.closed = True
+        self.sc.sendto(b'', ('127.0.0.1', self.port))
+        self.forwarder.join()
         self.sc.close()
 
-    @staticmethod
-    def send(message: str, port: int = 0):
-        client_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        client_socket.sendto(message.encode('UTF-8'), ('127.0.0.1', port))
-        client_socket.close()
+
+class MemoryNetwork:
+    """
+    Loopback network living in a single process: every bound MemorySocket
+    owns a queue and sending puts the message straight into the queue of
+    the receiving port. Like UDP, messages to unbound ports are dropped.
+    """
+
+    def __init__(self):
+        self.queues = {}
+        self.lock = threading.Lock()
+        self.next_port = 1
+
+    def bind(self, port: int = 0) -> int:
+        with self.lock:
+            if port == 0:
+                while self.next_port in self.queues:
+                    self.next_port += 1
+                port = self.next_port
+            if port in self.queues:
+                raise OSError(f'port {port} is already bound')
+            self.queues[port] = queue.SimpleQueue()
+        return port
+
+    def unbind(self, port: int):
+        with self.lock:
+            self.queues.pop(port, None)
+
+    def deliver(self, message, source_port: int, port: int):
+        target = self.queues.get(port)
+        if target is not None:
+            target.put((message, ('memory', source_port)))
+
+
+class ShardNetwork(MemoryNetwork):
+    """
+    MemoryNetwork of one shard of a cluster split across processes.
+    Messages between the generals of the shard are handed over in memory,
+    messages to a port of another shard go out through the single UDP
+    socket of this shard, prefixed with their destination and source port.
+    A background thread puts what arrives from other shards into the
+    queue of the destination port.
+    """
+
+    HEADER = struct.Struct('!HH')
+
+    def __init__(self, routes: dict, udp: UdpSocket,
+                 encoding: str = 'UTF-8'):
+        """
+        :param routes: port of every general of other shards -> UDP port
+            of its shard
+        :param udp: UdpSocket of this shard without encoding, bound before
+            the routes were known
+        :param encoding: encoding of text messages, None for bytes
+        """
+        super(ShardNetwork, self).__init__()
+        self.routes = routes
+        self.encoding = encoding
+        self.udp = udp
+        self.receiver = threading.Thread(target=self._receive, daemon=True)
+        self.receiver.start()
+
+    def _receive(self):
+        recvfrom = self.udp.sc.recvfrom
+        while True:
+            data, _ = recvfrom(65535)
+            if not data:
+                return
+            port, source_port = self.HEADER.unpack_from(data)
+            super(ShardNetwork, self).deliver(
+                decode(data[self.HEADER.size:], self.encoding),
+                source_port, port)
+
+    def deliver(self, message, source_port: int, port: int):
+        if port in self.queues:
+            super(ShardNetwork, self).deliver(message, source_port, port)
+        elif port in self.routes:
+            self.udp.sc.sendto(self.HEADER.pack(port, source_port) +
+                               encode(message, self.encoding),
+                               ('127.0.0.1', self.routes[port]))
+
+    def close(self):
+        # an empty datagram wakes the receiving thread up and stops it
+        self.udp.sc.sendto(b'', self.udp.sc.getsockname())
+        self.receiver.join()
+        self.udp.close()
+
+
+class MemorySocket(MessageCounter):
+    """
+    UdpSocket counterpart on a MemoryNetwork, messages are handed over as
+    they are, without encoding them.
+    """
+
+    def __init__(self, network: MemoryNetwork, port: int = 0):
+        self.network = network
+        self.port = network.bind(port)
+        self.queue = network.queues[self.port]
+
+    def listen(self, timeout: float = None):
+        """
+        Receives a single message.
+
+        :param timeout: seconds to wait before raising socket.timeout,
+            None blocks forever
+        :return: tuple of message and sender address
+        """
+        try:
+            message, address = self.queue.get(timeout=timeout)
+        except queue.Empty:
+            raise socket.timeout('timed out')
+        self.count_received(message)
+        return message, address
+
+    def close(self):
+        self.network.unbind(self.port)
+
+    def send(self, message, port: int = 0):
+        self.network.deliver(message, self.port, port)
+        self.count_sent(message)
+
+    def send_many(self, messages: list, ports: list):
+        deliver = self.network.deliver
+        for message, port in zip(messages, ports):
+            deliver(message, self.port, port)
+            self.count_sent(message)
+
+
+class SharedMemoryNetwork:
+    """
+    Loopback network for the processes of one host, created before they
+    are forked: one shared memory segment holding a single-producer/
+    single-consumer ring for every ordered pair of ports, and a doorbell
+    semaphore per port that is released once per message written to one
+    of its rings. Neither side takes a lock, and the semaphore only makes
+    a syscall when the receiver has to sleep.
+
+    A ring is laid out as head (8 bytes, moved by the receiver) | tail
+    (8 bytes, moved by the sender) | capacity bytes of records, each a
+    2 byte length followed by the message. Like UDP, a message that does
+    not fit into a full ring is dropped.
+    """
+
+    RING_HEADER = struct.Struct('=QQ')
+    LENGTH = struct.Struct('=H')
+
+    def __init__(self, ports: list, capacity: int = 64 * 1024):
+        """
+        :param ports: every port of the cluster
+        :param capacity: bytes of records a ring holds
+        """
+        self.ports = list(ports)
+        self.capacity = capacity
+        self.slots = {port: slot for slot, port in enumerate(self.ports)}
+        self.ring_size = self.RING_HEADER.size + capacity
+        self.memory = shared_memory.SharedMemory(
+            create=True, size=len(self.ports) ** 2 * self.ring_size)
+        self.doorbells = {port: multiprocessing.Semaphore(0)
+                          for port in self.ports}
+
+    def ring(self, source_port: int, port: int) -> int:
+        """
+        :return: offset of the ring from source_port to port
+        """
+        return (self.slots[source_port] * len(self.ports) +
+                self.slots[port]) * self.ring_size
+
+    def close(self):
+        # only called by the process that created the segment
+        self.memory.close()
+        self.memory.unlink()
+
+
+class SharedMemorySocket(MessageCounter):
+    """
+    UdpSocket counterpart on a SharedMemoryNetwork.
+    """
+
+    def __init__(self, network: SharedMemoryNetwork, port: int,
+                 encoding: str = 'UTF-8'):
+        """
+        :param network: SharedMemoryNetwork inherited from the parent process
+        :param port: port of this node, one of network.ports
+        :param encoding: encoding of text messages, None for bytes
+        """
+        self.network = network
+        self.port = port
+        self.encoding = encoding
+        self.buffer = network.memory.buf
+        self.capacity = network.capacity
+        self.doorbell = network.doorbells[port]
+        self.header = network.RING_HEADER.size
+        self.length = network.LENGTH
+        # (sender port, ring offset) of every ring this socket reads
+        self.incoming = [(source_port, network.ring(source_port, port))
+                         for source_port in network.ports
+                         if source_port != port]
+        # port -> (ring offset, doorbell) of every ring this socket writes
+        self.outgoing = {target_port: (network.ring(port, target_port),
+                                       network.doorbells[target_port])
+                         for target_port in network.ports
+                         if target_port != port}
+        self.next_ring = 0
+
+    def _copy_in(self, ring: int, position: int, data: bytes):
+        start = ring + self.header
+        position %= self.capacity
+        if position + len(data) <= self.capacity:
+            self.buffer[start + position:start + position + len(data)] = data
+            return
+        first = self.capacity - position
+        self.buffer[start + position:start + self.capacity] = data[:first]
+        self.buffer[start:start + len(data) - first] = data[first:]
+
+    def _copy_out(self, ring: int, position: int, length: int) -> bytes:
+        start = ring + self.header
+        position %= self.capacity
+        if position + length <= self.capacity:
+            return bytes(self.buffer[start + position:
+                                     start + position + length])
+        first = self.capacity - position
+        return bytes(self.buffer[start + position:start + self.capacity]) \
+            + bytes(self.buffer[start:start + length - first])
+
+    def send(self, message, port: int = 0):
+        data = encode(message, self.encoding)
+        ring, doorbell = self.outgoing[port]
+        head, tail = self.network.RING_HEADER.unpack_from(self.buffer, ring)
+        size = self.length.size + len(data)
+        if self.capacity - (tail - head) < size:
+            return
+
+        self._copy_in(ring, tail, self.length.pack(len(data)) + data)
+        # publish the record only once it is completely written
+        struct.pack_into('=Q', self.buffer, ring + 8, tail + size)
+        doorbell.release()
+        self.count_sent(data)
+
+    def send_many(self, messages: list, ports: list):
+        for message, port in zip(messages, ports):
+            self.send(message, port)
+
+    def listen(self, timeout: float = None):
+        """
+        Receives a single message, taking the rings in turns.
+
+        :param timeout: seconds to wait before raising socket.timeout,
+            None blocks forever
+        :return: tuple of decoded message and sender address
+        """
+        if not self.doorbell.acquire(timeout=timeout):
+            raise socket.timeout('timed out')
+
+        # the doorbell was rung after a record was published in some ring
+        number_ring = len(self.incoming)
+        for turn in range(number_ring):
+            source_port, ring = self.incoming[(self.next_ring + turn) %
+                                              number_ring]
+            head, tail = self.network.RING_HEADER.unpack_from(self.buffer,
+                                                              ring)
+            if head == tail:
+                continue
+
+            length, = self.length.unpack(
+                self._copy_out(ring, head, self.length.size))
+            data = self._copy_out(ring, head + self.length.size, length)
+            struct.pack_into('=Q', self.buffer, ring,
+                             head + self.length.size + length)
+            self.next_ring = (self.next_ring + turn + 1) % number_ring
+            self.count_received(data)
+            return decode(data, self.encoding), ('shm', source_port)
+        raise RuntimeError('doorbell rung without a message')
+
+    def close(self):
+        self.buffer = None
+
+
+def open_socket(port: int = 0, encoding: str = 'UTF-8',
+                network: MemoryNetwork = None, coalesce: bool = False,
+                reliable: bool = False, tcp: bool = False,
+                max_datagram: int = None):
+    """
+    :param port: port to bind, 0 picks a free one
+    :param encoding: encoding of text messages for UDP
+    :param network: MemoryNetwork or SharedMemoryNetwork to bind on
+        instead of UDP
+    :param coalesce: pack messages to the same port into one datagram,
+        only for UDP since the other networks have no per packet cost
+    :param reliable: acknowledge and resend UDP messages, see
+        ReliableUdpSocket
+    :param tcp: persistent TCP connections instead of UDP
+    :param max_datagram: size of the largest datagram a plain or
+        coalescing UDP socket receives, the class default if None
+    :return: UdpSocket, TcpSocket, ReliableUdpSocket, CoalescingUdpSocket,
+        or MemorySocket or
+        SharedMemorySocket when a network is given
+    """
+    if isinstance(network, SharedMemoryNetwork):
+        return SharedMemorySocket(network, port, encoding)
+    if network is not None:
+        return MemorySocket(network, port)
+    if tcp:
+        return TcpSocket(port, encoding)
+    if reliable:
+        return ReliableUdpSocket(port, encoding)
+    sizes = {} if max_datagram is None else dict(max_datagram=max_datagram)
+    if coalesce:
+        return CoalescingUdpSocket(port, encoding, **sizes)
+    return UdpSocket(port, encoding, **sizes)
@@ -0,0 +1,116 @@
+"""
+Generals forked ahead of the runs of main.execution.
+
+Forking a process and binding its socket is most of the time a short run
+takes before the first order is sent. A worker of WorkerPool is forked
+once, with every module already imported, binds its UDP socket right away
+and then waits for a general to run. main.execution only sends it the
+arguments of node.main over a pipe, the worker binds a fresh socket for
+the next run once it is done.
+
+Only the process runtime over plain UDP can use a pool, a pool runs one
+execution at a time.
+"""
+import multiprocessing
+import random
+
+import node
+import util
+import wire
+from membership import node_port
+from node_socket import UdpSocket
+from util import get_logger
+
+logger = get_logger('main')
+
+
+def worker_main(connection, report_queue):
+    """
+    - Runs one general after another until it receives None.
+
+    :param connection: end of the pipe of this worker
+    :param report_queue: queue of the pool the generals put their report in
+    :return: None
+    """
+    while True:
+        node_socket = UdpSocket()
+        connection.send(node_port(node_socket))
+        job = connection.recv()
+        if job is None:
+            node_socket.close()
+            return
+
+        kwargs, level, random_state, with_report = job
+        # what the process runtime would have inherited from the fork
+        util.set_level(level)
+        random.setstate(random_state)
+        node_socket.encoding = wire.CODECS[kwargs['wire_format']].encoding
+        try:
+            node.main(node_socket=node_socket,
+                      report_queue=report_queue if with_report else None,
+                      **kwargs)
+        except Exception:
+            logger.exception('Caught Error')
+
+
+class WorkerPool:
+    """
+    with WorkerPool(10) as pool:
+        for seed in range(100):
+            main.execution(roles, 'ATTACK', seed=seed, pool=pool)
+    """
+
+    def __init__(self, size: int):
+        """
+        :param size: number of workers forked right away, a run with more
+            generals forks the missing ones
+        """
+        # shared with the workers at fork time, a queue cannot be sent
+        # through a pipe
+        self.report_queue = multiprocessing.Queue()
+        self.workers = []
+        self.grow(size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def grow(self, size: int):
+        """
+        - Forks workers until the pool has size of them.
+
+        :param size: number of workers
+        :return: None
+        """
+        while len(self.workers) < size:
+            connection, child_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=worker_main, args=(child_connection, self.report_queue),
+                daemon=True)
+            process.start()
+            child_connection.close()
+            self.workers.append((process, connection))
+
+    def acquire(self, number_node: int) -> list:
+        """
+        - Waits until number_node workers are bound and idle.
+
+        :param number_node: number of generals of the run
+        :return: list of (connection, port) of the workers
+        """
+        self.grow(number_node)
+        return [(connection, connection.recv())
+                for _, connection in self.workers[:number_node]]
+
+    def close(self):
+        for process, connection in self.workers:
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+            connection.close()
+        for process, _ in self.workers:
+            process.join(1)
+        self.workers = []
@@ -0,0 +1,101 @@
+import os
+import threading
+
+import node
+import wire
+from membership import node_port
+from node_socket import ShardNetwork, UdpSocket
+from util import get_logger
+
+logger = get_logger('main')
+
+
+def assign_shards(number_node: int, workers: int = None) -> list:
+    """
+    - Splits the generals into contiguous blocks, one per worker process.
+
+    :param number_node: number of generals
+    :param workers: number of worker processes, defaults to the CPU count
+    :return: list of lists of general ids, no empty shard
+    """
+    workers = min(workers or os.cpu_count() or 1, number_node)
+    return [list(range(number_node * shard_id // workers,
+                       number_node * (shard_id + 1) // workers))
+            for shard_id in range(workers)]
+
+
+def shard_routes(shards: list, ports: list, city_port: int,
+                 udp_ports: list) -> dict:
+    """
+    :param shards: list of lists of general ids
+    :param ports: port of every general
+    :param city_port: port of the city
+    :param udp_ports: UDP port of every shard, the last one being the city's
+    :return: port of every general and the city -> UDP port of its shard
+    """
+    routes = {city_port: udp_ports[-1]}
+    for shard_id, node_ids in enumerate(shards):
+        for node_id in node_ids:
+            routes[ports[node_id]] = udp_ports[shard_id]
+    return routes
+
+
+def shard_main(node_ids: list, roles: list, ports: list, order: int,
+               city_port: int, barrier, round_timeout: float,
+               max_traitors: int, wire_format: str, routes: dict,
+               udp: UdpSocket, report_queue=None, cluster_id: int = 0):
+    """
+    - Runs the generals of one shard as threads of this worker process.
+
+    :param node_ids: ids of the generals of this shard
+    :param routes: see shard_routes
+    :param udp: UdpSocket of this shard, inherited from the parent
+    :param cluster_id: id of the run, see node.main
+    :return: None
+    """
+    network = ShardNetwork(routes, udp, wire.CODECS[wire_format].encoding)
+    threads = [threading.Thread(target=node.main, daemon=True, args=(
+        roles[node_id], node_id, ports, ports[node_id], order, city_port,
+        barrier, round_timeout, max_traitors, wire_format, network,
+        report_queue), kwargs=dict(cluster_id=cluster_id))
+        for node_id in node_ids]
+    [thread.start() for thread in threads]
+    [thread.join() for thread in threads]
+    network.close()
+
+
+def start_shards(roles: list, order: int, barrier, round_timeout: float,
+                 max_traitors: int, wire_format: str, workers: int,
+                 process_class, report_queue=None, cluster_id: int = 0):
+    """
+    - Starts one worker process per shard. The generals get the ports
+    1 to n and the city n + 1.
+    - The UDP sockets of the shards are bound on ports picked by the
+    system before forking, so every shard knows the others' ports.
+
+    :param process_class: multiprocessing.Process or a subclass
+    :return: list of started processes, ShardNetwork of the city
+    and port of the city
+    """
+    number_node = len(roles)
+    shards = assign_shards(number_node, workers)
+    ports = list(range(1, number_node + 1))
+    city_port = number_node + 1
+    udp_sockets = [UdpSocket(0, None) for _ in range(len(shards) + 1)]
+    udp_ports = [node_port(udp) for udp in udp_sockets]
+    routes = shard_routes(shards, ports, city_port, udp_ports)
+    logger.debug(f'shards: {shards}')
+
+    city_network = ShardNetwork(routes, udp_sockets[-1],
+                                wire.CODECS[wire_format].encoding)
+    processes = []
+    for shard_id, node_ids in enumerate(shards):
+        process = process_class(target=shard_main, args=(
+            node_ids, roles, ports, order, city_port, barrier, round_timeout,
+            max_traitors, wire_format, routes, udp_sockets[shard_id],
+            report_queue, cluster_id))
+        process.start()
+        processes.append(process)
+        # the shard owns its socket now
+        udp_sockets[shard_id].close()
+    return processes, city_network, city_port
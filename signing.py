@@ -0,0 +1,109 @@
+"""
+Signatures of the signed messages algorithm SM(m).
+
+An order is signed by the supreme general, every general relaying it
+signs the order together with the signatures it got, so a message relayed
+along path (0, g1, ..., gk) carries k + 1 signatures and a lieutenant can
+tell a forged or altered order apart from a relayed one.
+
+The signatures are HMACs, the keyring holds the key of every general and
+is created before the nodes start. A general only signs with its own key.
+"""
+import hashlib
+import hmac
+import os
+
+# truncated HMAC-SHA256, long enough that a traitor cannot guess one
+SIGNATURE_SIZE = 16
+
+
+def order_payload(order: int, instance: int = 0) -> bytes:
+    """
+    :param order: order signed by the supreme general
+    :param instance: consensus instance, a signature is not valid for
+        another instance
+    :return: bytes the supreme general signs
+    """
+    return f'{instance}:{order}'.encode()
+
+
+class Keyring:
+
+    def __init__(self, keys: dict):
+        """
+        :param keys: general id -> HMAC key
+        """
+        self.keys = keys
+        # (signer, payload) -> signature, only successful verifications are
+        # cached so the same prefix of a relayed chain is verified once
+        self.verified = {}
+
+    @classmethod
+    def generate(cls, number_general: int, seed=None):
+        """
+        :param number_general: number of generals including the supreme
+            general
+        :param seed: derives the keys from seed instead of os.urandom,
+            for reproducible runs
+        :return: Keyring
+        """
+        if seed is None:
+            keys = {general_id: os.urandom(32)
+                    for general_id in range(number_general)}
+        else:
+            keys = {general_id: hashlib.sha256(
+                f'{seed}:{general_id}'.encode()).digest()
+                for general_id in range(number_general)}
+        return cls(keys)
+
+    def copy(self):
+        """
+        :return: Keyring with the same keys and its own cache
+        """
+        return Keyring(self.keys)
+
+    def sign(self, signer: int, payload: bytes) -> bytes:
+        return hmac.new(self.keys[signer], payload,
+                        hashlib.sha256).digest()[:SIGNATURE_SIZE]
+
+    def verify(self, signer: int, payload: bytes, signature: bytes) -> bool:
+        cached = self.verified.get((signer, payload))
+        if cached is not None:
+            return hmac.compare_digest(cached, signature)
+        if signer not in self.keys:
+            return False
+        expected = self.sign(signer, payload)
+        if not hmac.compare_digest(expected, signature):
+            return False
+        self.verified[(signer, payload)] = expected
+        return True
+
+    def sign_chain(self, signer: int, order: int, instance: int,
+                   signatures: tuple = ()) -> tuple:
+        """
+        :param signer: general relaying the order
+        :param order: order
+        :param instance: consensus instance
+        :param signatures: signatures the order was received with
+        :return: signatures with the one of signer appended
+        """
+        payload = order_payload(order, instance) + b''.join(signatures)
+        return tuple(signatures) + (self.sign(signer, payload),)
+
+    def verify_chain(self, path: tuple, order: int, instance: int,
+                     signatures: tuple) -> bool:
+        """
+        :param path: generals that signed the order, supreme general first
+        :param order: order
+        :param instance: consensus instance
+        :param signatures: one signature per general of path
+        :return: True if every general of path signed the order
+        """
+        if len(signatures) != len(path) or not path or path[0] != 0:
+            return False
+        payload = order_payload(order, instance)
+        for signer, signature in zip(path, signatures):
+            if not self.verify(signer, payload, signature):
+                return False
+            payload += signature
+        return True
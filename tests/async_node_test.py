@@ -0,0 +1,46 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from main import execution
+from node import Order
+
+
+class AsyncRuntimeTest(TestCase):
+
+    def setUp(self):
+        self.patch_loggers = [patch('main.logger'), patch('async_node.logger'),
+                              patch('node.get_logger'), patch('city.logger'),
+                              patch('city.get_logger')]
+        [patch.start() for patch in self.patch_loggers]
+        return super().setUp()
+
+    def tearDown(self):
+        [patch.stop() for patch in self.patch_loggers]
+        return super().tearDown()
+
+    @patch('node.General.get_random_order')
+    def test_one_traitor_retreat_return_retreat(self, mock_random_order):
+        mock_random_order.side_effect = [Order.ATTACK, Order.ATTACK]
+
+        result = execution([False, True, False, False], 'RETREAT',
+                           runtime='asyncio')
+        self.assertEqual('RETREAT', result)
+
+    @patch('node.General.get_random_order')
+    @patch('node.SupremeGeneral.get_random_order')
+    def test_two_traitors_attack_return_fail(self,
+                                             mock_random_choice_sup,
+                                             mock_random_choice_gen):
+        mock_random_choice_sup.side_effect = [Order.ATTACK, Order.ATTACK,
+                                              Order.RETREAT]
+        mock_random_choice_gen.side_effect = [Order.RETREAT, Order.ATTACK]
+
+        result = execution([True, False, True, False], 'ATTACK',
+                           runtime='asyncio')
+        self.assertEqual('FAILED', result)
+
+    def test_two_traitors_om2_return_attack(self):
+        roles = [False, True, False, False, False, True, False]
+        result = execution(roles, 'ATTACK', max_traitors=2,
+                           runtime='asyncio')
+        self.assertEqual('ATTACK', result)
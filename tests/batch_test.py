@@ -0,0 +1,34 @@
+import io
+import json
+from unittest import TestCase
+from unittest.mock import patch
+
+from batch import run_batch, scenarios, traitor_placements, write_results
+
+
+class BatchTest(TestCase):
+
+    def test_traitor_placements(self):
+        self.assertEqual(['l,l,l,l', 't,l,l,l', 'l,t,l,l', 'l,l,t,l',
+                          'l,l,l,t'],
+                         list(traitor_placements(4, 1)))
+
+    def test_scenarios_matrix(self):
+        result = list(scenarios(['l,t,l,l'], [4], ['ATTACK', 'RETREAT'],
+                                [1, 2]))
+        self.assertEqual((1 + 5) * 2 * 2, len(result))
+
+    @patch('main.logger')
+    def test_run_batch_streams_every_result(self, mock_logger):
+        scenario_list = list(scenarios(sizes=[4], orders=['ATTACK'],
+                                       seeds=[7], runtime='memory'))
+        output = io.StringIO()
+        count = write_results(run_batch(scenario_list, workers=2), output)
+
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(5, count)
+        self.assertEqual(sorted(s['roles'] for s in scenario_list),
+                         sorted(r['roles'] for r in results))
+        self.assertTrue(all(r['error'] is None for r in results))
+        self.assertEqual(13, results[0]['messages']
+                         + results[0]['roles'].count('t'))
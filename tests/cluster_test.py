@@ -0,0 +1,62 @@
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from city import City
+from cluster import Cluster
+from node import General, Order
+
+
+class ClusterTest(TestCase):
+
+    def setUp(self):
+        self.patch_loggers = [patch('cluster.logger'), patch('node.logger'),
+                              patch('node.get_logger'), patch('city.logger'),
+                              patch('city.get_logger')]
+        [patch.start() for patch in self.patch_loggers]
+        return super().setUp()
+
+    def tearDown(self):
+        [patch.stop() for patch in self.patch_loggers]
+        return super().tearDown()
+
+    def test_instances_reuse_the_same_nodes(self):
+        with Cluster([False, True, False, False], runtime='memory') as cluster:
+            nodes = list(cluster.nodes)
+            results = [cluster.agree(order) for order in
+                       ['ATTACK', 'RETREAT', 'ATTACK']]
+            self.assertEqual(nodes, cluster.nodes)
+        self.assertEqual(['ATTACK', 'RETREAT', 'ATTACK'], results)
+        self.assertFalse(any(node.is_alive() for node in nodes))
+
+    @patch('node.General.get_random_order')
+    def test_traitor_supreme_general_every_instance(self, mock_random_order):
+        mock_random_order.side_effect = [Order.ATTACK, Order.RETREAT,
+                                         Order.ATTACK] * 2
+        with Cluster([True, False, False, False], runtime='memory',
+                     wire_format='binary') as cluster:
+            results = [cluster.agree('RETREAT') for _ in range(2)]
+        self.assertEqual(['ATTACK', 'ATTACK'], results)
+
+    def test_pipelined_instances_keep_their_order(self):
+        orders = ['ATTACK', 'RETREAT', 'RETREAT', 'ATTACK'] * 5
+        with Cluster([False, False, True, False, False], runtime='memory',
+                     window=4) as cluster:
+            self.assertEqual(orders, cluster.run(orders))
+
+    def test_unfinished_instances_are_evicted(self):
+        general = General(my_id=1, is_traitor=False, my_port=1,
+                          ports=[0, 1, 2, 3], node_socket=MagicMock(),
+                          city_port=4, window=2)
+        for instance_id in range(5):
+            general.receive_procedure(
+                f'general_2~order=1~instance={instance_id}')
+        self.assertEqual([3, 4], sorted(general.instances))
+
+        city = City(4, 3, node_socket=MagicMock(), window=2)
+        for instance_id in range(5):
+            city.receive_procedure(f'general_2~action=1~instance={instance_id}')
+        self.assertEqual({3: [0, 1], 4: [0, 1]}, city.tallies)
+
+    def test_not_enough_generals(self):
+        with self.assertRaises(ValueError):
+            Cluster([False, True, True, False], max_traitors=2)
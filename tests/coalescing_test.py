@@ -0,0 +1,80 @@
+import time
+from unittest import TestCase
+from unittest.mock import patch
+
+from main import execution
+from node_socket import CoalescingUdpSocket
+
+
+class CoalescingUdpSocketTest(TestCase):
+
+    def setUp(self):
+        self.sender = CoalescingUdpSocket(flush_interval=60)
+        self.receiver = CoalescingUdpSocket()
+        self.port = self.receiver.sc.getsockname()[1]
+        return super().setUp()
+
+    def tearDown(self):
+        self.sender.close()
+        self.receiver.close()
+        return super().tearDown()
+
+    def test_messages_to_one_port_share_a_datagram(self):
+        self.sender.send_many(['general_1~order=0', 'general_1~order=1'],
+                              [self.port, self.port])
+        self.assertEqual(0, self.sender.datagrams_sent)
+        self.sender.flush()
+
+        self.assertEqual('general_1~order=0', self.receiver.listen(1)[0])
+        self.assertEqual('general_1~order=1', self.receiver.listen(1)[0])
+        self.assertEqual((2, 1), (self.sender.messages_sent,
+                                  self.sender.datagrams_sent))
+        self.assertEqual((2, 1), (self.receiver.messages_received,
+                                  self.receiver.datagrams_received))
+
+    def test_full_datagram_is_sent_right_away(self):
+        self.sender.coalesce_limit = 64
+        self.sender.send_many([b'x' * 40, b'y' * 40], [self.port, self.port])
+        self.assertEqual(1, self.sender.datagrams_sent)
+        self.assertEqual('x' * 40, self.receiver.listen(1)[0])
+
+    def test_message_larger_than_the_coalesce_limit(self):
+        self.sender.send('general_1~order=0', self.port)
+        self.sender.send(b'x' * 1500, self.port)
+        self.assertEqual(2, self.sender.datagrams_sent)
+        self.assertEqual('general_1~order=0', self.receiver.listen(1)[0])
+        self.assertEqual('x' * 1500, self.receiver.listen(1)[0])
+        with self.assertRaises(ValueError):
+            self.sender.send(b'x' * 65506, self.port)
+
+    def test_timer_flushes_without_listen(self):
+        sender = CoalescingUdpSocket(flush_interval=0.0005)
+        sender.send('general_1~order=1', self.port)
+        deadline = time.monotonic() + 1
+        while sender.datagrams_sent == 0 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        self.assertEqual('general_1~order=1', self.receiver.listen(1)[0])
+        sender.close()
+
+
+class CoalescingExecutionTest(TestCase):
+
+    def setUp(self):
+        self.patch_loggers = [patch('main.logger'), patch('node.logger'),
+                              patch('node.get_logger'), patch('city.logger'),
+                              patch('city.get_logger')]
+        [patch.start() for patch in self.patch_loggers]
+        return super().setUp()
+
+    def tearDown(self):
+        [patch.stop() for patch in self.patch_loggers]
+        return super().tearDown()
+
+    def test_om2_with_coalescing(self):
+        roles = [False, True, False, False, False, True, False]
+        result, report = execution(roles, 'ATTACK', max_traitors=2,
+                                   coalesce=True, with_report=True)
+        self.assertEqual('ATTACK', result)
+        self.assertLessEqual(report['messages_received'],
+                             report['messages_sent'])
+        self.assertLess(report['datagrams_sent'], report['messages_sent'])
@@ -0,0 +1,104 @@
+import queue
+import socket
+import time
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from city import City
+from cluster import Cluster
+from main import execution
+from node import General, SupremeGeneral
+from node_socket import time_left
+
+relay_procedure = General.relay_procedure
+
+
+def silent_traitor(general, msg):
+    # a traitor that crashed right after receiving the order
+    if not general.is_traitor:
+        return relay_procedure(general, msg)
+
+
+class DeadlineTest(TestCase):
+
+    def setUp(self):
+        self.patch_loggers = [patch('main.logger'), patch('node.logger'),
+                              patch('node.get_logger'), patch('city.logger'),
+                              patch('city.get_logger'), patch('cluster.logger')]
+        [patch.start() for patch in self.patch_loggers]
+        return super().setUp()
+
+    def tearDown(self):
+        [patch.stop() for patch in self.patch_loggers]
+        return super().tearDown()
+
+    def test_time_left(self):
+        self.assertIsNone(time_left(None))
+        self.assertLessEqual(time_left(time.monotonic() + 1), 1)
+        with self.assertRaises(socket.timeout):
+            time_left(time.monotonic())
+
+    @patch.object(General, 'relay_procedure', autospec=True,
+                  side_effect=silent_traitor)
+    def test_silent_traitor_counts_as_retreat(self, mock_relay):
+        start = time.monotonic()
+        result = execution([False, True, False, False], 'ATTACK',
+                           round_timeout=0.1, runtime='memory')
+        self.assertEqual('ATTACK', result)
+        self.assertLess(time.monotonic() - start, 1)
+
+    @patch.object(SupremeGeneral, 'sending_procedure')
+    def test_silent_supreme_general_means_retreat(self, mock_send):
+        result = execution([True, False, False, False], 'ATTACK',
+                           round_timeout=0.1, runtime='memory')
+        self.assertEqual('RETREAT', result)
+
+    def test_city_concludes_at_its_deadline(self):
+        city_socket = MagicMock()
+        city_socket.listen.side_effect = [('general_1~action=1', None),
+                                          ('general_2~action=1', None),
+                                          socket.timeout()]
+        city = City(4, 3, round_timeout=0.1, node_socket=city_socket)
+        self.assertEqual('ATTACK', city.start())
+
+    def test_city_decides_failed_without_waiting(self):
+        decisions = []
+        city_socket = MagicMock()
+        city_socket.listen.side_effect = [('general_1~action=1', None),
+                                          ('general_2~action=0', None)]
+        city = City(4, 4, round_timeout=10, node_socket=city_socket,
+                    on_decision=lambda *decision: decisions.append(decision))
+        self.assertEqual('FAILED', city.start())
+        self.assertEqual([(0, 'FAILED')], decisions)
+
+    def test_city_serve_drops_actions_of_a_decided_instance(self):
+        results = queue.SimpleQueue()
+        city_socket = MagicMock()
+        city_socket.listen.side_effect = [
+            ('general_1~action=1~instance=1', None),
+            ('general_2~action=0~instance=1', None),
+            ('general_3~action=1~instance=1', None),
+            ('supreme_general~stop=1', None)]
+        city = City(4, 3, round_timeout=10, node_socket=city_socket)
+        city.serve(results)
+        self.assertEqual((1, 'FAILED'), results.get_nowait())
+        self.assertTrue(results.empty())
+        self.assertEqual({}, city.tallies)
+
+    @patch.object(General, 'relay_procedure', autospec=True,
+                  side_effect=silent_traitor)
+    def test_cluster_instance_expires(self, mock_relay):
+        with Cluster([False, False, True, False], round_timeout=0.1,
+                     runtime='memory', window=2) as cluster:
+            self.assertEqual(['ATTACK', 'RETREAT'],
+                             cluster.run(['ATTACK', 'RETREAT']))
+
+    def test_city_drops_malformed_actions(self):
+        city_socket = MagicMock()
+        city_socket.listen.side_effect = [('general_1~action', None),
+                                          ('general_1~action=1', None),
+                                          ('general_x~action=1', None),
+                                          ('general_2~action=1', None),
+                                          socket.timeout()]
+        city = City(4, 3, round_timeout=0.1, node_socket=city_socket)
+        self.assertEqual('ATTACK', city.start())
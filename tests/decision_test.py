@@ -0,0 +1,130 @@
+import itertools
+import random
+from unittest import TestCase
+from unittest.mock import patch
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from decision import (ATTACK, DUPLICATE, INVALID, RECORDED, RETREAT,
+                      EigLayout, EigTree)
+
+
+def recursive_orders(eig: dict, lieutenants: list, max_traitors: int,
+                     path: tuple) -> list:
+    # OM(m) as written in the paper, one call per path
+    orders = [eig.get(path, RETREAT)]
+    if len(path) > max_traitors:
+        return orders
+    for general_id in lieutenants:
+        if general_id not in path:
+            children = recursive_orders(eig, lieutenants, max_traitors,
+                                        path + (general_id,))
+            orders.append(ATTACK if 2 * sum(children) > len(children)
+                          else RETREAT)
+    return orders
+
+
+class EigTreeTest(TestCase):
+    # the list fallback, NumpyEigTreeTest runs the same tests vectorized
+    np = None
+
+    def setUp(self):
+        # every tree is vectorized when NumPy is there
+        self.patch_np = [patch('decision.load_numpy', return_value=self.np),
+                         patch('decision.VECTORIZE_SIZE', 0)]
+        [patch.start() for patch in self.patch_np]
+        return super().setUp()
+
+    def tearDown(self):
+        [patch.stop() for patch in self.patch_np]
+        return super().tearDown()
+
+    def test_children_are_consecutive_slots(self):
+        layout = EigLayout([1, 3, 4], 2)
+        self.assertEqual([1, 3, 6], layout.sizes)
+        self.assertEqual([0, 1, 2], [layout.index((0, g)) for g in (1, 3, 4)])
+        self.assertEqual([2, 3], [layout.index((0, 3, g)) for g in (1, 4)])
+
+    def test_invalid_paths_are_ignored(self):
+        tree = EigTree(EigLayout([1, 3, 4], 1))
+        for path in [(0, 2), (0, 1, 1), (1,), (0, 1, 3, 4), ()]:
+            tree[path] = ATTACK
+            self.assertEqual(RETREAT, tree.get(path))
+        self.assertEqual(RETREAT, tree.decide())
+
+    def test_same_orders_as_recursive_om(self):
+        rng = random.Random(3)
+        lieutenants = [1, 2, 4, 5, 6]
+        for max_traitors in (1, 2, 3):
+            tree = EigTree(EigLayout(lieutenants, max_traitors))
+            eig = {}
+            for depth in range(max_traitors + 1):
+                for relays in itertools.permutations(lieutenants, depth):
+                    # leave some orders out, they count as RETREAT
+                    if rng.random() < 0.9:
+                        order = rng.choice([ATTACK, RETREAT])
+                        eig[(0,) + relays] = tree[(0,) + relays] = order
+
+            for path in [(0,), (0, 4), (0, 4, 1)][:max_traitors + 1]:
+                self.assertEqual(
+                    recursive_orders(eig, lieutenants, max_traitors, path),
+                    tree.orders(path))
+            orders = tree.orders()
+            self.assertEqual(ATTACK if 2 * sum(orders) > len(orders)
+                             else RETREAT, tree.decide())
+
+    def test_duplicates_and_invalid_paths_are_rejected(self):
+        tree = EigTree(EigLayout([1, 3, 4], 1))
+        self.assertEqual(RECORDED, tree.record((0, 3), ATTACK))
+        self.assertEqual(DUPLICATE, tree.record((0, 3), RETREAT))
+        self.assertEqual(INVALID, tree.record((0, 2), ATTACK))
+        self.assertEqual(ATTACK, tree.get((0, 3)))
+        self.assertEqual([0, 1], tree.received)
+
+    def test_settled_once_missing_orders_cannot_change_the_decision(self):
+        rng = random.Random(5)
+        lieutenants = [1, 2, 4, 5, 6]
+        for max_traitors in (0, 1, 2, 3):
+            layout = EigLayout(lieutenants, max_traitors)
+            paths = [(0,) + relays for depth in range(max_traitors + 1)
+                     for relays in itertools.permutations(lieutenants, depth)]
+            rng.shuffle(paths)
+            orders = {path: rng.choice([ATTACK, RETREAT]) for path in paths}
+            tree = EigTree(layout)
+            for count, path in enumerate(paths, 1):
+                tree[path] = orders[path]
+                # the decision with every missing order being an ATTACK
+                optimistic = EigTree(layout)
+                for other in paths:
+                    optimistic[other] = orders[other] \
+                        if other in paths[:count] else ATTACK
+                self.assertEqual(tree.decide() == optimistic.decide(),
+                                 tree.settled())
+                self.assertEqual(tree.decide(), tree.low[0][0]
+                                 if tree.low else tree.get((0,)))
+
+
+class NumpyEigTreeTest(EigTreeTest):
+    np = numpy
+
+    def setUp(self):
+        if self.np is None:
+            self.skipTest('numpy is not installed')
+        return super().setUp()
+
+
+class VectorizeTest(TestCase):
+
+    @patch('decision.load_numpy')
+    def test_small_tree_does_not_load_numpy(self, mock_load):
+        self.assertIsNone(EigLayout(list(range(1, 13)), 3).np)
+        mock_load.assert_not_called()
+
+    @patch('decision.load_numpy', return_value=None)
+    def test_large_tree_without_numpy_uses_lists(self, mock_load):
+        tree = EigTree(EigLayout(list(range(1, 14)), 5))
+        mock_load.assert_called_once_with()
+        self.assertIsInstance(tree.levels[-1], list)
@@ -0,0 +1,98 @@
+import socket
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import main
+import wire
+from city import City
+from cluster import Cluster
+from main import execution
+from membership import Membership, join, new_cluster_id, node_port
+from node_socket import UdpSocket
+
+
+def run_execution(order: str) -> str:
+    return execution([False, False, True, False], order, round_timeout=1)
+
+
+class MembershipTest(TestCase):
+
+    def setUp(self):
+        self.patch_loggers = [patch('main.logger'), patch('node.logger'),
+                              patch('node.get_logger'), patch('city.logger'),
+                              patch('city.get_logger'),
+                              patch('cluster.logger')]
+        [patch.start() for patch in self.patch_loggers]
+        return super().setUp()
+
+    def tearDown(self):
+        [patch.stop() for patch in self.patch_loggers]
+        return super().tearDown()
+
+    def test_nodes_learn_the_ports_of_each_other(self):
+        membership = Membership(3)
+        sockets = [UdpSocket(0) for _ in range(3)]
+        tables = [None] * 3
+
+        def run(node_id):
+            tables[node_id] = join(membership.node_connections[node_id],
+                                   sockets[node_id])
+
+        threads = [threading.Thread(target=run, args=(node_id,))
+                   for node_id in range(3)]
+        [thread.start() for thread in threads]
+        ports = membership.gather(1)
+        membership.distribute(ports, 12345)
+        [thread.join() for thread in threads]
+        self.assertEqual([node_port(node_socket) for node_socket in sockets],
+                         ports)
+        self.assertEqual([(ports, 12345)] * 3, tables)
+        [node_socket.close() for node_socket in sockets]
+        membership.close()
+
+    def test_gather_times_out(self):
+        membership = Membership(2)
+        with self.assertRaises(TimeoutError):
+            membership.gather(0.01)
+        membership.close()
+
+    def test_concurrent_executions(self):
+        # forked executors, forking from threads may deadlock
+        with ProcessPoolExecutor(4) as executor:
+            results = list(executor.map(run_execution,
+                                        ['ATTACK', 'RETREAT'] * 4))
+        self.assertEqual(['ATTACK', 'RETREAT'] * 4, results)
+
+    def test_city_drops_messages_of_another_cluster(self):
+        codec = wire.TEXT.for_cluster(new_cluster_id())
+        late = wire.TEXT.for_cluster(codec.cluster + 1)
+        city_socket = MagicMock()
+        city_socket.listen.side_effect = [
+            (late.encode_action(1, 0), None), (late.encode_action(2, 0), None),
+            (codec.encode_action(1, 1), None), (codec.encode_action(2, 1), None),
+            socket.timeout()]
+        city = City(4, 2, round_timeout=0.1, node_socket=city_socket,
+                    codec=codec)
+        self.assertEqual('ATTACK', city.start())
+
+    def test_clusters_side_by_side(self):
+        roles = [False, True, False, False]
+        with Cluster(roles) as first, Cluster(roles) as second:
+            self.assertNotEqual(first.cluster_id, second.cluster_id)
+            self.assertEqual(['ATTACK', 'RETREAT'],
+                             first.run(['ATTACK', 'RETREAT']))
+            self.assertEqual(['RETREAT', 'ATTACK'],
+                             second.run(['RETREAT', 'ATTACK']))
+
+    @patch('node.join', side_effect=lambda *args: time.sleep(10))
+    def test_nodes_are_stopped_when_a_port_is_missing(self, mock_join):
+        main.list_nodes.clear()
+        with self.assertRaises(TimeoutError):
+            execution([False, False, True, False], 'ATTACK',
+                      round_timeout=0.2)
+        self.assertEqual(4, len(main.list_nodes))
+        self.assertFalse(any(process.is_alive()
+                             for process in main.list_nodes))
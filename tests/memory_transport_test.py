@@ -0,0 +1,60 @@
+import socket
+from unittest import TestCase
+from unittest.mock import patch
+
+from main import execution
+from node import Order
+from node_socket import MemoryNetwork, MemorySocket
+
+
+class MemorySocketTest(TestCase):
+
+    def setUp(self):
+        self.network = MemoryNetwork()
+        self.sender = MemorySocket(self.network)
+        self.receiver = MemorySocket(self.network, 10)
+        return super().setUp()
+
+    def test_send_many_delivers_in_order(self):
+        self.sender.send_many(['a', b'b'], [10, 10])
+        self.assertEqual(('a', ('memory', self.sender.port)),
+                         self.receiver.listen(1))
+        self.assertEqual(b'b', self.receiver.listen(1)[0])
+
+    def test_listen_times_out(self):
+        with self.assertRaises(socket.timeout):
+            self.receiver.listen(0.01)
+
+    def test_closed_port_drops_messages(self):
+        self.receiver.close()
+        self.sender.send('a', 10)
+        with self.assertRaises(OSError):
+            MemorySocket(self.network, self.sender.port)
+
+
+class MemoryRuntimeTest(TestCase):
+
+    def setUp(self):
+        self.patch_loggers = [patch('main.logger'), patch('node.logger'),
+                              patch('node.get_logger'), patch('city.logger'),
+                              patch('city.get_logger')]
+        [patch.start() for patch in self.patch_loggers]
+        return super().setUp()
+
+    def tearDown(self):
+        [patch.stop() for patch in self.patch_loggers]
+        return super().tearDown()
+
+    @patch('node.General.get_random_order')
+    def test_one_traitor_retreat_return_retreat(self, mock_random_order):
+        mock_random_order.side_effect = [Order.ATTACK, Order.ATTACK]
+
+        result = execution([False, True, False, False], 'RETREAT',
+                           runtime='memory')
+        self.assertEqual('RETREAT', result)
+
+    def test_two_traitors_om2_binary_return_attack(self):
+        roles = [False, True, False, False, False, True, False]
+        result = execution(roles, 'ATTACK', max_traitors=2,
+                           runtime='memory', wire_format='binary')
+        self.assertEqual('ATTACK', result)
@@ -0,0 +1,67 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from main import execution
+from metrics import Metrics, cluster_report
+
+
+class MetricsTest(TestCase):
+
+    def test_stop_without_start_records_nothing(self):
+        metrics = Metrics()
+        metrics.stop('listen')
+        metrics.round_done(1)
+        self.assertEqual({}, metrics.phases)
+        self.assertEqual({1: 0.0}, metrics.rounds)
+
+    def test_cluster_report_sums_counters(self):
+        node_reports = [dict(name=f'general{i}', messages_sent=i,
+                             bytes_sent=10 * i, messages_received=1,
+                             bytes_received=10) for i in range(3)]
+        report = cluster_report('ATTACK', node_reports, 0.5)
+        self.assertEqual(3, report['messages_sent'])
+        self.assertEqual(30, report['bytes_sent'])
+        self.assertEqual(3, report['messages_received'])
+        self.assertEqual(['general0', 'general1', 'general2'],
+                         sorted(report['nodes']))
+
+
+class ExecutionReportTest(TestCase):
+
+    def setUp(self):
+        self.patch_loggers = [patch('main.logger'), patch('node.logger'),
+                              patch('node.get_logger'), patch('city.logger'),
+                              patch('city.get_logger')]
+        [patch.start() for patch in self.patch_loggers]
+        return super().setUp()
+
+    def tearDown(self):
+        [patch.stop() for patch in self.patch_loggers]
+        return super().tearDown()
+
+    def test_memory_run_counts_every_message(self):
+        result, report = execution([False, False, False, False], 'ATTACK',
+                                   runtime='memory', with_report=True)
+
+        self.assertEqual('ATTACK', result)
+        self.assertEqual(5, len(report['nodes']))
+        # 3 orders + 3 * 2 relays + 4 actions
+        self.assertEqual(13, report['messages_sent'])
+        # a general that decided early leaves the last relays unread
+        self.assertLessEqual(report['messages_received'],
+                             report['messages_sent'])
+        self.assertLessEqual(report['bytes_received'], report['bytes_sent'])
+        general = report['nodes']['general1']
+        self.assertEqual({'startup', 'listen', 'conclusion'},
+                         set(general['phases']))
+        self.assertEqual([1, 2], sorted(general['rounds']))
+        self.assertIn('decision', report['nodes']['city']['phases'])
+
+    def test_asyncio_run_reports_every_node(self):
+        result, report = execution([False, False, False, False], 'RETREAT',
+                                   runtime='asyncio', with_report=True)
+
+        self.assertEqual('RETREAT', result)
+        self.assertEqual(13, report['messages_sent'])
+        self.assertIn('broadcast',
+                      report['nodes']['supreme_general']['phases'])
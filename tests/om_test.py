@@ -0,0 +1,117 @@
+from unittest import TestCase
+from unittest.mock import patch, MagicMock
+
+import wire
+from node import General, Order, expected_messages, message_path
+
+
+class OmTest(TestCase):
+
+    def setUp(self):
+        self.patch_loggers = [patch('node.get_logger')]
+        [patch.start() for patch in self.patch_loggers]
+
+        self.mock_udp = MagicMock()
+        self.general = General(
+            my_id=1, is_traitor=False,
+            my_port=1, ports=list(range(7)),
+            node_socket=self.mock_udp,
+            city_port=7,
+            max_traitors=2
+        )
+        return super().setUp()
+
+    def tearDown(self):
+        [patch.stop() for patch in self.patch_loggers]
+        return super().tearDown()
+
+    def test_expected_messages(self):
+        self.assertEqual(3, expected_messages(4, 1))
+        self.assertEqual(1 + 5 + 5 * 4, expected_messages(7, 2))
+
+    def test_message_path(self):
+        self.assertEqual((0,), message_path(['supreme_general', 'order=1']))
+        self.assertEqual((0, 2), message_path(['general_2', 'order=1']))
+        self.assertEqual((0, 2, 3),
+                         message_path(['general_3', 'order=1', 'path=0,2,3']))
+
+    def test_second_round_order_is_relayed_with_path(self):
+        result = self.general.sending_procedure('general_2', Order.ATTACK,
+                                                (0, 2))
+        self.assertEqual(['general_1~order=1~path=0,2,1'] * 4, result)
+
+    def test_last_round_order_is_not_relayed(self):
+        result = self.general.sending_procedure('general_3', Order.ATTACK,
+                                                (0, 2, 3))
+        self.assertEqual(None, result)
+        self.mock_udp.send_many.assert_not_called()
+
+    def test_lying_relay_is_outvoted(self):
+        # the supreme general says ATTACK and general 2 lies about it
+        # to everyone, every other relay is honest
+        self.general.eig[(0,)] = Order.ATTACK
+        for first in range(2, 7):
+            order = Order.RETREAT if first == 2 else Order.ATTACK
+            self.general.eig[(0, first)] = order
+            for second in range(2, 7):
+                if second != first:
+                    self.general.eig[(0, first, second)] = \
+                        Order.RETREAT if 2 in (first, second) else Order.ATTACK
+
+        orders = self.general.resolve_orders((0,))
+        self.assertEqual([Order.ATTACK, Order.RETREAT] + [Order.ATTACK] * 4,
+                         orders)
+        expected = f'general_1~action={Order.ATTACK}'
+        self.assertEqual(expected, self.general.conclude_action(orders))
+
+    def test_duplicate_order_is_dropped(self):
+        message = 'general_3~order=1~path=0,2,3'
+        self.assertIsNotNone(self.general.receive_procedure(message))
+        self.assertIsNone(self.general.receive_procedure(message))
+        self.assertEqual(1, self.general.instance(0).received)
+        self.assertEqual([Order.ATTACK], self.general.orders)
+
+    def test_invalid_path_is_dropped(self):
+        self.assertIsNone(self.general.receive_procedure(
+            'general_3~order=1~path=0,1,3'))
+        self.assertEqual(0, self.general.instance(0).received)
+
+    def test_listening_stops_once_the_decision_is_settled(self):
+        general = General(my_id=1, is_traitor=False, my_port=1,
+                          ports=list(range(5)), node_socket=self.mock_udp,
+                          city_port=5)
+        self.mock_udp.listen.side_effect = [
+            ('supreme_general~order=1', None),
+            ('general_2~order=1', None),
+            ('general_2~order=1', None),
+            ('general_3~order=1', None),
+            ('general_4~order=0', None)]
+        general.start()
+        # the duplicate is skipped, the order of general 4 is not waited for
+        self.assertEqual(4, self.mock_udp.listen.call_count)
+        self.mock_udp.send.assert_called_once_with(
+            f'general_1~action={Order.ATTACK}', 5)
+
+    def test_order_relayed_in_the_name_of_another_general_is_dropped(self):
+        self.assertIsNone(self.general.receive_procedure(
+            'general_4~order=0~path=0,2,3'))
+        self.assertEqual(0, self.general.instance(0).received)
+        # the real relay of general 3 is still recorded
+        self.assertIsNotNone(self.general.receive_procedure(
+            'general_3~order=1~path=0,2,3'))
+        self.assertEqual(Order.ATTACK, self.general.eig.get((0, 2, 3)))
+
+    def test_malformed_message_is_dropped(self):
+        for message in ['general_3~order=x', 'general_3', 'general~order=1',
+                        'general_3~march=1', 'general_3~order=1~path=0,a']:
+            self.assertIsNone(self.general.receive_procedure(message))
+        self.assertEqual(0, self.general.instance(0).received)
+
+    def test_malformed_binary_message_is_dropped(self):
+        general = General(my_id=1, is_traitor=False, my_port=1,
+                          ports=list(range(4)), node_socket=self.mock_udp,
+                          city_port=4, codec=wire.BINARY)
+        message = wire.BINARY.encode_order(2, Order.ATTACK, (0, 2))
+        for data in [message[:5], message[:-1], b'\x09' + message[1:]]:
+            self.assertIsNone(general.receive_procedure(memoryview(data)))
+        self.assertIsNotNone(general.receive_procedure(memoryview(message)))
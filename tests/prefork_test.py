@@ -0,0 +1,55 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from main import execution
+from prefork import WorkerPool
+
+
+class WorkerPoolTest(TestCase):
+
+    def setUp(self):
+        self.patch_loggers = [patch('main.logger'), patch('node.logger'),
+                              patch('node.get_logger'), patch('city.logger'),
+                              patch('city.get_logger')]
+        [patch.start() for patch in self.patch_loggers]
+        self.pool = WorkerPool(4)
+        return super().setUp()
+
+    def tearDown(self):
+        self.pool.close()
+        [patch.stop() for patch in self.patch_loggers]
+        return super().tearDown()
+
+    def test_workers_run_one_execution_after_another(self):
+        processes = [process for process, _ in self.pool.workers]
+        for order in ['ATTACK', 'RETREAT', 'ATTACK']:
+            result, report = execution([False, False, True, False], order,
+                                       pool=self.pool, with_report=True)
+            self.assertEqual(order, result)
+            self.assertEqual(5, len(report['nodes']))
+        self.assertEqual(processes,
+                         [process for process, _ in self.pool.workers])
+
+    def test_pool_grows_for_a_larger_cluster(self):
+        roles = [False, True, False, False, False, True, False]
+        self.assertEqual('ATTACK', execution(roles, 'ATTACK', max_traitors=2,
+                                             pool=self.pool))
+        self.assertEqual(7, len(self.pool.workers))
+
+    def test_cold_start_breakdown(self):
+        for pool in (None, self.pool):
+            _, report = execution([False, False, False, False], 'ATTACK',
+                                  pool=pool, with_report=True)
+            cold_start = report['cold_start']
+            self.assertEqual({'prepare', 'spawn', 'ready', 'first_message'},
+                             set(cold_start))
+            self.assertLess(cold_start['first_message'], report['wall_time'])
+
+    def test_late_report_of_an_earlier_run_is_dropped(self):
+        self.pool.report_queue.put(dict(name='general1', cluster=1,
+                                        messages_sent=1000))
+        _, report = execution([False, False, True, False], 'ATTACK',
+                              pool=self.pool, with_report=True)
+        self.assertEqual(5, len(report['nodes']))
+        self.assertNotEqual(1, report['nodes']['general1']['cluster'])
+        self.assertLess(report['messages_sent'], 1000)
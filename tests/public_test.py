@@ -42,22 +42,25 @@ class BgpTest(TestCase):
 class BgpPublicTest(BgpTest):
 
     def test_listen_procedure_called_udpsocket_listen_once(self):
-        self.mock_udp.listen.return_value = ('general_1~order=0',
+        self.mock_udp.listen.return_value = ('supreme_general~order=0',
                                              ('localhost', 123))
         self.loyal_general.listen_procedure()
         self.assertEqual(1,
                          self.mock_udp.listen.call_count)
 
     def test_listen_procedure_return_list(self):
-        self.mock_udp.listen.return_value = ('general_1~order=0',
+        self.mock_udp.listen.return_value = ('supreme_general~order=0',
                                              ('localhost', 123))
         result = self.loyal_general.listen_procedure()
         self.assertEqual(result,
-                         ['general_1', 'order=0'])
+                         ['supreme_general', 'order=0'])
 
     def test_send_procedure_called_send_message_twice(self):
         self.loyal_general.sending_procedure('supreme_general', Order.ATTACK)
-        self.assertEqual(2, self.mock_udp.send.call_count)
+        self.mock_udp.send_many.assert_called_once()
+        messages, ports = self.mock_udp.send_many.call_args[0]
+        self.assertEqual(2, len(messages))
+        self.assertEqual([2, 3], ports)
 
     def test_send_procedure_not_supreme_general_return_none(self):
         result = self.loyal_general.sending_procedure('general_1', Order.ATTACK)
@@ -101,7 +104,10 @@ class BgpPublicTest(BgpTest):
             'supreme_general',
             self.loyal_supreme_general.order
         )
-        self.assertEqual(3, self.mock_udp.send.call_count)
+        self.mock_udp.send_many.assert_called_once()
+        messages, ports = self.mock_udp.send_many.call_args[0]
+        self.assertEqual(3, len(messages))
+        self.assertEqual([1, 2, 3], ports)
 
     def test_supreme_general_send_message_return_list(self):
         result = self.loyal_supreme_general.sending_procedure(
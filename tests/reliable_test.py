@@ -0,0 +1,92 @@
+import fcntl
+import os
+import time
+from unittest import TestCase
+from unittest.mock import patch
+
+from main import execution
+from node_socket import LossProxy, ReliableUdpSocket
+
+
+class ReliableUdpSocketTest(TestCase):
+
+    def setUp(self):
+        self.sender = ReliableUdpSocket(initial_rto=0.01)
+        self.receiver = ReliableUdpSocket()
+        self.port = self.receiver.sc.getsockname()[1]
+        return super().setUp()
+
+    def tearDown(self):
+        self.sender.close()
+        self.receiver.close()
+        return super().tearDown()
+
+    def test_messages_are_acknowledged(self):
+        self.sender.send_many(['general_1~order=0', 'general_1~order=1'],
+                              [self.port, self.port])
+        self.assertEqual('general_1~order=0', self.receiver.listen(1)[0])
+        self.assertEqual('general_1~order=1', self.receiver.listen(1)[0])
+        self.sender.close()
+        self.assertEqual(0, self.sender.unacknowledged())
+        self.assertEqual(0, self.sender.retransmissions)
+
+    def test_every_message_delivered_once_through_loss(self):
+        proxy = LossProxy(self.port, loss=0.3, seed=7)
+        messages = [f'general_1~order={i}' for i in range(200)]
+        self.sender.send_many(messages, [proxy.port] * len(messages))
+
+        received = [self.receiver.listen(5)[0] for _ in messages]
+        self.assertEqual(sorted(messages), sorted(received))
+        # lost acknowledgements back off beyond the linger of close
+        deadline = time.monotonic() + 5
+        while self.sender.unacknowledged() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.sender.close()
+        proxy.close()
+        self.assertEqual(0, self.sender.unacknowledged())
+        self.assertGreater(proxy.dropped, 0)
+        self.assertGreater(self.sender.retransmissions, 0)
+        self.assertEqual(len(messages), self.receiver.messages_received)
+
+    def test_duplicates_are_dropped(self):
+        datagram = ReliableUdpSocket.HEADER.pack(ReliableUdpSocket.DATA, 0) \
+            + b'general_1~order=1'
+        for _ in range(3):
+            self.sender.sc.sendto(datagram, ('127.0.0.1', self.port))
+        self.assertEqual('general_1~order=1', self.receiver.listen(1)[0])
+        with self.assertRaises(TimeoutError):
+            self.receiver.listen(0.05)
+        self.assertEqual(2, self.receiver.duplicates)
+
+    def test_sending_stays_blocking(self):
+        # the receiving thread is running, it must not change the socket
+        self.sender.send('general_1~order=1', self.port)
+        self.assertEqual('general_1~order=1', self.receiver.listen(1)[0])
+        self.assertIsNone(self.sender.sc.gettimeout())
+        self.assertFalse(fcntl.fcntl(self.sender.sc.fileno(), fcntl.F_GETFL)
+                         & os.O_NONBLOCK)
+
+
+class ReliableExecutionTest(TestCase):
+
+    def setUp(self):
+        self.patch_loggers = [patch('main.logger'), patch('node.logger'),
+                              patch('node.get_logger'), patch('city.logger'),
+                              patch('city.get_logger')]
+        [patch.start() for patch in self.patch_loggers]
+        return super().setUp()
+
+    def tearDown(self):
+        [patch.stop() for patch in self.patch_loggers]
+        return super().tearDown()
+
+    def test_om1_with_acknowledgements(self):
+        roles = [False, False, True, False]
+        start = time.monotonic()
+        result, report = execution(roles, 'ATTACK', reliable=True,
+                                   with_report=True)
+        self.assertEqual('ATTACK', result)
+        self.assertLessEqual(report['messages_received'],
+                             report['messages_sent'])
+        # a general that decided early does not make the others linger
+        self.assertLess(time.monotonic() - start, 0.5)
@@ -0,0 +1,38 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from main import execution
+from shard import assign_shards, shard_routes
+
+
+class ShardTest(TestCase):
+
+    def setUp(self):
+        self.patch_loggers = [patch('main.logger'), patch('node.logger'),
+                              patch('node.get_logger'), patch('city.logger'),
+                              patch('city.get_logger'), patch('shard.logger')]
+        [patch.start() for patch in self.patch_loggers]
+        return super().setUp()
+
+    def tearDown(self):
+        [patch.stop() for patch in self.patch_loggers]
+        return super().tearDown()
+
+    def test_assign_shards(self):
+        self.assertEqual([[0, 1], [2, 3, 4]], assign_shards(5, 2))
+        self.assertEqual([[0], [1], [2]], assign_shards(3, 8))
+
+    def test_shard_routes(self):
+        self.assertEqual({1: 100, 2: 100, 3: 101, 4: 102},
+                         shard_routes([[0, 1], [2]], [1, 2, 3], 4,
+                                      [100, 101, 102]))
+
+    def test_sharded_om2_with_traitors(self):
+        roles = [False, True, False, False, False, True, False]
+        result, report = execution(roles, 'ATTACK', max_traitors=2,
+                                   runtime='sharded', workers=3,
+                                   wire_format='binary', with_report=True)
+        self.assertEqual('ATTACK', result)
+        self.assertEqual(8, len(report['nodes']))
+        self.assertLessEqual(report['messages_received'],
+                             report['messages_sent'])
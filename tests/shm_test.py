@@ -0,0 +1,65 @@
+import socket
+from unittest import TestCase
+from unittest.mock import patch
+
+from main import execution
+from node import Order
+from node_socket import SharedMemoryNetwork, open_socket
+
+
+class SharedMemorySocketTest(TestCase):
+
+    def setUp(self):
+        self.network = SharedMemoryNetwork([1, 2, 3], capacity=64)
+        self.first = open_socket(1, network=self.network)
+        self.second = open_socket(2, network=self.network)
+        self.third = open_socket(3, encoding=None, network=self.network)
+        return super().setUp()
+
+    def tearDown(self):
+        [node_socket.close()
+         for node_socket in (self.first, self.second, self.third)]
+        self.network.close()
+        return super().tearDown()
+
+    def test_messages_of_every_sender_arrive(self):
+        self.first.send('general_1~order=1', 3)
+        self.second.send_many(['general_2~order=0'], [3])
+        received = sorted([self.third.listen(1), self.third.listen(1)])
+        self.assertEqual([(b'general_1~order=1', ('shm', 1)),
+                          (b'general_2~order=0', ('shm', 2))], received)
+
+    def test_records_wrap_around_the_ring(self):
+        for order in range(10):
+            self.first.send(f'general_1~order={order}', 2)
+            self.assertEqual(f'general_1~order={order}',
+                             self.second.listen(1)[0])
+
+    def test_full_ring_drops_and_listen_times_out(self):
+        for order in range(5):
+            self.first.send(f'general_1~order={order}', 2)
+        self.assertEqual(3, self.first.messages_sent)
+        [self.second.listen(1) for _ in range(3)]
+        with self.assertRaises(socket.timeout):
+            self.second.listen(0.01)
+
+
+class SharedMemoryRuntimeTest(TestCase):
+
+    def setUp(self):
+        self.patch_loggers = [patch('main.logger'), patch('node.logger'),
+                              patch('node.get_logger'), patch('city.logger'),
+                              patch('city.get_logger')]
+        [patch.start() for patch in self.patch_loggers]
+        return super().setUp()
+
+    def tearDown(self):
+        [patch.stop() for patch in self.patch_loggers]
+        return super().tearDown()
+
+    @patch('node.General.get_random_order')
+    def test_one_traitor_retreat_return_retreat(self, mock_random_order):
+        mock_random_order.side_effect = [Order.ATTACK, Order.ATTACK]
+        result = execution([False, True, False, False], 'RETREAT',
+                           runtime='shm')
+        self.assertEqual('RETREAT', result)
@@ -0,0 +1,81 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+import wire
+from main import execution
+from signing import Keyring
+
+
+class KeyringTest(TestCase):
+
+    def setUp(self):
+        self.keyring = Keyring.generate(4, seed=1)
+        return super().setUp()
+
+    def test_relayed_chain_verifies(self):
+        signatures = self.keyring.sign_chain(0, 1, 5)
+        signatures = self.keyring.sign_chain(2, 1, 5, signatures)
+        self.assertTrue(self.keyring.verify_chain((0, 2), 1, 5, signatures))
+        # the order, the instance and the signers are all signed
+        self.assertFalse(self.keyring.verify_chain((0, 2), 0, 5, signatures))
+        self.assertFalse(self.keyring.verify_chain((0, 2), 1, 6, signatures))
+        self.assertFalse(self.keyring.verify_chain((0, 3), 1, 5, signatures))
+        self.assertFalse(self.keyring.verify_chain((0,), 1, 5, signatures))
+
+    def test_verification_is_cached_per_signer_and_payload(self):
+        signatures = self.keyring.sign_chain(0, 1, 0)
+        verifier = self.keyring.copy()
+        with patch.object(verifier, 'sign', wraps=verifier.sign) as sign:
+            for relay in (1, 2, 3):
+                chain = self.keyring.sign_chain(relay, 1, 0, signatures)
+                self.assertTrue(verifier.verify_chain((0, relay), 1, 0,
+                                                      chain))
+            # the signature of the supreme general is only checked once
+            self.assertEqual(4, sign.call_count)
+        self.assertFalse(verifier.verify_chain((0,), 1, 0, (b'x' * 16,)))
+
+    def test_signatures_on_the_wire(self):
+        signatures = self.keyring.sign_chain(0, 1, 3)
+        signatures = self.keyring.sign_chain(1, 1, 3, signatures)
+        for codec in wire.CODECS.values():
+            msg = codec.decode(codec.encode_order(1, 1, (0, 1), 3,
+                                                  signatures))
+            self.assertEqual(((0, 1), signatures), (msg.path, msg.signatures))
+            self.assertEqual((), codec.decode(
+                codec.encode_order(1, 1, (0, 1))).signatures)
+
+
+class SignedExecutionTest(TestCase):
+
+    def setUp(self):
+        self.patch_loggers = [patch('main.logger'), patch('node.logger'),
+                              patch('node.get_logger'), patch('city.logger'),
+                              patch('city.get_logger')]
+        [patch.start() for patch in self.patch_loggers]
+        return super().setUp()
+
+    def tearDown(self):
+        [patch.stop() for patch in self.patch_loggers]
+        return super().tearDown()
+
+    def test_two_traitors_among_four_generals(self):
+        # OM(2) needs at least 7 generals for this
+        roles = [False, True, False, True]
+        self.assertEqual('ERROR_NOT_ENOUGH_GENERALS',
+                         execution(roles, 'ATTACK', max_traitors=2,
+                                   runtime='memory'))
+        self.assertEqual('ATTACK', execution(roles, 'ATTACK', max_traitors=2,
+                                             round_timeout=0.1,
+                                             runtime='memory', signed=True))
+
+    def test_fewer_messages_than_om(self):
+        roles = [False, True, False, False, False, True, False]
+        reports = {}
+        for signed in (False, True):
+            result, reports[signed] = execution(
+                roles, 'RETREAT', max_traitors=2, round_timeout=0.1,
+                runtime='memory', with_report=True, signed=signed,
+                wire_format='binary')
+            self.assertEqual('RETREAT', result)
+        self.assertLess(reports[True]['messages_sent'],
+                        reports[False]['messages_sent'] / 2)
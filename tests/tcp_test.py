@@ -0,0 +1,67 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from main import execution
+from node_socket import TcpSocket
+
+
+class TcpSocketTest(TestCase):
+
+    def setUp(self):
+        self.sender = TcpSocket()
+        self.receiver = TcpSocket()
+        self.port = self.receiver.sc.getsockname()[1]
+        return super().setUp()
+
+    def tearDown(self):
+        self.sender.close()
+        self.receiver.close()
+        return super().tearDown()
+
+    def test_one_connection_per_peer(self):
+        messages = [f'general_1~order={i % 2}' for i in range(50)]
+        self.sender.send_many(messages, [self.port] * len(messages))
+        self.assertEqual(messages,
+                         [self.receiver.listen(1)[0] for _ in messages])
+        self.assertEqual(1, len(self.sender.connections))
+        self.assertEqual(50, self.receiver.messages_received)
+
+    def test_large_message_is_not_truncated(self):
+        message = b'x' * 200000
+        receiver = TcpSocket(encoding=None)
+        self.sender.send(message, receiver.sc.getsockname()[1])
+        self.assertEqual(message, receiver.listen(1)[0])
+        receiver.close()
+
+    def test_readers_of_several_peers(self):
+        other = TcpSocket()
+        self.sender.send('general_1~order=1', self.port)
+        other.send('general_2~order=0', self.port)
+        received = {self.receiver.listen(1)[0] for _ in range(2)}
+        self.assertEqual({'general_1~order=1', 'general_2~order=0'},
+                         received)
+        with self.assertRaises(TimeoutError):
+            self.receiver.listen(0.05)
+        other.close()
+
+
+class TcpExecutionTest(TestCase):
+
+    def setUp(self):
+        self.patch_loggers = [patch('main.logger'), patch('node.logger'),
+                              patch('node.get_logger'), patch('city.logger'),
+                              patch('city.get_logger')]
+        [patch.start() for patch in self.patch_loggers]
+        return super().setUp()
+
+    def tearDown(self):
+        [patch.stop() for patch in self.patch_loggers]
+        return super().tearDown()
+
+    def test_om2_over_tcp(self):
+        roles = [False, True, False, False, False, True, False]
+        result, report = execution(roles, 'ATTACK', max_traitors=2,
+                                   runtime='tcp', with_report=True)
+        self.assertEqual('ATTACK', result)
+        self.assertLessEqual(report['messages_received'],
+                             report['messages_sent'])
@@ -0,0 +1,58 @@
+import socket
+from unittest import TestCase
+
+import wire
+from node_socket import MSG_TRUNC, UdpSocket, open_socket
+
+
+class UdpSocketTest(TestCase):
+
+    def setUp(self):
+        self.sender = UdpSocket()
+        return super().setUp()
+
+    def tearDown(self):
+        self.sender.close()
+        return super().tearDown()
+
+    def port(self, node_socket) -> int:
+        return node_socket.sc.getsockname()[1]
+
+    def test_datagram_larger_than_a_kilobyte(self):
+        receiver = UdpSocket()
+        message = 'general_1~order=1~path=' + ','.join(['1'] * 2000)
+        self.sender.send(message, self.port(receiver))
+        self.assertEqual(message, receiver.listen(1)[0])
+        receiver.close()
+
+    def test_binary_message_is_a_view_of_the_ring(self):
+        receiver = UdpSocket(encoding=None)
+        data = wire.BINARY.encode_order(2, 1, (0, 2), 5)
+        self.sender.send(data, self.port(receiver))
+        message, _ = receiver.listen(1)
+        self.assertIsInstance(message, memoryview)
+        self.assertEqual(data, message)
+        self.assertEqual((0, 2), wire.BINARY.decode(message).path)
+        receiver.close()
+
+    def test_ring_wraps_around(self):
+        receiver = open_socket(encoding=None, max_datagram=1000)
+        port = self.port(receiver)
+        for number in range(2 * len(receiver.ring) // 100):
+            data = bytes([number % 256]) * 100
+            self.sender.send(data, port)
+            self.assertEqual(data, receiver.listen(1)[0])
+            self.assertLessEqual(receiver.ring_offset, len(receiver.ring))
+        receiver.close()
+
+    def test_oversized_datagram_is_dropped(self):
+        if not MSG_TRUNC:
+            self.skipTest('the size of a truncated datagram is unknown')
+        receiver = UdpSocket(max_datagram=100)
+        self.sender.send('x' * 101, self.port(receiver))
+        self.sender.send('general_1~order=1', self.port(receiver))
+        self.assertEqual('general_1~order=1', receiver.listen(1)[0])
+        self.assertEqual(1, receiver.truncated)
+        with self.assertRaises(socket.timeout):
+            receiver.listen(0.01)
+        receiver.close()
@@ -0,0 +1,43 @@
+import logging
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import util
+
+
+class LogWriterTest(TestCase):
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        # get_logger leaves loggers alone when the root logger has handlers,
+        # like the one pytest installs
+        self.patch_root = patch.object(logging.getLogger(), 'handlers', [])
+        self.patch_root.start()
+        return super().setUp()
+
+    def tearDown(self):
+        self.patch_root.stop()
+        util.stop_log_writer()
+        util.set_level(logging.INFO)
+        return super().tearDown()
+
+    def test_queued_records_are_written_to_the_logger_file(self):
+        util.start_log_writer(self.dirname, shared=False)
+        logger = util.get_logger('util_test_queued', self.dirname)
+        logger.info('message: %s', 'general_1~order=1')
+        util.stop_log_writer()
+
+        lines = (Path(self.dirname)/'util_test_queued.txt').read_text()\
+            .splitlines()
+        self.assertEqual(1, len(lines))
+        self.assertIn('INFO     [util_test.py:', lines[0])
+        self.assertTrue(lines[0].endswith('] message: general_1~order=1'))
+
+    def test_level_off_skips_formatting(self):
+        logger = util.get_logger('util_test_off', self.dirname)
+        util.set_level('OFF')
+        argument = MagicMock()
+        logger.info('message: %s', argument)
+        argument.__str__.assert_not_called()
@@ -0,0 +1,56 @@
+from unittest import TestCase
+
+from wire import ACTION, BINARY, ORDER, STOP, TEXT, Message
+
+
+class WireTest(TestCase):
+
+    def test_text_format_is_unchanged(self):
+        self.assertEqual('general_1~order=1', TEXT.encode_order(1, 1, (0, 1)))
+        self.assertEqual('general_3~order=0~path=0,2,3',
+                         TEXT.encode_order(3, 0, (0, 2, 3)))
+        self.assertEqual('supreme_general~action=1', TEXT.encode_action(0, 1))
+
+    def test_text_decode_exposes_fields(self):
+        msg = TEXT.decode('general_3~order=0~path=0,2,3')
+        self.assertEqual(['general_3', 'order=0', 'path=0,2,3'], msg)
+        self.assertEqual((ORDER, 3, 0, (0, 2, 3), 3),
+                         (msg.kind, msg.sender, msg.order, msg.path,
+                          msg.round))
+
+    def test_binary_round_trip(self):
+        data = BINARY.encode_order(3, 1, (0, 2, 3))
+        self.assertEqual(15 + 2 * 3, len(data))
+        self.assertEqual(Message(ORDER, 3, 3, 1, (0, 2, 3)),
+                         BINARY.decode(memoryview(data)))
+        self.assertEqual(Message(ACTION, 2, 0, 0, ()),
+                         BINARY.decode(BINARY.encode_action(2, 0)))
+
+    def test_binary_rejects_unknown_version(self):
+        data = bytearray(BINARY.encode_action(2, 0))
+        data[0] = 99
+        with self.assertRaises(ValueError):
+            BINARY.decode(data)
+
+    def test_instance_id_round_trip(self):
+        text = TEXT.encode_order(3, 0, (0, 2, 3), 7)
+        self.assertEqual('general_3~order=0~path=0,2,3~instance=7', text)
+        self.assertEqual(7, TEXT.decode(text).instance)
+        self.assertEqual(0, TEXT.decode(TEXT.encode_action(2, 1)).instance)
+        self.assertEqual(Message(ACTION, 2, 0, 1, (), 70000),
+                         BINARY.decode(BINARY.encode_action(2, 1, 70000)))
+
+    def test_stop_message(self):
+        self.assertEqual(STOP, TEXT.decode(TEXT.encode_stop(0)).kind)
+        self.assertEqual(STOP, BINARY.decode(BINARY.encode_stop(0)).kind)
+
+    def test_cluster_id_round_trip(self):
+        for codec in (TEXT, BINARY):
+            cluster_codec = codec.for_cluster(4000000000)
+            for data in (cluster_codec.encode_order(3, 0, (0, 2, 3), 7),
+                         cluster_codec.encode_action(2, 1),
+                         cluster_codec.encode_stop(0)):
+                self.assertEqual(4000000000, codec.decode(data).cluster)
+            self.assertEqual(0, codec.decode(codec.encode_stop(0)).cluster)
+        self.assertEqual('general_1~order=1~cluster=5',
+                         TEXT.for_cluster(5).encode_order(1, 1, (0, 1)))
@@ -1,26 +1,163 @@
 import logging
+import multiprocessing
+import queue
+from logging.handlers import QueueHandler, QueueListener
 
 from pathlib import Path
 
 FMT = '%(asctime)s %(levelname)-8s [%(filename)s:%(lineno)-3d] %(message)s'
 DATEFMT = '%H:%M:%S'
 
+# above CRITICAL, nothing is logged and lazy messages are never formatted
+OFF = logging.CRITICAL + 10
+LEVELS = {'DEBUG': logging.DEBUG, 'INFO': logging.INFO,
+          'WARNING': logging.WARNING, 'ERROR': logging.ERROR, 'OFF': OFF}
+
+level = logging.INFO
+log_queue = None
+log_writer = None
+loggers = {}
+
+
 def get_logger(name, dirname='logs'):
     logger = logging.getLogger(name)
     if logger.hasHandlers(): return logger
     # you can change the logging level to DEBUG on the returned obj
-    logger.setLevel(logging.INFO)
+    logger.setLevel(level)
 
     if name == 'main':
         handler = logging.StreamHandler()
         handler.setLevel(logging.DEBUG)
+        formatter = logging.Formatter(fmt=FMT,datefmt=DATEFMT)
+        handler.setFormatter(formatter)
+    elif log_queue is not None:
+        # records are formatted and written to dirname by the log writer
+        # of the main process
+        handler = QueueHandler(log_queue)
     else:
-        dirname = Path(dirname)
-        handler = logging.FileHandler(filename=dirname/f'{name}.txt', mode='w')
-        handler.setLevel(logging.DEBUG)
+        handler = file_handler(name, dirname)
 
-    formatter = logging.Formatter(fmt=FMT,datefmt=DATEFMT)
-    handler.setFormatter(formatter)
     logger.addHandler(handler)
+    loggers[name] = (logger, dirname)
 
     return logger
+
+
+def file_handler(name, dirname='logs', mode='w'):
+    handler = logging.FileHandler(filename=Path(dirname)/f'{name}.txt',
+                                  mode=mode)
+    handler.setLevel(logging.DEBUG)
+    handler.setFormatter(logging.Formatter(fmt=FMT, datefmt=DATEFMT))
+    return handler
+
+
+def replace_handler(logger, handler):
+    for old_handler in list(logger.handlers):
+        logger.removeHandler(old_handler)
+        old_handler.close()
+    logger.addHandler(handler)
+
+
+def set_level(new_level):
+    """
+    - Sets the level of every logger from get_logger, including the ones
+    created afterwards (also in forked nodes).
+
+    :param new_level: int or one of DEBUG, INFO, WARNING, ERROR, OFF
+    :return: None
+    """
+    global level
+    level = LEVELS[new_level.upper()] if isinstance(new_level, str) \
+        else new_level
+    for logger, _ in loggers.values():
+        logger.setLevel(level)
+
+
+class RoutingFileHandler(logging.Handler):
+    """
+    Writes every record to dirname/<logger name>.txt, like the FileHandler
+    of get_logger does, but only flushes when asked to.
+    """
+
+    def __init__(self, dirname='logs'):
+        super().__init__()
+        self.dirname = Path(dirname)
+        self.streams = {}
+        self.setFormatter(logging.Formatter(fmt=FMT, datefmt=DATEFMT))
+
+    def emit(self, record):
+        stream = self.streams.get(record.name)
+        if stream is None:
+            stream = open(self.dirname/f'{record.name}.txt', mode='w')
+            self.streams[record.name] = stream
+        stream.write(self.format(record) + '\n')
+
+    def flush(self):
+        for stream in self.streams.values():
+            stream.flush()
+
+    def close(self):
+        for stream in self.streams.values():
+            stream.close()
+        self.streams = {}
+        super().close()
+
+
+class BatchingQueueListener(QueueListener):
+    """
+    QueueListener that drains the queue before flushing its handlers,
+    so a burst of records costs a single write to every file.
+    """
+
+    def dequeue(self, block):
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            for handler in self.handlers:
+                handler.flush()
+        return self.queue.get(block)
+
+
+def start_log_writer(dirname='logs', shared=True):
+    """
+    - Switches get_logger to the queued mode: nodes only enqueue their
+    records and a single background thread of this process writes them.
+    - Loggers that already exist are switched as well.
+
+    :param dirname: directory of the log files
+    :param shared: whether nodes run in forked processes, otherwise the
+        cheaper in-process queue is used
+    :return: None
+    """
+    global log_queue, log_writer
+    if log_writer is not None:
+        return
+
+    log_queue = multiprocessing.Queue() if shared else queue.SimpleQueue()
+    log_writer = BatchingQueueListener(log_queue, RoutingFileHandler(dirname))
+    log_writer.start()
+
+    for name, (logger, _) in loggers.items():
+        if name != 'main':
+            replace_handler(logger, QueueHandler(log_queue))
+
+
+def stop_log_writer():
+    """
+    - Writes the remaining records, stops the log writer and switches
+    the loggers back to appending to their files directly.
+
+    :return: None
+    """
+    global log_queue, log_writer
+    if log_writer is None:
+        return
+
+    log_writer.stop()
+    for handler in log_writer.handlers:
+        handler.close()
+    log_queue = log_writer = None
+
+    for name, (logger, dirname) in loggers.items():
+        if name != 'main':
+            replace_handler(logger, file_handler(name, dirname, mode='a'))
@@ -0,0 +1,243 @@
+import struct
+from typing import NamedTuple
+
+from signing import SIGNATURE_SIZE
+
+ORDER = 0
+ACTION = 1
+# the supreme general shuts a long-lived cluster down
+STOP = 2
+
+KINDS = {'order': ORDER, 'action': ACTION, 'stop': STOP}
+KIND_NAMES = {kind: name for name, kind in KINDS.items()}
+
+
+def sender_name(general_id: int) -> str:
+    return 'supreme_general' if general_id == 0 else f'general_{general_id}'
+
+
+def message_path(msg: list) -> tuple:
+    """
+    - Returns the chain of generals a splitted message went through,
+    starting with the supreme general and ending with its sender.
+    - The path is only written on the wire when it is longer than what
+    the sender alone implies (i.e. from the third round of OM(m) on).
+
+    :param msg: list of splitted message
+    :return: tuple of general ids
+    """
+    for field in msg[2:]:
+        key, value = field.split('=')
+        if key == 'path':
+            return tuple(int(x) for x in value.split(','))
+
+    if msg[0] == 'supreme_general':
+        return (0,)
+    return 0, int(msg[0].split('_')[1])
+
+
+class Message(NamedTuple):
+    kind: int
+    sender: int
+    round: int
+    order: int
+    path: tuple
+    instance: int = 0
+    # SM(m) only, one signature per general of path
+    signatures: tuple = ()
+    # cluster the sender belongs to, 0 for none
+    cluster: int = 0
+
+
+class TextMessage(list):
+    """
+    Splitted text message, e.g. ['general_1', 'order=0'], that also
+    exposes the fields of Message.
+    """
+
+    @property
+    def kind(self) -> int:
+        return KINDS[self[1].split('=')[0]]
+
+    @property
+    def sender(self) -> int:
+        return 0 if self[0] == 'supreme_general' else int(self[0].split('_')[1])
+
+    @property
+    def order(self) -> int:
+        return int(self[1].split('=')[1])
+
+    @property
+    def path(self) -> tuple:
+        return message_path(self) if self.kind == ORDER else ()
+
+    @property
+    def round(self) -> int:
+        return len(self.path)
+
+    @property
+    def instance(self) -> int:
+        for field in self[2:]:
+            key, value = field.split('=')
+            if key == 'instance':
+                return int(value)
+        return 0
+
+    @property
+    def signatures(self) -> tuple:
+        for field in self[2:]:
+            key, value = field.split('=')
+            if key == 'sig':
+                return tuple(bytes.fromhex(x) for x in value.split(','))
+        return ()
+
+    @property
+    def cluster(self) -> int:
+        for field in self[2:]:
+            key, value = field.split('=')
+            if key == 'cluster':
+                return int(value)
+        return 0
+
+
+class TextCodec:
+    """
+    The human readable format, i.e. general_1~order=0, kept for debugging.
+    The instance id is only written for instances other than 0, the
+    signatures of SM(m) as hex only for signed orders and the cluster id
+    only by a codec of for_cluster.
+    """
+
+    name = 'text'
+    encoding = 'UTF-8'
+
+    def __init__(self, cluster: int = 0):
+        self.cluster = cluster
+
+    def for_cluster(self, cluster: int):
+        """
+        :param cluster: id of the cluster of a run
+        :return: codec writing cluster into every message
+        """
+        return type(self)(cluster)
+
+    def encode_order(self, sender: int, order: int, path: tuple,
+                     instance: int = 0, signatures: tuple = ()) -> str:
+        message = f'{sender_name(sender)}~order={order}'
+        if len(path) > 2:
+            message += f"~path={','.join(map(str, path))}"
+        message += self._instance_field(instance)
+        if signatures:
+            message += f"~sig={','.join(s.hex() for s in signatures)}"
+        return message + self._cluster_field()
+
+    def encode_action(self, sender: int, action: int,
+                      instance: int = 0) -> str:
+        return f'{sender_name(sender)}~action={action}' + \
+            self._instance_field(instance) + self._cluster_field()
+
+    def encode_stop(self, sender: int) -> str:
+        return f'{sender_name(sender)}~stop=1' + self._cluster_field()
+
+    def _instance_field(self, instance: int) -> str:
+        return f'~instance={instance}' if instance else ''
+
+    def _cluster_field(self) -> str:
+        return f'~cluster={self.cluster}' if self.cluster else ''
+
+    def decode(self, message: str) -> TextMessage:
+        return TextMessage(message.split('~'))
+
+
+class BinaryCodec:
+    """
+    Fixed layout format, every field is unpacked straight from the
+    received buffer.
+
+    version (1 byte) | kind (1 byte) | round (1 byte) | sender (2 bytes)
+    | order (1 byte) | instance (4 bytes) | cluster (4 bytes)
+    | path length (1 byte)
+    | path (2 bytes per general) | signatures (SIGNATURE_SIZE bytes per
+    general of the path, signed orders of SM(m) only)
+
+    Version 2 added the instance id, version 3 the cluster id.
+    """
+
+    name = 'binary'
+    # sockets hand the received bytes over without decoding them
+    encoding = None
+    VERSION = 3
+    HEADER = struct.Struct('!BBBHBIIB')
+
+    def __init__(self, cluster: int = 0):
+        self.cluster = cluster
+
+    def for_cluster(self, cluster: int):
+        """
+        :param cluster: id of the cluster of a run
+        :return: codec writing cluster into every message
+        """
+        return type(self)(cluster)
+
+    def _encode(self, kind: int, sender: int, order: int, path: tuple,
+                instance: int = 0, signatures: tuple = ()) -> bytes:
+        return self.HEADER.pack(self.VERSION, kind, len(path), sender,
+                                int(order), instance, self.cluster,
+                                len(path)) + \
+            struct.pack(f'!{len(path)}H', *path) + b''.join(signatures)
+
+    def encode_order(self, sender: int, order: int, path: tuple,
+                     instance: int = 0, signatures: tuple = ()) -> bytes:
+        return self._encode(ORDER, sender, order, path, instance, signatures)
+
+    def encode_action(self, sender: int, action: int,
+                      instance: int = 0) -> bytes:
+        return self._encode(ACTION, sender, action, (), instance)
+
+    def encode_stop(self, sender: int) -> bytes:
+        return self._encode(STOP, sender, 0, ())
+
+    def decode(self, data) -> Message:
+        """
+        :param data: bytes, bytearray or memoryview of a single message
+        :return: Message
+        """
+        version, kind, round_, sender, order, instance, cluster, \
+            path_length = self.HEADER.unpack_from(data)
+        if version != self.VERSION:
+            raise ValueError(f'unsupported wire format version {version}')
+        path = struct.unpack_from(f'!{path_length}H', data,
+                                  self.HEADER.size)
+        offset = self.HEADER.size + 2 * path_length
+        signatures = tuple(
+            bytes(data[start:start + SIGNATURE_SIZE])
+            for start in range(offset, len(data), SIGNATURE_SIZE))
+        return Message(kind, sender, round_, order, path, instance,
+                       signatures, cluster)
+
+
+TEXT = TextCodec()
+BINARY = BinaryCodec()
+CODECS = {codec.name: codec for codec in (TEXT, BINARY)}
+
+# raised by decode_strict for a malformed message
+MALFORMED = (ValueError, IndexError, KeyError, struct.error)
+
+
+def decode_strict(codec, message):
+    """
+    - Decodes message so that a malformed one fails here instead of
+    halfway through handling it.
+    - A TextMessage parses its fields only when they are read, so every
+    field is read once.
+
+    :param codec: TextCodec or BinaryCodec the message was encoded with
+    :param message: message as received from the socket
+    :return: Message or TextMessage
+    :raise: one of MALFORMED for a malformed message
+    """
+    msg = codec.decode(message)
+    if isinstance(msg, TextMessage):
+        for field in Message._fields:
+            getattr(msg, field)
+    return msg